@@ -0,0 +1,66 @@
+"""
+Cập nhật số dư tài khoản trực tiếp trong database.
+
+Thay vì đọc Account, sửa current_balance trong Python rồi ghi lại (hai request song song
+sẽ ghi đè lên nhau), mỗi tài khoản chỉ nhận MỘT câu
+`UPDATE accounts SET current_balance = current_balance + :delta`.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.database import models
+
+
+def transaction_deltas(transaction, sign: int = 1, deltas: Dict[int, Decimal] = None) -> Dict[int, Decimal]:
+    """
+    Tính thay đổi số dư mà một giao dịch gây ra cho từng tài khoản.
+    `transaction` có thể là model ORM hoặc schema (cùng tên thuộc tính).
+    sign = -1 để hoàn tác giao dịch. Nếu truyền `deltas` thì cộng dồn vào đó.
+    """
+    if deltas is None:
+        deltas = defaultdict(Decimal)
+    amount = Decimal(transaction.amount) * sign
+
+    if transaction.type == models.TransactionType.EXPENSE:
+        deltas[transaction.source_account_id] -= amount
+    elif transaction.type == models.TransactionType.INCOME:
+        deltas[transaction.source_account_id] += amount
+    elif transaction.type == models.TransactionType.TRANSFER and transaction.destination_account_id:
+        deltas[transaction.source_account_id] -= amount
+        deltas[transaction.destination_account_id] += amount
+    return deltas
+
+
+def lock_accounts(db: Session, user_id: Optional[int], account_ids: Iterable[int]) -> Dict[int, models.Account]:
+    """
+    Khóa (SELECT ... FOR UPDATE) các tài khoản của user theo thứ tự id tăng dần.
+    Thứ tự cố định giúp hai giao dịch chuyển khoản ngược chiều (A->B và B->A) không deadlock.
+    Trả về {id: Account}; id nào không thuộc user sẽ không có trong kết quả.
+    user_id = None: khóa không phân biệt chủ sở hữu (người gọi tự kiểm tra Account.user_id).
+    """
+    ids = sorted({account_id for account_id in account_ids if account_id})
+    if not ids:
+        return {}
+    query = db.query(models.Account).filter(models.Account.id.in_(ids))
+    if user_id is not None:
+        query = query.filter(models.Account.user_id == user_id)
+    accounts = query.order_by(models.Account.id).with_for_update().all()
+    return {account.id: account for account in accounts}
+
+
+def apply_balance_deltas(db: Session, deltas: Dict[int, Decimal]):
+    """Cộng delta (có thể âm) vào số dư của từng tài khoản. Không commit."""
+    for account_id in sorted(deltas):
+        delta = deltas[account_id]
+        if not delta:
+            continue
+        db.execute(
+            update(models.Account)
+            .where(models.Account.id == account_id)
+            .values(current_balance=models.Account.current_balance + delta)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,185 @@
+"""
+Theo dõi "dữ liệu của user nào vừa thay đổi" để các cache trong tiến trình (dự báo dòng tiền, ...)
+biết khi nào phải bỏ kết quả cũ, và duy trì phiên bản dữ liệu của từng user (users.data_version)
+dùng làm ETag cho các endpoint đọc.
+
+- Trước mỗi lần flush, mọi object ORM có cột user_id được thêm/sửa/xóa sẽ đánh dấu user đó
+  (giống principal_cache: bắt sự kiện nên mọi đường ghi qua ORM đều được áp dụng).
+- Sự kiện gắn vào lớp Session nên cũng áp dụng cho AsyncSession (bọc một Session đồng bộ).
+- Đường ghi bằng câu lệnh Core (INSERT nhiều dòng, UPDATE số dư) gọi mark_user_changed().
+- Ngay trước COMMIT: data_version của các user đã đánh dấu được tăng trong CÙNG transaction
+  (một câu UPDATE), nên phiên bản luôn khớp với dữ liệu đã lưu.
+- Chỉ sau khi COMMIT thành công mới báo cho các subscriber và cập nhật cache phiên bản;
+  rollback thì bỏ đánh dấu, nên cache không bị xóa vì một thay đổi chưa từng được lưu.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import models
+
+logger = logging.getLogger(__name__)
+
+_INFO_KEY = "changed_user_ids"
+_VERSIONS_KEY = "committed_data_versions"
+
+_subscribers: List[Callable[[Set[int]], None]] = []
+
+
+def subscribe(callback: Callable[[Set[int]], None]):
+    """Đăng ký hàm được gọi với tập user_id có dữ liệu vừa được commit."""
+    _subscribers.append(callback)
+    return callback
+
+
+def mark_user_changed(db: Session, user_ids):
+    """Đánh dấu (các) user có dữ liệu thay đổi trong transaction hiện tại của session."""
+    if isinstance(user_ids, int):
+        user_ids = (user_ids,)
+    db.info.setdefault(_INFO_KEY, set()).update(user_id for user_id in user_ids if user_id is not None)
+
+
+# --- PHIÊN BẢN DỮ LIỆU CỦA USER ---
+
+class DataVersionCache:
+    """
+    user_id -> (hết hạn, data_version) trong bộ nhớ.
+    Ghi trong tiến trình này cập nhật cache ngay sau commit; TTL ngắn giới hạn thời gian
+    một tiến trình khác (worker uvicorn khác, scheduler) có thể thấy phiên bản cũ.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: int, version: int):
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            current = self._entries.get(user_id)
+            # Không ghi đè phiên bản mới hơn bằng một lần đọc cũ chạy song song
+            if current is not None and current[1] > version:
+                return
+            if user_id not in self._entries and len(self._entries) >= self.max_size:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+data_versions = DataVersionCache(
+    max_size=settings.DATA_VERSION_CACHE_MAX_SIZE,
+    ttl_seconds=settings.DATA_VERSION_CACHE_TTL_SECONDS,
+)
+
+
+async def get_data_version(db: AsyncSession, user_id: int) -> int:
+    """Phiên bản dữ liệu hiện tại của user (từ cache, nếu không có thì một câu SELECT)."""
+    version = data_versions.get(user_id)
+    if version is None:
+        version = (await db.execute(
+            select(models.User.data_version).where(models.User.id == user_id)
+        )).scalar() or 0
+        data_versions.put(user_id, version)
+    return version
+
+
+def _bump_versions(session: Session, user_ids: Set[int]) -> Dict[int, int]:
+    stmt = (
+        update(models.User)
+        .where(models.User.id.in_(sorted(user_ids)))
+        .values(data_version=models.User.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if session.get_bind().dialect.update_returning:
+        return dict(session.execute(stmt.returning(models.User.id, models.User.data_version)).all())
+    session.execute(stmt)
+    return dict(session.execute(
+        select(models.User.id, models.User.data_version).where(models.User.id.in_(user_ids))
+    ).all())
+
+
+# --- SỰ KIỆN SESSION ---
+
+def _changed_objects(session: Session) -> Iterable:
+    yield from session.new
+    yield from session.dirty
+    yield from session.deleted
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_users(session, flush_context, instances):
+    user_ids = set()
+    for obj in _changed_objects(session):
+        user_id = getattr(obj, "user_id", None)
+        if isinstance(user_id, int):
+            user_ids.add(user_id)
+    if user_ids:
+        mark_user_changed(session, user_ids)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_changed_versions(session):
+    # Flush trước để thu thập cả các object đang chờ ghi
+    session.flush()
+    user_ids = session.info.get(_INFO_KEY)
+    if user_ids:
+        session.info[_VERSIONS_KEY] = _bump_versions(session, user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changed_users(session):
+    user_ids = session.info.pop(_INFO_KEY, None)
+    versions = session.info.pop(_VERSIONS_KEY, None) or {}
+    for user_id, version in versions.items():
+        data_versions.put(user_id, version)
+    if not user_ids:
+        return
+    for callback in _subscribers:
+        try:
+            callback(user_ids)
+        except Exception:
+            # Lỗi của cache không được làm hỏng request đã commit thành công
+            logger.exception("Lỗi khi báo thay đổi dữ liệu cho subscriber")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop(_INFO_KEY, None)
+    session.info.pop(_VERSIONS_KEY, None)
@@ -16,11 +16,75 @@ class Settings:
         
     DATABASE_URL: str = _db_url
 
+    # --- CONNECTION POOL (áp dụng riêng cho engine đồng bộ và engine async) ---
+    # Tổng số kết nối tối đa của mỗi tiến trình = 2 x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Số giây chờ một kết nối rảnh trước khi báo lỗi (pool cạn)
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Đóng và mở lại kết nối đã dùng quá chừng này giây (nhỏ hơn thời gian server/proxy cắt kết nối rảnh)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Kiểm tra kết nối (một câu ping) trước mỗi lần lấy ra khỏi pool
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    # Số kết nối mở sẵn cho mỗi engine lúc khởi động (0: không mở trước)
+    DB_POOL_WARMUP: int = int(os.getenv("DB_POOL_WARMUP", "2"))
+
     # Các biến khác
     SECRET_KEY: str = os.getenv("SECRET_KEY", "default_secret_key_for_dev")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
     CORS_ORIGINS: str = os.getenv("CORS_ORIGINS", "*")
 
+    # --- API NỘI BỘ (/internal/*, cho vận hành) ---
+    # Gửi trong header X-Internal-Token. Để trống: mọi endpoint /internal bị khóa.
+    INTERNAL_API_TOKEN: str = os.getenv("INTERNAL_API_TOKEN", "")
+
+    # --- LOGGING ---
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Mức log riêng cho từng module, VD: "app.core.deps=DEBUG,app.routers.recurring=WARNING"
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    # Tỉ lệ giữ lại các bản ghi DEBUG (0.0 - 1.0)
+    LOG_DEBUG_SAMPLE_RATE: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+    # --- CACHE NGƯỜI DÙNG ĐÃ XÁC THỰC (get_current_user) ---
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+    PRINCIPAL_CACHE_MAX_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "1024"))
+
+    # --- JOB XUẤT FILE CHẠY NỀN (POST /reports/exports) ---
+    # Thư mục lưu file đã xuất (mặc định: thư mục tạm của hệ thống)
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "")
+    # File đã xong sẽ bị xóa sau khoảng thời gian này
+    EXPORT_TTL_SECONDS: int = int(os.getenv("EXPORT_TTL_SECONDS", "3600"))
+    # Số job đọc dữ liệu chạy song song (thread) và số process dựng file Excel
+    EXPORT_WORKERS: int = int(os.getenv("EXPORT_WORKERS", "2"))
+    EXPORT_RENDER_PROCESSES: int = int(os.getenv("EXPORT_RENDER_PROCESSES", "2"))
+
+    # --- GIAO DỊCH ĐỊNH KỲ (scheduler nền) ---
+    RECURRING_SCHEDULER_ENABLED: bool = os.getenv("RECURRING_SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Số khoản định kỳ nhận (khóa) và xử lý trong một lô, mỗi lô một lần commit.
+    # Lô nhỏ để khóa được giữ ngắn và các worker khác nhận được phần còn lại.
+    RECURRING_BATCH_SIZE: int = int(os.getenv("RECURRING_BATCH_SIZE", "25"))
+    # Thời gian ngủ tối đa giữa hai lần kiểm tra (để thấy thay đổi từ tiến trình khác)
+    RECURRING_SCHEDULER_MAX_SLEEP_SECONDS: float = float(os.getenv("RECURRING_SCHEDULER_MAX_SLEEP_SECONDS", "300"))
+
+    # --- PHIÊN BẢN DỮ LIỆU / ETAG CHO CÁC ENDPOINT ĐỌC ---
+    # Phiên bản của user được giữ trong bộ nhớ tối đa chừng này giây (ghi trong cùng tiến trình
+    # cập nhật ngay; ghi từ tiến trình khác được thấy sau tối đa TTL)
+    DATA_VERSION_CACHE_TTL_SECONDS: float = float(os.getenv("DATA_VERSION_CACHE_TTL_SECONDS", "5"))
+    DATA_VERSION_CACHE_MAX_SIZE: int = int(os.getenv("DATA_VERSION_CACHE_MAX_SIZE", "10000"))
+
+    # --- CACHE KẾT QUẢ BÁO CÁO (/reports/dashboard, /reports/detailed) ---
+    # Để trống: LRU trong bộ nhớ. VD "redis://localhost:6379/0": dùng chung giữa các worker
+    REPORT_CACHE_REDIS_URL: str = os.getenv("REPORT_CACHE_REDIS_URL", "")
+    REPORT_CACHE_MAX_ENTRIES: int = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "2048"))
+    REPORT_CACHE_MAX_BYTES: int = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    REPORT_CACHE_TTL_SECONDS: int = int(os.getenv("REPORT_CACHE_TTL_SECONDS", "600"))
+
+    # --- DỰ BÁO DÒNG TIỀN (GET /reports/forecast) ---
+    # Số ngày lịch sử dùng để tính mức chi trung bình theo danh mục (giao dịch không định kỳ)
+    FORECAST_LOOKBACK_DAYS: int = int(os.getenv("FORECAST_LOOKBACK_DAYS", "90"))
+    # Số kết quả dự báo giữ trong bộ nhớ (bị xóa khi dữ liệu của user thay đổi)
+    FORECAST_CACHE_MAX_SIZE: int = int(os.getenv("FORECAST_CACHE_MAX_SIZE", "512"))
+
     # Lấy danh sách các origin đã được phân tách
     def get_cors_origins_list(self):
         raw = (self.CORS_ORIGINS or "").strip()
@@ -1,22 +1,40 @@
-from fastapi import Depends, HTTPException, status
+import datetime
+import hashlib
+import hmac
+import logging
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 
-from app.core import security
+from app.core import changes, security
+from app.core.config import settings
+from app.core.principal_cache import principal_cache, UserSnapshot
 from app.database import models, connection
 
+logger = logging.getLogger(__name__)
+
 # Trỏ đến API login của bạn
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(connection.get_db)) -> models.User:
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(connection.get_async_db)
+) -> UserSnapshot:
     """
     Dependency để lấy user hiện tại từ token.
     Đây là "người gác cổng" cho các API được bảo vệ.
+    Kết quả được cache theo token (xem principal_cache), nên các request lặp lại
+    không cần giải mã JWT hay truy vấn bảng users.
+    Chạy trên event loop (AsyncSession) nên không chiếm thread của threadpool.
     """
-    print("\n--- [DEBUG] BẮT ĐẦU KIỂM TRA TOKEN ---")
-    # Chỉ in 30 ký tự đầu của token cho gọn
-    print(f"--- [DEBUG] Token nhận được: {token[:30]}...") 
+    # 0. Tra cache trước: trúng cache thì không chạm vào Database
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        logger.debug("Xác thực từ cache", extra={"user_id": cached_user.id, "cache": "hit"})
+        return cached_user
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -24,24 +42,72 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # 1. Xác minh token và lấy user_id trực tiếp
-    # Hàm security.verify_token() đã được tối ưu để trả về user_id (string) hoặc None
-    user_id = security.verify_token(token)
+    # 1. Xác minh token và lấy payload (user_id + thời điểm hết hạn)
+    payload = security.decode_access_token(token)
     
-    if user_id is None:
-        print("--- [DEBUG] KẾT QUẢ: Token không hợp lệ hoặc hết hạn (verify_token trả về None) ---")
+    if payload is None:
+        logger.info("Token không hợp lệ hoặc hết hạn")
         raise credentials_exception
-    
-    print(f"--- [DEBUG] Token hợp lệ! User ID từ token: {user_id} ---")
+    user_id = payload["sub"]
         
     # 2. Truy vấn Database để lấy đối tượng User
     # Chuyển user_id về int vì ID trong DB là int (giả định)
-    user = db.query(models.User).filter(models.User.id == int(user_id)).first()
+    user = (await db.scalars(select(models.User).where(models.User.id == int(user_id)))).first()
     
     # 3. Kiểm tra User có tồn tại không
     if user is None:
-        print(f"--- [DEBUG] KẾT QUẢ: Không tìm thấy user với ID {user_id} trong DB ---")
+        logger.info("Token hợp lệ nhưng không tìm thấy user trong DB", extra={"user_id": user_id})
         raise credentials_exception
         
-    print(f"--- [DEBUG] KẾT QUẢ: Xác thực thành công! User: {user.username} ---\n")
-    return user
\ No newline at end of file
+    logger.debug("Xác thực thành công", extra={"user_id": user.id, "cache": "miss"})
+    snapshot = UserSnapshot.from_user(user)
+    principal_cache.put(token, snapshot, token_exp=payload.get("exp"))
+    return snapshot
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """So sánh yếu (weak comparison) giữa header If-None-Match và ETag hiện tại."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+async def etag_guard(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(connection.get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Dependency cho các endpoint GET chỉ phụ thuộc dữ liệu của user.
+    ETag yếu = hash(user, phiên bản dữ liệu, ngày hôm nay, đường dẫn + query params).
+    Client gửi lại If-None-Match khớp -> 304 ngay, không chạy truy vấn của endpoint
+    (tối đa một câu SELECT phiên bản, hoặc không câu nào nếu phiên bản đang được cache).
+    Ngày hôm nay nằm trong khóa vì các kỳ "tháng này", "hôm nay" thay đổi theo ngày.
+    """
+    version = await changes.get_data_version(db, current_user.id)
+    params = sorted(request.query_params.multi_items())
+    raw = f"{current_user.id}:{version}:{datetime.date.today()}:{request.url.path}:{params}"
+    etag = f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+
+def require_internal_token(x_internal_token: Optional[str] = Header(None)):
+    """
+    Dependency cho các endpoint /internal (vận hành): chỉ cho qua khi header X-Internal-Token
+    khớp INTERNAL_API_TOKEN. Token của người dùng thường không đủ vì các endpoint này
+    thao tác / hiển thị dữ liệu của mọi user và của cả tiến trình.
+    """
+    expected = settings.INTERNAL_API_TOKEN
+    if not expected or not x_internal_token or not hmac.compare_digest(
+        x_internal_token.encode("utf-8"), expected.encode("utf-8")
+    ):
+        logger.warning("Từ chối truy cập API nội bộ", extra={"configured": bool(expected)})
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Không có quyền truy cập API nội bộ")
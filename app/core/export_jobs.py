@@ -0,0 +1,410 @@
+"""
+Job xuất file chạy nền.
+
+Xuất file lớn trong chính request sẽ giữ worker suốt thời gian xuất và dễ bị proxy (Render)
+cắt kết nối. Thay vào đó:
+- POST /reports/exports tạo job và trả về id ngay lập tức
+- Thread pool đọc dữ liệu (dùng lại build_export_query), process pool dựng file Excel
+  (việc nặng CPU, tránh GIL của tiến trình web)
+- File đã xong nằm trên đĩa, tải về bằng FileResponse (hỗ trợ Range) với ETag là hash nội dung
+- File hết hạn sau EXPORT_TTL_SECONDS sẽ bị xóa (dọn lười mỗi lần có job mới / tra cứu job)
+
+Job đang chạy chỉ nằm trong bộ nhớ của tiến trình hiện tại. Job đã xong (hoặc lỗi) được lưu
+kèm file <id>.json (trạng thái, user_id, etag, expires_at) cạnh file xuất, nên vẫn tra cứu / tải
+được sau khi khởi động lại hoặc từ worker khác. Thư mục EXPORT_DIR được quét (lúc khởi động và
+tối đa mỗi SWEEP_INTERVAL_SECONDS): xóa job hết hạn theo file .json, file không có trạng thái
+(job bị gián đoạn) theo thời gian sửa đổi.
+"""
+import atexit
+import datetime
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core import exports
+from app.core.config import settings
+from app.database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "xlsx": exports.XLSX_MEDIA_TYPE,
+    "csv": exports.CSV_MEDIA_TYPE,
+    "ndjson": exports.NDJSON_MEDIA_TYPE,
+}
+
+# Trạng thái của job chưa xong
+ACTIVE_STATUSES = ("pending", "running", "rendering")
+
+# id của job (uuid4().hex) - cũng là tên file trong thư mục xuất file
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+# Quét thư mục xuất file tối đa một lần trong khoảng này (giây)
+SWEEP_INTERVAL_SECONDS = 60
+
+
+def count_csv_records(chunk: bytes, in_quotes: bool = False) -> Tuple[int, bool]:
+    """
+    Số dòng CSV kết thúc trong chunk: chỉ tính xuống dòng nằm ngoài ô có dấu ngoặc kép
+    (dấu " trong ô được nhân đôi nên chẵn/lẻ số dấu " cho biết đang ở trong ô hay không).
+    Trả về cả trạng thái ở cuối chunk để truyền cho chunk tiếp theo.
+    """
+    records = 0
+    for part in chunk.split(b'"'):
+        if not in_quotes:
+            records += part.count(b"\n")
+        in_quotes = not in_quotes
+    # Số phần = số dấu " + 1 -> lần đảo cuối cùng không ứng với dấu " nào
+    return records, not in_quotes
+
+
+def render_xlsx_file(rows_path: str, out_path: str):
+    """Chạy trong process con: đọc các dòng đã định dạng (JSON lines) và dựng file Excel."""
+    def _rows():
+        with open(rows_path, encoding="utf-8") as source:
+            for line in source:
+                yield json.loads(line)
+
+    exports.write_xlsx(_rows(), out_path)
+
+
+class ExportJob:
+    """Trạng thái của một job xuất file."""
+
+    def __init__(self, user_id: int, format: str, filters: dict):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.format = format
+        self.filters = filters
+        self.status = "pending"
+        self.rows_written = 0
+        self.total_rows: Optional[int] = None
+        self.path: Optional[str] = None
+        self.size_bytes: Optional[int] = None
+        self.etag: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.datetime.now()
+        self.finished_at: Optional[datetime.datetime] = None
+        self.expires_at: Optional[datetime.datetime] = None
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def filename(self) -> str:
+        return f"bao_cao_chi_tieu_{self.created_at.date()}.{self.format}"
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done":
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.rows_written / self.total_rows, 1.0), 4)
+
+    def to_record(self) -> dict:
+        """Trạng thái lưu xuống file .json khi job kết thúc (đường dẫn file tính lại từ id)."""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "format": self.format,
+            "filters": self.filters,
+            "status": self.status,
+            "rows_written": self.rows_written,
+            "total_rows": self.total_rows,
+            "size_bytes": self.size_bytes,
+            "etag": self.etag,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "ExportJob":
+        job = cls(record["user_id"], record["format"], record["filters"])
+        for name in ("id", "status", "rows_written", "total_rows", "size_bytes", "etag", "error"):
+            setattr(job, name, record[name])
+        for name in ("created_at", "finished_at", "expires_at"):
+            setattr(job, name, datetime.datetime.fromisoformat(record[name]) if record[name] else None)
+        return job
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "rows_written": self.rows_written,
+            "total_rows": self.total_rows,
+            "progress": self.progress,
+            "size_bytes": self.size_bytes,
+            "etag": self.etag,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+        }
+
+
+class ExportJobManager:
+    def __init__(self, directory: str, ttl_seconds: int, workers: int, render_processes: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.workers = workers
+        self.render_processes = render_processes
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._last_sweep: Optional[float] = None
+        self.coalesced = 0
+
+    # --- Pool được tạo khi có job đầu tiên ---
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-job")
+            return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # "spawn": không fork tiến trình web đang có thread và kết nối database
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.render_processes, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._processes
+
+    def submit(
+        self, user_id: int, format: str, filters: dict, session_factory: Callable[[], Session] = None
+    ) -> ExportJob:
+        self.cleanup_expired()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            # Job trùng (cùng user, định dạng, bộ lọc) đang chạy -> dùng chung, không xuất lần nữa
+            for existing in self._jobs.values():
+                if (
+                    existing.status in ACTIVE_STATUSES
+                    and existing.user_id == user_id
+                    and existing.format == format
+                    and existing.filters == filters
+                ):
+                    self.coalesced += 1
+                    return existing
+            job = ExportJob(user_id, format, filters)
+            self._jobs[job.id] = job
+        self._thread_pool().submit(self._run, job, session_factory or SessionLocal)
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[ExportJob]:
+        """Job của đúng user đó (job của user khác coi như không tồn tại)."""
+        self.cleanup_expired()
+        job = self._jobs.get(job_id)
+        if job is None:
+            # Job xong ở lần chạy trước của tiến trình hoặc ở worker khác: đọc trạng thái trên đĩa
+            job = self._load(job_id)
+            if job is None or (job.expires_at and job.expires_at <= datetime.datetime.now()):
+                return None
+            if job.status == "done" and not os.path.exists(job.path):
+                return None
+        if job.user_id != user_id:
+            return None
+        return job
+
+    # --- Trạng thái job trên đĩa ---
+    def _file_path(self, job_id: str, format: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{format}")
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: ExportJob):
+        path = self._record_path(job.id)
+        with open(path + ".tmp", "w", encoding="utf-8") as record:
+            json.dump(job.to_record(), record, default=str)
+        os.replace(path + ".tmp", path)
+
+    def _load(self, job_id: str) -> Optional[ExportJob]:
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._record_path(job_id), encoding="utf-8") as record:
+                job = ExportJob.from_record(json.load(record))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning("Không đọc được trạng thái job xuất file", extra={"job_id": job_id})
+            return None
+        if job.status == "done":
+            job.path = self._file_path(job.id, job.format)
+        return job
+
+    def _run(self, job: ExportJob, session_factory: Callable[[], Session]):
+        job.status = "running"
+        final_path = self._file_path(job.id, job.format)
+        part_path = final_path + ".part"
+        rows_path = final_path + ".rows"
+        try:
+            db = session_factory()
+            try:
+                query = exports.build_export_query(db, job.user_id, **job.filters)
+                job.total_rows = query.order_by(None).count()
+
+                if job.format == "xlsx":
+                    # Đọc + định dạng dòng ở thread này, ghi ra file trung gian
+                    with open(rows_path, "w", encoding="utf-8") as rows_file:
+                        for row in exports.iter_export_rows(query):
+                            rows_file.write(json.dumps(row, ensure_ascii=False))
+                            rows_file.write("\n")
+                            job.rows_written += 1
+            finally:
+                db.close()
+
+            if job.format == "xlsx":
+                job.status = "rendering"
+                self._process_pool().submit(render_xlsx_file, rows_path, part_path).result()
+            else:
+                in_quotes = False
+                with open(part_path, "wb") as out:
+                    for chunk in exports.stream_raw_export(
+                        job.user_id, job.format, session_factory=session_factory, **job.filters
+                    ):
+                        out.write(chunk)
+                        if job.format == "csv":
+                            records, in_quotes = count_csv_records(chunk, in_quotes)
+                            job.rows_written += records
+                        else:
+                            # NDJSON: xuống dòng trong chuỗi JSON đã được escape
+                            job.rows_written += chunk.count(b"\n")
+                if job.format == "csv":
+                    job.rows_written -= 1 # dòng tiêu đề
+
+            digest = hashlib.sha256()
+            with open(part_path, "rb") as result:
+                for block in iter(lambda: result.read(exports.CHUNK_SIZE), b""):
+                    digest.update(block)
+            os.replace(part_path, final_path)
+
+            job.path = final_path
+            job.size_bytes = os.path.getsize(final_path)
+            job.etag = f'"{digest.hexdigest()}"'
+            job.finished_at = datetime.datetime.now()
+            job.expires_at = job.finished_at + datetime.timedelta(seconds=self.ttl_seconds)
+            job.status = "done"
+            logger.info("Xuất file xong", extra={"job_id": job.id, "rows": job.total_rows, "bytes": job.size_bytes})
+        except Exception:
+            job.status = "failed"
+            job.error = "Xuất file thất bại."
+            job.finished_at = datetime.datetime.now()
+            job.expires_at = job.finished_at + datetime.timedelta(seconds=self.ttl_seconds)
+            logger.exception("Lỗi khi xuất file", extra={"job_id": job.id})
+        finally:
+            for leftover in (rows_path, part_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        try:
+            self._save(job)
+        except OSError:
+            logger.exception("Không lưu được trạng thái job xuất file", extra={"job_id": job.id})
+
+    def cleanup_expired(self):
+        """Xóa file và job đã quá TTL; định kỳ quét cả thư mục xuất file (xem _sweep)."""
+        now = datetime.datetime.now()
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.expires_at and job.expires_at <= now]
+            for job in expired:
+                del self._jobs[job.id]
+            sweep = self._last_sweep is None or time.monotonic() - self._last_sweep >= SWEEP_INTERVAL_SECONDS
+            if sweep:
+                self._last_sweep = time.monotonic()
+        for job in expired:
+            self._remove_job_files(job.id, job.format)
+        if sweep:
+            self._sweep(now)
+
+    def _sweep(self, now: datetime.datetime):
+        """
+        Job hết hạn theo file .json (kể cả job của lần chạy trước / worker khác).
+        File không có .json và không thuộc job đang chạy ở đây (job bị gián đoạn khi khởi động lại,
+        file tạm .part/.rows) bị xóa khi đã không đổi quá EXPORT_TTL_SECONDS.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        recorded = set()
+        for name in names:
+            job_id, _, extension = name.partition(".")
+            if extension != "json":
+                continue
+            job = self._load(job_id)
+            if job is None:
+                continue
+            if job.expires_at and job.expires_at <= now:
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+                self._remove_job_files(job_id, job.format)
+            else:
+                recorded.add(job_id)
+
+        cutoff = time.time() - self.ttl_seconds
+        for name in names:
+            job_id = name.partition(".")[0]
+            if job_id in recorded or job_id in self._jobs:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            self._remove(path, job_id)
+
+    def _remove_job_files(self, job_id: str, format: str):
+        self._remove(self._file_path(job_id, format), job_id)
+        self._remove(self._record_path(job_id), job_id)
+
+    @staticmethod
+    def _remove(path: str, job_id: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.warning("Không xóa được file xuất hết hạn", extra={"job_id": job_id, "path": path})
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for job in self._jobs.values():
+                by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {"jobs": by_status, "coalesced": self.coalesced, "ttl_seconds": self.ttl_seconds}
+
+    def shutdown(self):
+        with self._lock:
+            pools = [self._threads, self._processes]
+            self._threads = self._processes = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+
+export_jobs = ExportJobManager(
+    directory=settings.EXPORT_DIR or os.path.join(tempfile.gettempdir(), "expense_tracker_exports"),
+    ttl_seconds=settings.EXPORT_TTL_SECONDS,
+    workers=settings.EXPORT_WORKERS,
+    render_processes=settings.EXPORT_RENDER_PROCESSES,
+)
+atexit.register(export_jobs.shutdown)
@@ -0,0 +1,271 @@
+"""
+Xuất giao dịch ra file (Excel, CSV, NDJSON).
+
+Không nạp toàn bộ dữ liệu vào RAM:
+- Excel: dòng được đọc theo từng lô từ server-side cursor (`yield_per`) và ghi thẳng vào
+  workbook ở chế độ write-only của openpyxl.
+- CSV/NDJSON trên PostgreSQL: `COPY (...) TO STDOUT` qua `copy_expert`, các chunk từ
+  database được chuyển thẳng cho client, không tạo object Python cho từng dòng.
+  Database khác (SQLite khi test) dùng generator đọc theo lô.
+"""
+import csv
+import datetime
+import io
+import json
+import queue
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, Optional
+
+from openpyxl import Workbook
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, aliased
+
+from app.core import periods
+from app.database import models
+from app.database.connection import SessionLocal
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Tên cột của bản xuất dạng máy đọc (csv/ndjson) = nhãn cột trong build_export_query
+RAW_COLUMNS = [
+    "transaction_date", "description", "category_name",
+    "source_account_name", "destination_account_name", "type", "amount",
+]
+
+EXPORT_COLUMNS = ["Ngày giao dịch", "Mô tả", "Danh mục", "Tài khoản", "Loại", "Số tiền"]
+
+# Số dòng đọc mỗi lần từ cursor
+FETCH_SIZE = 2000
+# Kích thước mỗi chunk gửi về client
+CHUNK_SIZE = 64 * 1024
+
+TYPE_LABELS = {
+    models.TransactionType.EXPENSE: "Chi tiêu",
+    models.TransactionType.INCOME: "Thu nhập",
+    models.TransactionType.TRANSFER: "Chuyển tiền",
+}
+
+
+def build_export_query(
+    db: Session,
+    user_id: int,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    account_id: Optional[int] = None,
+):
+    """Truy vấn các dòng cần xuất (mới nhất trước), kèm tên danh mục và tài khoản."""
+    # Alias cho bảng Account khi join lần thứ hai (tài khoản đích)
+    AccountDestination = aliased(models.Account)
+
+    query = db.query(
+        models.Transaction.transaction_date,
+        models.Transaction.description,
+        models.Category.name.label("category_name"),
+        models.Account.name.label("source_account_name"),
+        AccountDestination.name.label("destination_account_name"),
+        models.Transaction.type,
+        models.Transaction.amount
+    ).outerjoin(models.Category, models.Transaction.category_id == models.Category.id)\
+     .join(models.Account, models.Transaction.source_account_id == models.Account.id)\
+     .outerjoin(AccountDestination, models.Transaction.destination_account_id == AccountDestination.id)\
+     .filter(
+        models.Transaction.user_id == user_id,
+        periods.within(models.Transaction.transaction_date, periods.date_range_bounds(start_date, end_date))
+     )
+
+    if account_id:
+        # Tài khoản được chọn là tài khoản nguồn HOẶC tài khoản đích
+        query = query.filter(or_(
+            models.Transaction.source_account_id == account_id,
+            models.Transaction.destination_account_id == account_id
+        ))
+
+    return query.order_by(models.Transaction.transaction_date.desc(), models.Transaction.id.desc())
+
+
+def format_export_row(row) -> list:
+    """Chuyển một dòng truy vấn thành các ô theo đúng thứ tự EXPORT_COLUMNS."""
+    is_transfer = row.type == models.TransactionType.TRANSFER
+
+    account_info = row.source_account_name
+    # Chuyển khoản thì hiển thị cả tài khoản đích
+    if is_transfer:
+        account_info = f"{row.source_account_name} -> {row.destination_account_name or 'Không rõ'}"
+
+    return [
+        row.transaction_date.strftime("%Y-%m-%d %H:%M"),
+        row.description,
+        row.category_name or ("Chuyển khoản" if is_transfer else "Không có"),
+        account_info,
+        TYPE_LABELS.get(row.type, str(row.type)),
+        float(row.amount),
+    ]
+
+
+def iter_export_rows(query) -> Iterator[list]:
+    """Đọc dòng theo từng lô FETCH_SIZE (server-side cursor trên PostgreSQL)."""
+    for row in query.yield_per(FETCH_SIZE):
+        yield format_export_row(row)
+
+
+def write_xlsx(rows: Iterable[list], fileobj):
+    """Ghi các dòng vào workbook write-only (không giữ các ô trong RAM)."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Giao dịch")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(fileobj)
+
+
+def stream_xlsx_export(user_id: int, session_factory: Callable[[], Session] = None, **filters) -> Iterator[bytes]:
+    """
+    Generator cho StreamingResponse.
+    Mở session riêng (mặc định SessionLocal) vì session của request có thể đã đóng khi
+    body bắt đầu được gửi.
+    File xlsx là một file zip nên chỉ gửi được khi sheet đã ghi xong; phần dữ liệu
+    nằm trong file tạm trên đĩa và được đọc ra theo từng chunk.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        db = (session_factory or SessionLocal)()
+        try:
+            write_xlsx(iter_export_rows(build_export_query(db, user_id, **filters)), tmp)
+        finally:
+            db.close()
+
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+# --- CSV / NDJSON ---
+
+class _ExportCancelled(Exception):
+    """Client ngắt kết nối giữa chừng -> dừng COPY."""
+
+
+class _QueueWriter:
+    """File-like object cho copy_expert: mỗi lần write() đẩy chunk vào queue (có giới hạn)."""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        while True:
+            if self.cancelled.is_set():
+                raise _ExportCancelled()
+            try:
+                self.chunks.put(data, timeout=0.5)
+                return len(data)
+            except queue.Full:
+                continue
+
+
+def _copy_sql(db: Session, query, fmt: str) -> str:
+    """Ghép câu COPY từ truy vấn xuất (tham số được escape bởi chính psycopg2)."""
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    raw_connection = db.connection().connection.dbapi_connection
+    with raw_connection.cursor() as cursor:
+        select_sql = cursor.mogrify(str(compiled), compiled.params).decode("utf-8")
+
+    if fmt == "csv":
+        return f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+    # NDJSON: mỗi dòng là row_to_json(...). Dùng FORMAT csv với QUOTE/DELIMITER là
+    # ký tự điều khiển không bao giờ xuất hiện trong JSON để COPY không escape gì thêm
+    # (FORMAT text sẽ nhân đôi dấu \ trong chuỗi JSON).
+    return (
+        f"COPY (SELECT row_to_json(t) FROM ({select_sql}) t) TO STDOUT "
+        f"WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')"
+    )
+
+
+def _stream_copy(db: Session, query, fmt: str) -> Iterator[bytes]:
+    """Chạy COPY ở thread riêng, generator lấy chunk từ queue và trả về cho StreamingResponse."""
+    chunks: queue.Queue = queue.Queue(maxsize=64)
+    cancelled = threading.Event()
+    done = object()
+    errors = []
+    sql = _copy_sql(db, query, fmt)
+    raw_connection = db.connection().connection.dbapi_connection
+
+    def _run():
+        try:
+            with raw_connection.cursor() as cursor:
+                cursor.copy_expert(sql, _QueueWriter(chunks, cancelled), size=CHUNK_SIZE)
+        except _ExportCancelled:
+            pass
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            while True:
+                try:
+                    chunks.put(done, timeout=0.5)
+                    break
+                except queue.Full:
+                    if cancelled.is_set():
+                        break
+
+    worker = threading.Thread(target=_run, name="export-copy", daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        cancelled.set()
+        worker.join()
+    if errors:
+        raise errors[0]
+
+
+def _stream_rows(query, fmt: str) -> Iterator[bytes]:
+    """Dự phòng cho database không có COPY: đọc theo lô, mỗi lô thành một chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(RAW_COLUMNS)
+
+    for index, row in enumerate(query.yield_per(FETCH_SIZE), start=1):
+        values = dict(zip(RAW_COLUMNS, row))
+        values["type"] = row.type.value
+        if fmt == "csv":
+            values["transaction_date"] = row.transaction_date.isoformat(sep=" ")
+            writer.writerow(values.values())
+        else:
+            values["transaction_date"] = row.transaction_date.isoformat()
+            values["amount"] = float(row.amount)
+            buffer.write(json.dumps(values, ensure_ascii=False))
+            buffer.write("\n")
+        if index % FETCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_raw_export(
+    user_id: int, fmt: str, session_factory: Callable[[], Session] = None, **filters
+) -> Iterator[bytes]:
+    """Generator cho StreamingResponse khi format là csv hoặc ndjson."""
+    db = (session_factory or SessionLocal)()
+    try:
+        query = build_export_query(db, user_id, **filters)
+        if db.get_bind().dialect.name == "postgresql":
+            yield from _stream_copy(db, query, fmt)
+        else:
+            yield from _stream_rows(query, fmt)
+    finally:
+        db.close()
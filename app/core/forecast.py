@@ -0,0 +1,270 @@
+"""
+Dự báo số dư từng tài khoản theo ngày (GET /reports/forecast).
+
+Dòng tiền dự kiến được dựng trên một ma trận NumPy (ngày x tài khoản):
+- Các lần chạy sắp tới của giao dịch định kỳ (tính bằng app/core/recurrence, không truy vấn
+  theo từng lần chạy), cộng vào ma trận bằng np.add.at
+- Mức chi trung bình mỗi ngày theo (danh mục, tài khoản) của các giao dịch KHÔNG định kỳ
+  trong FORECAST_LOOKBACK_DAYS ngày gần nhất, trừ đều cho mọi ngày
+Số dư = số dư hiện tại + cumsum theo trục ngày.
+
+Kết quả được cache theo user và phiên bản dữ liệu (users.data_version), nên cũ đi khi dữ liệu
+của user đó được commit - ở tiến trình này hay tiến trình khác (app/core/changes.py) - hoặc sang ngày mới.
+"""
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import changes, periods, recurrence
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.database import models
+
+
+def _signed_flows(item, account_index: dict):
+    """(chỉ số tài khoản, số tiền có dấu) mà một lần chạy của khoản định kỳ tạo ra."""
+    amount = float(item.amount)
+    source = account_index[item.source_account_id]
+    if item.type == models.TransactionType.INCOME:
+        return [(source, amount)]
+    if item.type == models.TransactionType.TRANSFER and item.destination_account_id:
+        return [(source, -amount), (account_index[item.destination_account_id], amount)]
+    return [(source, -amount)]
+
+
+def _run_rates(db: Session, user_id: int, today: datetime.date, lookback_days: int):
+    """Mức chi trung bình mỗi ngày theo (danh mục, tài khoản nguồn) của giao dịch không định kỳ."""
+    window_start = today - datetime.timedelta(days=lookback_days)
+    window = periods.date_range_bounds(window_start, today - datetime.timedelta(days=1))
+    rows = db.query(
+        models.Transaction.category_id,
+        models.Category.name.label("category_name"),
+        models.Transaction.source_account_id,
+        func.sum(models.Transaction.amount).label("total"),
+        func.min(models.Transaction.transaction_date).label("first_date")
+    ).outerjoin(models.Category, models.Transaction.category_id == models.Category.id).filter(
+        models.Transaction.user_id == user_id,
+        models.Transaction.type == models.TransactionType.EXPENSE,
+        models.Transaction.recurring_id.is_(None),
+        periods.within(models.Transaction.transaction_date, window)
+    ).group_by(
+        models.Transaction.category_id, models.Category.name, models.Transaction.source_account_id
+    ).all()
+    if not rows:
+        return rows, 0
+
+    # User mới có ít lịch sử hơn lookback_days: chia cho số ngày thực sự có dữ liệu
+    first_date = min(row.first_date for row in rows)
+    first_day = first_date.date() if isinstance(first_date, datetime.datetime) else first_date
+    observed_days = max((today - max(window_start, first_day)).days, 1)
+    return rows, observed_days
+
+
+def compute_forecast(db: Session, user_id: int, days: int, today: Optional[datetime.date] = None) -> dict:
+    """Số dư dự kiến cuối mỗi ngày, từ ngày mai đến hết `days` ngày (không cache)."""
+    today = today or datetime.datetime.now().date()
+    first_day = today + datetime.timedelta(days=1)
+    end_day = first_day + datetime.timedelta(days=days)
+
+    accounts = db.query(models.Account).filter(
+        models.Account.user_id == user_id
+    ).order_by(models.Account.id).all()
+    account_index = {account.id: index for index, account in enumerate(accounts)}
+    current = np.array([float(account.current_balance or 0) for account in accounts], dtype=np.float64)
+    flows = np.zeros((days, len(accounts)), dtype=np.float64)
+
+    # 1. Giao dịch định kỳ: gom (ngày, tài khoản, số tiền) rồi cộng vào ma trận một lần
+    items = db.query(models.RecurringTransaction).filter(
+        models.RecurringTransaction.user_id == user_id,
+        models.RecurringTransaction.is_active == True
+    ).all()
+    day_idx, account_idx, amounts = [], [], []
+    recurring_total = 0
+    for item in items:
+        needed = [item.source_account_id]
+        if item.type == models.TransactionType.TRANSFER and item.destination_account_id:
+            needed.append(item.destination_account_id)
+        if any(account_id not in account_index for account_id in needed):
+            continue
+        next_run = item.next_run_date.date()
+        offsets = np.fromiter(
+            ((run_at - first_day).days for run_at in recurrence.pending_occurrences(
+                item.start_date.date(), item.frequency, next_run, next_run, end_day, item.interval or 1
+            )),
+            dtype=np.int64,
+        )
+        if not offsets.size:
+            continue
+        # Lần chạy đã đến hạn nhưng chưa được scheduler xử lý -> tính vào ngày đầu tiên
+        offsets = np.maximum(offsets, 0)
+        recurring_total += offsets.size
+        for column, amount in _signed_flows(item, account_index):
+            day_idx.append(offsets)
+            account_idx.append(np.full(offsets.size, column, dtype=np.int64))
+            amounts.append(np.full(offsets.size, amount, dtype=np.float64))
+    if day_idx:
+        np.add.at(flows, (np.concatenate(day_idx), np.concatenate(account_idx)), np.concatenate(amounts))
+
+    # 2. Mức chi trung bình (không định kỳ), trừ đều cho mọi ngày
+    rate_rows, observed_days = _run_rates(db, user_id, today, settings.FORECAST_LOOKBACK_DAYS)
+    daily_rate = np.zeros(len(accounts), dtype=np.float64)
+    by_category = {}
+    for row in rate_rows:
+        average = float(row.total) / observed_days
+        if row.source_account_id in account_index:
+            daily_rate[account_index[row.source_account_id]] += average
+        entry = by_category.setdefault(row.category_id, {
+            "category_id": row.category_id,
+            "category_name": row.category_name or "Không có",
+            "daily_average": 0.0,
+        })
+        entry["daily_average"] += average
+    flows -= daily_rate[np.newaxis, :]
+
+    # 3. Số dư cuối mỗi ngày
+    balances = current[np.newaxis, :] + np.cumsum(flows, axis=0)
+    totals = balances.sum(axis=1)
+    dates = [(first_day + datetime.timedelta(days=offset)).isoformat() for offset in range(days)]
+
+    account_summaries = []
+    if accounts:
+        min_rows = balances.argmin(axis=0)
+        for column, account in enumerate(accounts):
+            account_summaries.append({
+                "id": account.id,
+                "name": account.name,
+                "current_balance": round(float(current[column]), 2),
+                "end_balance": round(float(balances[-1, column]), 2),
+                "min_balance": round(float(balances[min_rows[column], column]), 2),
+                "min_balance_date": dates[min_rows[column]],
+            })
+
+    return {
+        "start_date": dates[0],
+        "end_date": dates[-1],
+        "days": days,
+        "accounts": account_summaries,
+        "daily": [
+            {
+                "date": dates[row],
+                "total_balance": round(float(totals[row]), 2),
+                "balances": [round(value, 2) for value in balances[row].tolist()],
+            }
+            for row in range(days)
+        ],
+        "recurring_occurrences": recurring_total,
+        "run_rate": {
+            "lookback_days": observed_days,
+            "daily_expense": round(float(daily_rate.sum()), 2),
+            "by_category": sorted(
+                ({**entry, "daily_average": round(entry["daily_average"], 2)} for entry in by_category.values()),
+                key=lambda entry: entry["daily_average"],
+                reverse=True,
+            ),
+        },
+    }
+
+
+class ForecastCache:
+    """
+    Cache LRU: (user_id, số ngày, hôm nay, data_version) -> kết quả dự báo.
+    Không có TTL: kết quả chỉ cũ đi khi dữ liệu của user thay đổi hoặc sang ngày mới
+    (khóa chứa ngày hôm nay). Thay đổi trong tiến trình này xóa cache ngay (qua changes);
+    thay đổi từ tiến trình khác làm tăng users.data_version nên khóa mới không trùng kết quả cũ
+    (chậm nhất sau DATA_VERSION_CACHE_TTL_SECONDS, như report_cache).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        # Số lần dữ liệu của từng user bị thay đổi: kết quả tính xong sau một lần thay đổi
+        # (bắt đầu tính trước đó) sẽ không được lưu
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, key: tuple, result: dict, generation: int):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if self._generations.get(key[0], 0) != generation:
+                return
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_users(self, user_ids: Set[int]):
+        with self._lock:
+            for user_id in user_ids:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            stale = [key for key in self._entries if key[0] in user_ids]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+forecast_cache = ForecastCache(max_size=settings.FORECAST_CACHE_MAX_SIZE)
+changes.subscribe(forecast_cache.invalidate_users)
+# Các request dự báo trùng nhau đang chạy đồng thời chỉ tính một lần
+forecast_flights = SingleFlight()
+
+
+async def get_forecast(db: AsyncSession, user_id: int, days: int) -> dict:
+    """Dự báo có cache (xem ForecastCache); phần tính chạy qua AsyncSession.run_sync."""
+    today = datetime.datetime.now().date()
+    key = (user_id, days, today, await changes.get_data_version(db, user_id))
+    result = forecast_cache.get(key)
+    if result is None:
+        result = await forecast_flights.do(key, lambda: db.run_sync(_compute_and_store, key))
+    return result
+
+
+def _compute_and_store(db: Session, key: tuple) -> dict:
+    user_id, days, today, _version = key
+    generation = forecast_cache.generation(user_id)
+    result = compute_forecast(db, user_id, days, today=today)
+    forecast_cache.put(key, result, generation)
+    return result
@@ -0,0 +1,138 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+
+# Request ID của request hiện tại (được middleware trong main.py gán)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Các thuộc tính có sẵn của LogRecord, không đưa vào phần "extra" của log JSON
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+class JsonFormatter(logging.Formatter):
+    """Ghi mỗi bản ghi log thành một dòng JSON (dễ đọc bằng máy, dễ lọc trên Render)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        # Các trường truyền qua extra={...}
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Gắn request_id vào bản ghi. Chạy trên luồng xử lý request (trước khi vào hàng đợi)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "request_id", None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Lấy mẫu các bản ghi DEBUG (sự kiện tần suất cao như kiểm tra token mỗi request).
+    Các mức INFO trở lên luôn được giữ lại.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler giữ nguyên các trường extra khi đưa bản ghi sang luồng ghi log."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Gộp args vào message và định dạng traceback ngay tại đây,
+        # để luồng ghi log không cần truy cập các đối tượng của request.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(raw: str) -> dict:
+    """'app.core.deps=WARNING,app.routers.recurring=DEBUG' -> {tên logger: mức}"""
+    levels = {}
+    for item in (raw or "").split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """
+    Cấu hình logging có cấu trúc (JSON) không chặn luồng request:
+    request -> QueueHandler (chỉ đưa vào hàng đợi) -> QueueListener (luồng riêng) -> stdout.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # Mức log riêng cho từng module
+    for name, level in _parse_levels(settings.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Xả hết hàng đợi log trước khi tiến trình kết thúc."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,29 @@
+"""
+Con trỏ (cursor) cho phân trang keyset.
+
+Cursor là chuỗi base64 (URL-safe) mờ đục mã hóa khóa sắp xếp của bản ghi cuối cùng
+trong trang hiện tại: (transaction_date, id). Trang tiếp theo "nhảy" thẳng tới vị trí đó
+bằng so sánh theo bộ giá trị (row-value), nên chi phí không tăng theo độ sâu trang và
+không bị lệch khi có giao dịch mới được thêm vào trong lúc cuộn.
+"""
+import base64
+import binascii
+import datetime
+from typing import Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(transaction_date: datetime.datetime, id: int) -> str:
+    raw = f"{transaction_date.isoformat()}|{id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        date_part, id_part = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(date_part), int(id_part)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor không hợp lệ")
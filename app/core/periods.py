@@ -0,0 +1,69 @@
+"""
+Chuyển các khoảng thời gian (ngày, tuần, tháng, năm, khoảng tùy ý) thành cận
+nửa mở [start, end) dạng datetime.
+
+Lọc theo `transaction_date >= start AND transaction_date < end` (thay vì
+extract('month') / extract('year') hay so sánh <= với một ngày) giúp index trên
+transaction_date được sử dụng và không bỏ sót giao dịch trong ngày cuối.
+"""
+import datetime
+from typing import Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import and_, true
+
+Bounds = Tuple[datetime.datetime, datetime.datetime]
+
+
+def _start_of_day(value) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return datetime.datetime(value.year, value.month, value.day)
+
+
+def day_bounds(day) -> Bounds:
+    """Một ngày: [00:00 hôm đó, 00:00 hôm sau)"""
+    start = _start_of_day(day)
+    return start, start + datetime.timedelta(days=1)
+
+
+def week_bounds(day) -> Bounds:
+    """Tuần chứa ngày `day` (bắt đầu từ Thứ 2)"""
+    start = _start_of_day(day)
+    start -= datetime.timedelta(days=start.weekday())
+    return start, start + datetime.timedelta(days=7)
+
+
+def month_bounds(month: int, year: int) -> Bounds:
+    """Một tháng dương lịch"""
+    start = datetime.datetime(year, month, 1)
+    return start, start + relativedelta(months=1)
+
+
+def year_bounds(year: int) -> Bounds:
+    """Một năm dương lịch"""
+    start = datetime.datetime(year, 1, 1)
+    return start, start + relativedelta(years=1)
+
+
+def date_range_bounds(start_date=None, end_date=None) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
+    """
+    Khoảng ngày do người dùng chọn (tính cả ngày cuối): [start_date 00:00, end_date + 1 ngày 00:00).
+    Cận nào không truyền vào thì trả về None (không giới hạn phía đó).
+    """
+    start = _start_of_day(start_date) if start_date else None
+    end = _start_of_day(end_date) + datetime.timedelta(days=1) if end_date else None
+    return start, end
+
+
+def within(column, bounds):
+    """Điều kiện SQL `column >= start AND column < end` (bỏ qua cận None)"""
+    start, end = bounds
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    if not conditions:
+        return true()
+    return and_(*conditions)
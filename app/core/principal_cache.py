@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.database import models
+
+
+class UserSnapshot:
+    """
+    Bản chụp (snapshot) các trường của User mà API cần.
+    Không gắn với Session nên có thể dùng lại an toàn giữa các request.
+    """
+    __slots__ = ("id", "username", "email", "full_name", "created_at")
+
+    def __init__(self, id, username, email, full_name, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.full_name = full_name
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "UserSnapshot":
+        return cls(user.id, user.username, user.email, user.full_name, user.created_at)
+
+
+class PrincipalCache:
+    """
+    Cache LRU có TTL: token (dạng hash) -> UserSnapshot.
+    Giúp get_current_user bỏ qua bước giải mã JWT và truy vấn bảng users
+    cho các request lặp lại với cùng một token.
+    Việc xóa khi User bị sửa/xóa (sự kiện ORM bên dưới) chỉ có hiệu lực trong tiến trình này:
+    worker khác vẫn dùng snapshot cũ đến khi hết TTL (PRINCIPAL_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, snapshot)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # Không giữ token gốc trong bộ nhớ, chỉ giữ hash
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        key = self._key(token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, snapshot: UserSnapshot, token_exp: Optional[float] = None):
+        """Lưu snapshot. Không bao giờ giữ lâu hơn thời điểm hết hạn của chính token ('exp')."""
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        ttl = self.ttl_seconds
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Xóa mọi token đang cache của một user (khi user bị sửa hoặc xóa)."""
+        with self._lock:
+            stale = [key for key, (_, snapshot) in self._entries.items() if snapshot.id == user_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+# --- TỰ ĐỘNG VÔ HIỆU HÓA CACHE KHI USER THAY ĐỔI ---
+# Bắt sự kiện ORM nên mọi đường ghi (router, script, admin) đều được áp dụng
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_user_snapshot(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
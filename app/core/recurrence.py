@@ -0,0 +1,117 @@
+"""
+Tính toán lịch lặp của giao dịch định kỳ bằng công thức trực tiếp (O(1)),
+không đi từng chu kỳ một từ start_date.
+
+Mọi lần chạy đều neo vào start_date: lần thứ n = start + n * interval * (đơn vị của frequency).
+Nhờ vậy ngày cuối tháng không bị "trôi": lịch bắt đầu 31/01 chạy 28/02 (hoặc 29/02), rồi 31/03,
+thay vì 28/03 như khi cộng dồn từng tháng.
+"""
+import datetime
+from typing import Iterator, Optional, Union
+
+from dateutil.relativedelta import relativedelta
+
+from app.database.models import FrequencyType
+
+DateLike = Union[datetime.date, datetime.datetime]
+
+# Số ngày của một chu kỳ với các tần suất có độ dài cố định
+_FIXED_DAYS = {
+    FrequencyType.DAILY: 1,
+    FrequencyType.WEEKLY: 7,
+}
+# Số tháng của một chu kỳ với các tần suất theo lịch
+_CALENDAR_MONTHS = {
+    FrequencyType.MONTHLY: 1,
+    FrequencyType.YEARLY: 12,
+}
+
+
+def _as_datetime(value: DateLike) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.combine(value, datetime.time())
+
+
+def nth_occurrence(start: DateLike, frequency: FrequencyType, n: int, interval: int = 1) -> DateLike:
+    """Lần chạy thứ n (n = 0 là chính start). Cùng kiểu (date/datetime) với start."""
+    frequency = FrequencyType(frequency)
+    if frequency in _FIXED_DAYS:
+        return start + datetime.timedelta(days=_FIXED_DAYS[frequency] * interval * n)
+    # relativedelta tự kẹp ngày về cuối tháng nếu tháng đích ngắn hơn (31/01 + 1 tháng = 28/02)
+    return start + relativedelta(months=_CALENDAR_MONTHS[frequency] * interval * n)
+
+
+def index_on_or_after(start: DateLike, frequency: FrequencyType, when: DateLike, interval: int = 1) -> int:
+    """Chỉ số n nhỏ nhất sao cho nth_occurrence(n) >= when."""
+    frequency = FrequencyType(frequency)
+    start_dt, when_dt = _as_datetime(start), _as_datetime(when)
+    if when_dt <= start_dt:
+        return 0
+
+    if frequency in _FIXED_DAYS:
+        step = datetime.timedelta(days=_FIXED_DAYS[frequency] * interval)
+        n = -(-(when_dt - start_dt) // step)  # chia lấy trần
+    else:
+        months = (when_dt.year - start_dt.year) * 12 + (when_dt.month - start_dt.month)
+        n = max(months // (_CALENDAR_MONTHS[frequency] * interval), 0)
+
+    # Ước lượng lệch tối đa một chu kỳ (do ngày trong tháng / giờ trong ngày) -> chỉnh lại
+    while _as_datetime(nth_occurrence(start_dt, frequency, n, interval)) < when_dt:
+        n += 1
+    while n > 0 and _as_datetime(nth_occurrence(start_dt, frequency, n - 1, interval)) >= when_dt:
+        n -= 1
+    return n
+
+
+def next_on_or_after(start: DateLike, frequency: FrequencyType, when: DateLike, interval: int = 1) -> DateLike:
+    """Lần chạy đầu tiên rơi vào `when` hoặc sau đó."""
+    return nth_occurrence(start, frequency, index_on_or_after(start, frequency, when, interval), interval)
+
+
+def next_after(start: DateLike, frequency: FrequencyType, when: DateLike, interval: int = 1) -> DateLike:
+    """Lần chạy đầu tiên sau hẳn `when`."""
+    n = index_on_or_after(start, frequency, when, interval)
+    if _as_datetime(nth_occurrence(start, frequency, n, interval)) <= _as_datetime(when):
+        n += 1
+    return nth_occurrence(start, frequency, n, interval)
+
+
+def occurrences_between(
+    start: DateLike,
+    frequency: FrequencyType,
+    range_start: DateLike,
+    range_end: DateLike,
+    interval: int = 1,
+    limit: Optional[int] = None,
+) -> Iterator[DateLike]:
+    """Các lần chạy trong khoảng nửa mở [range_start, range_end)."""
+    n = index_on_or_after(start, frequency, range_start, interval)
+    end = _as_datetime(range_end)
+    count = 0
+    while limit is None or count < limit:
+        occurrence = nth_occurrence(start, frequency, n, interval)
+        if _as_datetime(occurrence) >= end:
+            return
+        yield occurrence
+        n += 1
+        count += 1
+
+
+def pending_occurrences(
+    start: DateLike,
+    frequency: FrequencyType,
+    next_run: DateLike,
+    range_start: DateLike,
+    range_end: DateLike,
+    interval: int = 1,
+) -> Iterator[DateLike]:
+    """
+    Các lần chạy chưa được tạo thành giao dịch trong [range_start, range_end):
+    lần đầu là next_run đang lưu, các lần sau neo vào start (sau hẳn next_run).
+    """
+    if _as_datetime(range_start) <= _as_datetime(next_run) < _as_datetime(range_end):
+        yield next_run
+    for occurrence in occurrences_between(start, frequency, max(range_start, next_run), range_end, interval):
+        if _as_datetime(occurrence) > _as_datetime(next_run):
+            yield occurrence
@@ -0,0 +1,253 @@
+"""
+Xử lý các khoản chi tiêu định kỳ đã đến hạn: tạo giao dịch thật, cập nhật số dư,
+bảng tổng hợp và lịch chạy tiếp theo.
+
+Được gọi bởi scheduler nền (app/core/scheduler.py), endpoint POST /internal/recurring/run
+và script `python -m scripts.process_recurring`. GET /recurring chỉ đọc.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core import balances, changes, recurrence, rollups
+from app.database import models
+
+logger = logging.getLogger(__name__)
+
+# Số dòng tối đa trong một câu INSERT nhiều dòng (giới hạn số tham số của driver)
+INSERT_CHUNK_SIZE = 2000
+
+
+def due_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Một khoản đến hạn khi next_run_date rơi vào hôm nay hoặc trước đó (< 0h ngày mai)."""
+    now = now or datetime.now()
+    return datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+
+def next_due_at(db: Session) -> Optional[datetime]:
+    """Thời điểm sớm nhất có khoản định kỳ đến hạn (dùng index một phần ix_recurring_due_next_run)."""
+    earliest = db.query(func.min(models.RecurringTransaction.next_run_date)).filter(
+        models.RecurringTransaction.is_active == True
+    ).scalar()
+    if earliest is None:
+        return None
+    # Khoản định kỳ chạy theo ngày -> đến hạn từ 0h của ngày next_run_date
+    return datetime.combine(earliest.date(), datetime.min.time())
+
+
+def _next_run(item: models.RecurringTransaction, after: datetime) -> datetime:
+    """Lần chạy kế tiếp sau hẳn `after`, neo vào start_date (không trôi ngày cuối tháng)."""
+    return recurrence.next_after(item.start_date, item.frequency, after, item.interval or 1)
+
+
+def missed_occurrences(item: models.RecurringTransaction, now: datetime) -> List[datetime]:
+    """
+    Tất cả các lần chạy chưa xử lý tính đến hôm nay (next_run_date.date() <= now.date()).
+    Lần đầu là next_run_date đang lưu, các lần sau được tính trực tiếp từ start_date.
+    """
+    return list(recurrence.pending_occurrences(
+        item.start_date, item.frequency, item.next_run_date, item.next_run_date, due_cutoff(now), item.interval or 1
+    ))
+
+
+def _insert_occurrences(db: Session, rows: List[dict]) -> Set[Tuple[int, date]]:
+    """
+    Chèn các lần chạy bằng INSERT nhiều dòng (theo từng khối INSERT_CHUNK_SIZE),
+    ON CONFLICT (recurring_id, occurrence_date) DO NOTHING.
+    Trả về tập (recurring_id, occurrence_date) thực sự được chèn; lần chạy đã có giao dịch
+    (do worker khác tạo) bị bỏ qua.
+    """
+    inserted: Set[Tuple[int, date]] = set()
+    if not rows:
+        return inserted
+
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        # Backend khác: lọc các lần chạy đã tồn tại rồi chèn (unique index vẫn là chốt chặn cuối)
+        existing = set(db.query(models.Transaction.recurring_id, models.Transaction.occurrence_date).filter(
+            models.Transaction.recurring_id.in_({row["recurring_id"] for row in rows}),
+            models.Transaction.occurrence_date.in_({row["occurrence_date"] for row in rows})
+        ).all())
+        rows = [row for row in rows if (row["recurring_id"], row["occurrence_date"]) not in existing]
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            db.execute(insert(models.Transaction).values(rows[start:start + INSERT_CHUNK_SIZE]))
+        return {(row["recurring_id"], row["occurrence_date"]) for row in rows}
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        stmt = dialect_insert(models.Transaction).values(rows[start:start + INSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_nothing(index_elements=["recurring_id", "occurrence_date"]).returning(
+            models.Transaction.recurring_id, models.Transaction.occurrence_date
+        )
+        inserted.update((row.recurring_id, row.occurrence_date) for row in db.execute(stmt))
+    return inserted
+
+
+def claim_due_items(db: Session, user_id: Optional[int] = None, limit: Optional[int] = None, now: Optional[datetime] = None):
+    """
+    Nhận (khóa) các khoản đến hạn bằng SELECT ... FOR UPDATE SKIP LOCKED:
+    khoản đang được worker/tiến trình khác xử lý sẽ bị bỏ qua thay vì chờ,
+    nên nhiều worker có thể chạy song song mà không xử lý trùng.
+    Khóa được giữ đến khi commit lô.
+    """
+    query = db.query(models.RecurringTransaction).filter(
+        models.RecurringTransaction.is_active == True,
+        models.RecurringTransaction.next_run_date < due_cutoff(now)
+    )
+    if user_id is not None:
+        query = query.filter(models.RecurringTransaction.user_id == user_id)
+    query = query.order_by(models.RecurringTransaction.next_run_date, models.RecurringTransaction.id)
+    if limit:
+        query = query.limit(limit)
+    return query.with_for_update(skip_locked=True).all()
+
+
+def _process_items(db: Session, items, accounts, now: datetime) -> int:
+    """
+    Tạo giao dịch cho các khoản `items` (tài khoản đã được khóa trong `accounts`).
+    Không commit; trả về số lần chạy đã xử lý (khoản bị vô hiệu hóa tính là 1).
+    """
+    processed_count = 0
+    rows = []
+    items_by_id = {}
+
+    for item in items:
+        is_transfer = item.type == models.TransactionType.TRANSFER and item.destination_account_id
+        needed = [item.source_account_id] + ([item.destination_account_id] if is_transfer else [])
+
+        # Nếu tài khoản nguồn/đích bị xóa, chỉ vô hiệu hóa giao dịch định kỳ này (lưu cùng lô)
+        if any(account_id not in accounts or accounts[account_id].user_id != item.user_id for account_id in needed):
+            item.is_active = False
+            processed_count += 1
+            logger.warning("Vô hiệu hóa giao dịch định kỳ: tài khoản nguồn hoặc đích bị xóa", extra={"recurring_id": item.id})
+            continue
+
+        # Tính trước tất cả các lần chạy bị lỡ
+        occurrences = missed_occurrences(item, now)
+        if not occurrences:
+            continue
+        logger.info(
+            "Tạo giao dịch định kỳ",
+            extra={
+                "recurring_id": item.id, "user_id": item.user_id, "occurrences": len(occurrences),
+                "from": occurrences[0].date().isoformat(), "to": occurrences[-1].date().isoformat(),
+            }
+        )
+
+        description = f"[Định kỳ] {item.description}" if item.description else "[Giao dịch Định kỳ]"
+        for run_at in occurrences:
+            rows.append(dict(
+                user_id=item.user_id,
+                source_account_id=item.source_account_id,
+                destination_account_id=item.destination_account_id,
+                category_id=item.category_id,
+                amount=item.amount,
+                type=item.type,
+                description=description,
+                transaction_date=run_at, # Giữ nguyên ngày giờ của lịch hẹn
+                created_at=datetime.utcnow(),
+                recurring_id=item.id,
+                occurrence_date=run_at.date(),
+            ))
+        items_by_id[item.id] = item
+
+        # Chỉ cập nhật lịch một lần
+        item.next_run_date = _next_run(item, occurrences[-1])
+        processed_count += len(occurrences)
+
+    # Chèn cả lô; lần chạy đã có giao dịch (worker khác) không được tính số dư/tổng hợp lại
+    inserted = _insert_occurrences(db, rows)
+    if len(inserted) < len(rows):
+        logger.info("Bỏ qua các lần chạy định kỳ đã có giao dịch", extra={"skipped": len(rows) - len(inserted)})
+    new_rows = [row for row in rows if (row["recurring_id"], row["occurrence_date"]) in inserted]
+
+    # Một delta tổng cho mỗi tài khoản, bảng tổng hợp cập nhật một lần cho cả lô
+    deltas = defaultdict(Decimal)
+    for row in new_rows:
+        balances.transaction_deltas(items_by_id[row["recurring_id"]], deltas=deltas)
+    balances.apply_balance_deltas(db, deltas)
+    rollups.add_transactions(db, [models.Transaction(**row) for row in new_rows])
+    return processed_count
+
+
+def process_due_transactions(db: Session, user_id: Optional[int] = None, limit: Optional[int] = None):
+    """
+    Kiểm tra và tạo giao dịch cho các khoản định kỳ đã đến hạn (một lô, một lần commit).
+    user_id = None: xử lý cho mọi user (dùng bởi scheduler / CLI).
+    limit: số khoản định kỳ tối đa xử lý trong một lần gọi (một lô).
+
+    Chạy bù cả lô với số câu lệnh gần như cố định, không phụ thuộc số lần chạy bị lỡ:
+    tính trước mọi ngày chạy, chèn bằng INSERT nhiều dòng, mỗi tài khoản nhận một delta
+    tổng, bảng tổng hợp cập nhật một lần và next_run_date chỉ đổi một lần cho mỗi khoản.
+    """
+    # Lấy thời điểm hiện tại
+    now = datetime.now()
+    due_items = claim_due_items(db, user_id=user_id, limit=limit, now=now)
+    if not due_items:
+        return 0
+
+    # 1. Khóa mọi tài khoản liên quan của cả lô trong một câu lệnh (thứ tự id cố định)
+    accounts = balances.lock_accounts(db, None, [
+        account_id
+        for item in due_items
+        for account_id in (item.source_account_id, item.destination_account_id)
+    ])
+
+    # 2. Cả lô trong một savepoint; lỗi ở một khoản chỉ hủy savepoint, sau đó xử lý lại
+    # từng khoản trong savepoint riêng và vô hiệu hóa khoản gây lỗi, phần còn lại vẫn được commit
+    # (nếu không, lô lỗi bị rollback toàn bộ và được nhận lại mãi ở lần chạy sau)
+    try:
+        with db.begin_nested():
+            processed_count = _process_items(db, due_items, accounts, now)
+    except Exception:
+        logger.exception("Lỗi khi xử lý lô giao dịch định kỳ, xử lý lại từng khoản", extra={"user_id": user_id})
+        processed_count = 0
+        for item in due_items:
+            try:
+                with db.begin_nested():
+                    processed_count += _process_items(db, [item], accounts, now)
+            except Exception:
+                item.is_active = False
+                processed_count += 1
+                logger.exception("Vô hiệu hóa giao dịch định kỳ gây lỗi", extra={"recurring_id": item.id})
+
+    # Giao dịch chèn bằng câu lệnh Core không qua ORM -> tự đánh dấu user có dữ liệu thay đổi
+    changes.mark_user_changed(db, {item.user_id for item in due_items})
+
+    try:
+        db.commit()
+        if processed_count:
+            logger.info("Đã tạo giao dịch định kỳ và cập nhật lịch", extra={"user_id": user_id, "processed": processed_count})
+    except Exception:
+        db.rollback()
+        logger.exception("Lỗi khi commit giao dịch định kỳ", extra={"user_id": user_id})
+        # Không có gì được lưu -> báo 0 để vòng lặp theo lô không chạy lại mãi
+        processed_count = 0
+            
+    return processed_count
+
+
+def process_all_due(db: Session, batch_size: int = 100) -> int:
+    """Xử lý toàn bộ khoản đến hạn theo từng lô batch_size (mỗi lô một lần commit)."""
+    total = 0
+    while True:
+        processed = process_due_transactions(db, limit=batch_size)
+        total += processed
+        if processed == 0:
+            break
+        # Lô chưa đầy nghĩa là đã hết khoản đến hạn
+        due_left = db.query(models.RecurringTransaction.id).filter(
+            models.RecurringTransaction.is_active == True,
+            models.RecurringTransaction.next_run_date < due_cutoff()
+        ).first()
+        if due_left is None:
+            break
+    return total
@@ -0,0 +1,254 @@
+"""
+Cache kết quả của các endpoint báo cáo (/reports/dashboard, /reports/detailed).
+
+Kết quả báo cáo chỉ phụ thuộc dữ liệu của user và tham số truy vấn, nên được lưu theo khóa
+(user, phiên bản dữ liệu, endpoint, tham số đã chuẩn hóa) dưới dạng JSON đã mã hóa.
+- Backend mặc định: LRU trong bộ nhớ, giới hạn theo số mục và tổng số byte.
+- REPORT_CACHE_REDIS_URL: dùng chung một Redis (hoặc server tương thích Redis) giữa các
+  worker; cần cài `redis` (phụ thuộc tùy chọn, xem requirements.txt). Lỗi Redis chỉ làm cache
+  trượt, không làm hỏng request. Lệnh Redis (I/O mạng đồng bộ) chạy trong threadpool để không
+  chặn event loop.
+Phiên bản dữ liệu nằm trong khóa, nên sau mỗi lần ghi (app/core/changes.py) khóa mới không trùng
+mục cũ. Backend bộ nhớ xóa ngay các mục của user sau commit (giải phóng bộ nhớ); với Redis các
+mục cũ chỉ hết hạn theo TTL - không gửi lệnh Redis nào trong after_commit (chạy đồng bộ, trên
+event loop với router async).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core import changes
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """LRU trong tiến trình: khóa -> (hết hạn, user_id, JSON bytes)."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _remove(self, key: str):
+        _, user_id, value = self._entries.pop(key)
+        self._bytes -= len(value)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, user_id: int, key: str, value: bytes):
+        if self.max_entries <= 0 or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, user_id, value)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_users(self, user_ids: Set[int]) -> int:
+        with self._lock:
+            stale = [key for user_id in user_ids for key in self._keys_by_user.get(user_id, ())]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._bytes = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class RedisBackend:
+    """
+    Redis dùng chung: mỗi mục có TTL. Không xóa theo user: mục của phiên bản dữ liệu cũ
+    không bao giờ được đọc lại và tự hết hạn.
+    client: truyền sẵn một client tương thích redis-py (VD: fakeredis khi test).
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: int, prefix: str = "report-cache", client=None):
+        if client is None:
+            import redis  # Phụ thuộc tùy chọn, chỉ cần khi cấu hình REPORT_CACHE_REDIS_URL
+
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(f"{self.prefix}:{key}")
+        except Exception:
+            self.errors += 1
+            logger.warning("Không đọc được cache báo cáo từ Redis", exc_info=True)
+            return None
+
+    def set(self, user_id: int, key: str, value: bytes):
+        try:
+            self.client.set(f"{self.prefix}:{key}", value, ex=self.ttl_seconds)
+        except Exception:
+            self.errors += 1
+            logger.warning("Không ghi được cache báo cáo vào Redis", exc_info=True)
+
+    def invalidate_users(self, user_ids: Set[int]) -> int:
+        # Gọi từ after_commit (đồng bộ): không chặn bằng I/O mạng, để TTL dọn mục cũ
+        return 0
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}:*"))
+            if keys:
+                self.client.delete(*keys)
+        except Exception:
+            self.errors += 1
+            logger.warning("Không xóa được cache báo cáo trên Redis", exc_info=True)
+
+    def stats(self) -> dict:
+        stats = {"errors": self.errors}
+        try:
+            stats["used_memory"] = self.client.info("memory").get("used_memory")
+        except Exception:
+            stats["used_memory"] = None
+        return stats
+
+
+class ReportCache:
+    def __init__(self, backend):
+        self.backend = backend
+        # Các request trùng khóa đến khi chưa có trong cache: chỉ một request tính
+        self.flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(user_id: int, version: int, endpoint: str, params: dict) -> str:
+        """Tham số được chuẩn hóa (sắp xếp khóa, giá trị dạng chuỗi) trước khi hash."""
+        normalized = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+        return f"{user_id}:v{version}:{endpoint}:{digest}"
+
+    async def memoize(
+        self, db: AsyncSession, user_id: int, endpoint: str, params: dict, compute: Callable[[Session], dict]
+    ):
+        """
+        Trả kết quả đã cache nếu có, nếu không thì tính bằng compute(session) và lưu lại.
+        compute là hàm đồng bộ (truy vấn kiểu Session), chạy qua AsyncSession.run_sync.
+        """
+        key = self.make_key(user_id, await changes.get_data_version(db, user_id), endpoint, params)
+        cached = await self._call_backend(self.backend.get, key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return json.loads(cached)
+
+        with self._lock:
+            self.misses += 1
+        return await self.flights.do(key, lambda: self._compute_and_store(db, user_id, key, compute))
+
+    async def _compute_and_store(self, db: AsyncSession, user_id: int, key: str, compute: Callable[[Session], dict]):
+        result = await db.run_sync(compute)
+        value = json.dumps(jsonable_encoder(result), separators=(",", ":")).encode("utf-8")
+        await self._call_backend(self.backend.set, user_id, key, value)
+        return result
+
+    async def _call_backend(self, method, *args):
+        # LRU trong bộ nhớ gọi thẳng; Redis chạy trong threadpool
+        if self.backend.name == "redis":
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    def invalidate_users(self, user_ids: Set[int]):
+        removed = self.backend.invalidate_users(user_ids)
+        with self._lock:
+            self.invalidations += removed
+
+    def clear(self):
+        self.backend.clear()
+        self.flights.reset()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                "backend": self.backend.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+        stats.update(self.backend.stats())
+        stats["single_flight"] = self.flights.stats()
+        return stats
+
+
+def _create_backend():
+    if settings.REPORT_CACHE_REDIS_URL:
+        try:
+            return RedisBackend(settings.REPORT_CACHE_REDIS_URL, settings.REPORT_CACHE_TTL_SECONDS)
+        except ImportError:
+            logger.warning("Chưa cài thư viện redis -> cache báo cáo dùng bộ nhớ trong tiến trình")
+    return MemoryBackend(
+        max_entries=settings.REPORT_CACHE_MAX_ENTRIES,
+        max_bytes=settings.REPORT_CACHE_MAX_BYTES,
+        ttl_seconds=settings.REPORT_CACHE_TTL_SECONDS,
+    )
+
+
+report_cache = ReportCache(_create_backend())
+changes.subscribe(report_cache.invalidate_users)
@@ -0,0 +1,172 @@
+"""
+Duy trì các bảng tổng hợp giao dịch theo (user, danh mục, loại, ngày) và
+(user, danh mục, loại, tháng).
+
+Mọi đường ghi giao dịch gọi add_transactions()/remove_transactions() TRƯỚC khi
+commit, nên bảng tổng hợp luôn thay đổi trong cùng một database transaction với
+bảng transactions. Báo cáo và ngân sách đọc từ đây, nên độ trễ phụ thuộc vào số
+ngày trong khoảng thời gian thay vì số giao dịch.
+
+Nếu dữ liệu bị lệch (sửa tay trong DB, lỗi cũ...), chạy rebuild():
+    python -m scripts.rebuild_rollups [--user-id ID]
+"""
+import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, insert, literal_column, select, update
+from sqlalchemy.orm import Session
+
+from app.database import models
+
+NO_CATEGORY = 0
+
+
+def _day_of(value) -> datetime.date:
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+
+def _aggregate(transactions: Iterable, sign: int) -> Dict[Tuple, list]:
+    """Gộp các giao dịch thành delta theo khóa (user_id, ngày, category_id, type)."""
+    deltas: Dict[Tuple, list] = {}
+    for t in transactions:
+        key = (
+            t.user_id,
+            _day_of(t.transaction_date),
+            t.category_id or NO_CATEGORY,
+            models.TransactionType(t.type),
+        )
+        delta = deltas.setdefault(key, [Decimal(0), 0])
+        delta[0] += Decimal(t.amount) * sign
+        delta[1] += sign
+    return deltas
+
+
+def _upsert(db: Session, model, key_columns, rows):
+    """INSERT ... ON CONFLICT DO UPDATE cộng dồn total_amount/tx_count."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={
+                "total_amount": model.total_amount + stmt.excluded.total_amount,
+                "tx_count": model.tx_count + stmt.excluded.tx_count,
+            },
+        )
+        db.execute(stmt)
+        return
+
+    # Backend khác: UPDATE trước, chưa có dòng thì INSERT
+    for row in rows:
+        result = db.execute(
+            update(model)
+            .where(*[getattr(model, column) == row[column] for column in key_columns])
+            .values(
+                total_amount=model.total_amount + row["total_amount"],
+                tx_count=model.tx_count + row["tx_count"],
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(model).values(**row))
+
+
+def apply_deltas(db: Session, deltas: Dict[Tuple, list]):
+    """Ghi các delta theo ngày vào bảng ngày và gộp lên bảng tháng (2 câu lệnh, +2 khi có xóa)."""
+    if not deltas:
+        return
+
+    daily_rows = []
+    monthly: Dict[Tuple, list] = {}
+    for (user_id, day, category_id, type_), (amount, count) in deltas.items():
+        daily_rows.append({
+            "user_id": user_id, "day": day, "category_id": category_id, "type": type_,
+            "total_amount": amount, "tx_count": count,
+        })
+        month_delta = monthly.setdefault((user_id, day.replace(day=1), category_id, type_), [Decimal(0), 0])
+        month_delta[0] += amount
+        month_delta[1] += count
+
+    monthly_rows = [
+        {
+            "user_id": user_id, "month": month, "category_id": category_id, "type": type_,
+            "total_amount": amount, "tx_count": count,
+        }
+        for (user_id, month, category_id, type_), (amount, count) in monthly.items()
+    ]
+
+    _upsert(db, models.DailyRollup, ["user_id", "day", "category_id", "type"], daily_rows)
+    _upsert(db, models.MonthlyRollup, ["user_id", "month", "category_id", "type"], monthly_rows)
+
+    # Dọn các dòng không còn giao dịch nào (sau khi sửa/xóa) để báo cáo không hiện mục rỗng
+    if any(count < 0 for _, count in deltas.values()):
+        user_ids = {user_id for (user_id, _, _, _) in deltas}
+        for model in (models.DailyRollup, models.MonthlyRollup):
+            db.query(model).filter(
+                model.user_id.in_(user_ids),
+                model.tx_count <= 0
+            ).delete(synchronize_session=False)
+
+
+def add_transactions(db: Session, transactions: Iterable):
+    apply_deltas(db, _aggregate(transactions, 1))
+
+
+def remove_transactions(db: Session, transactions: Iterable):
+    apply_deltas(db, _aggregate(transactions, -1))
+
+
+def add_transaction(db: Session, transaction):
+    add_transactions(db, [transaction])
+
+
+def remove_transaction(db: Session, transaction):
+    remove_transactions(db, [transaction])
+
+
+def _month_start(db: Session, day_column):
+    """Biểu thức SQL lấy ngày đầu tháng (khác nhau giữa các backend)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(day_column, "start of month")
+    return func.date(func.date_trunc("month", day_column))
+
+
+def rebuild(db: Session, user_id: Optional[int] = None):
+    """
+    Tính lại toàn bộ bảng tổng hợp từ bảng transactions (sửa lệch dữ liệu).
+    Không commit - người gọi quyết định commit.
+    """
+    for model in (models.MonthlyRollup, models.DailyRollup):
+        query = db.query(model)
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        query.delete(synchronize_session=False)
+
+    T = models.Transaction
+    day = func.date(T.transaction_date)
+    category_id = func.coalesce(T.category_id, literal_column(str(NO_CATEGORY)))
+    daily_select = select(
+        T.user_id, day, category_id, T.type, func.sum(T.amount), func.count(T.id)
+    ).group_by(T.user_id, day, category_id, T.type)
+    if user_id is not None:
+        daily_select = daily_select.where(T.user_id == user_id)
+    db.execute(insert(models.DailyRollup).from_select(
+        ["user_id", "day", "category_id", "type", "total_amount", "tx_count"], daily_select
+    ))
+
+    D = models.DailyRollup
+    month = _month_start(db, D.day)
+    monthly_select = select(
+        D.user_id, month, D.category_id, D.type, func.sum(D.total_amount), func.sum(D.tx_count)
+    ).group_by(D.user_id, month, D.category_id, D.type)
+    if user_id is not None:
+        monthly_select = monthly_select.where(D.user_id == user_id)
+    db.execute(insert(models.MonthlyRollup).from_select(
+        ["user_id", "month", "category_id", "type", "total_amount", "tx_count"], monthly_select
+    ))
@@ -0,0 +1,150 @@
+"""
+Scheduler nền (asyncio) cho giao dịch định kỳ.
+
+Chạy trong chính tiến trình API (khởi động/dừng theo lifespan của app):
+- Ngủ đến thời điểm sớm nhất có khoản đến hạn (MIN(next_run_date) qua index một phần),
+  tối đa RECURRING_SCHEDULER_MAX_SLEEP_SECONDS để thấy các thay đổi từ tiến trình khác
+- Thức dậy sớm hơn khi có khoản định kỳ được tạo/sửa trong tiến trình này (wake())
+- Xử lý theo lô trong thread riêng để không chặn event loop
+- Lỗi liên tiếp (run_once lỗi, hoặc không xử lý được khoản nào trong khi vẫn còn khoản đến hạn,
+  VD: commit lỗi): thử lại sau RETRY_BASE_SECONDS, nhân đôi sau mỗi lần, tối đa max_sleep_seconds.
+  Đã xử lý được nhưng vẫn còn khoản đến hạn (khoản đang bị worker khác khóa - SKIP LOCKED):
+  kiểm tra lại sau REPOLL_SECONDS, không tính là lỗi. wake() vẫn đánh thức trong mọi lúc chờ.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core import recurring_processor
+from app.core.config import settings
+from app.database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Thời gian chờ trước lần thử lại đầu tiên sau lỗi (giây), nhân đôi sau mỗi lần lỗi liên tiếp
+RETRY_BASE_SECONDS = 1.0
+# Còn khoản đến hạn sau một lần chạy thành công: kiểm tra lại sau khoảng này (giây)
+REPOLL_SECONDS = 1.0
+
+
+class RecurringScheduler:
+    def __init__(self, session_factory: Callable[[], Session], batch_size: int, max_sleep_seconds: float):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_sleep_seconds = max_sleep_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.runs = 0
+        self.processed = 0
+        self.last_run_at: Optional[datetime] = None
+        self.consecutive_failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever(), name="recurring-scheduler")
+        logger.info("Scheduler giao dịch định kỳ đã khởi động")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Scheduler giao dịch định kỳ đã dừng")
+
+    def wake(self):
+        """Gọi được từ thread khác (route sync): tính lại thời điểm chạy ngay."""
+        if self.running:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def run_once(self) -> int:
+        """Xử lý toàn bộ khoản đến hạn (chạy đồng bộ, trong thread)."""
+        db = self.session_factory()
+        try:
+            processed = recurring_processor.process_all_due(db, batch_size=self.batch_size)
+        finally:
+            db.close()
+        self.runs += 1
+        self.processed += processed
+        self.last_run_at = datetime.now()
+        return processed
+
+    def _next_due_at(self) -> Optional[datetime]:
+        db = self.session_factory()
+        try:
+            return recurring_processor.next_due_at(db)
+        finally:
+            db.close()
+
+    def _retry_delay(self) -> float:
+        # Giới hạn số mũ để không tính lũy thừa quá lớn khi lỗi kéo dài
+        exponent = min(self.consecutive_failures - 1, 30)
+        return min(RETRY_BASE_SECONDS * 2 ** exponent, self.max_sleep_seconds)
+
+    async def _sleep(self, delay: float):
+        """Ngủ `delay` giây hoặc đến khi wake() được gọi."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run_forever(self):
+        while True:
+            self._wake.clear()
+            processed = 0
+            try:
+                processed = await asyncio.to_thread(self.run_once)
+                next_due = await asyncio.to_thread(self._next_due_at)
+                failed = False
+            except Exception:
+                logger.exception("Lỗi khi xử lý giao dịch định kỳ")
+                next_due = None
+                failed = True
+
+            delay = self.max_sleep_seconds
+            if next_due is not None:
+                delay = min(delay, max((next_due - datetime.now()).total_seconds(), 0))
+            if failed or (delay <= 0 and not processed):
+                # Lùi thời gian thử lại theo cấp số nhân thay vì thử lại liên tục
+                self.consecutive_failures += 1
+                delay = self._retry_delay()
+                logger.log(
+                    logging.WARNING if failed else logging.INFO,
+                    "Thử lại xử lý giao dịch định kỳ sau",
+                    extra={"failures": self.consecutive_failures, "retry_in_seconds": delay},
+                )
+            else:
+                self.consecutive_failures = 0
+                if delay <= 0:
+                    delay = REPOLL_SECONDS
+            await self._sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "processed": self.processed,
+            "last_run_at": self.last_run_at,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+recurring_scheduler = RecurringScheduler(
+    session_factory=SessionLocal,
+    batch_size=settings.RECURRING_BATCH_SIZE,
+    max_sleep_seconds=settings.RECURRING_SCHEDULER_MAX_SLEEP_SECONDS,
+)
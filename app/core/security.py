@@ -36,18 +36,28 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
+def decode_access_token(token: str) -> Optional[dict]:
     """
     Giải mã và xác minh JWT token.
-    Nếu hợp lệ, trả về subject (user_id).
+    Nếu hợp lệ, trả về toàn bộ payload (có 'sub' và 'exp').
     Nếu không hợp lệ, trả về None.
     """
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        # Lấy subject từ payload (chính là user ID)
-        subject = payload.get("sub")
-        if subject is None:
-            return None
-        return subject
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    # Lấy subject từ payload (chính là user ID)
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_token(token: str) -> Optional[str]:
+    """
+    Giải mã và xác minh JWT token.
+    Nếu hợp lệ, trả về subject (user_id).
+    Nếu không hợp lệ, trả về None.
+    """
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
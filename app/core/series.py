@@ -0,0 +1,188 @@
+"""
+Chuỗi thời gian thu/chi theo bucket (GET /reports/series), đã lấp đủ các bucket không có dữ liệu.
+
+- granularity "hour" đọc bảng transactions (bảng tổng hợp chỉ có chiều ngày),
+  các mức còn lại đọc bảng tổng hợp theo ngày (DailyRollup).
+- PostgreSQL: bucket bằng date_trunc, danh sách bucket bằng generate_series rồi LEFT JOIN,
+  nên các bucket trống (0) do chính database trả về trong một truy vấn.
+- Database khác (SQLite khi test): bucket bằng strftime, lấp bucket trống ở Python.
+Tuần bắt đầu từ Thứ 2 (giống periods.week_bounds và date_trunc('week')).
+"""
+import datetime
+from decimal import Decimal
+from typing import List, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import DateTime, case, cast, func, literal, literal_column, select
+from sqlalchemy.orm import Session
+
+from app.core import periods
+from app.database import models
+
+GRANULARITIES = ["hour", "day", "week", "month", "year"]
+METRICS = ["income", "expense", "net"]
+
+# Số bucket tối đa trong một lần gọi
+MAX_BUCKETS = 2000
+
+_STEPS = {
+    "hour": relativedelta(hours=1),
+    "day": relativedelta(days=1),
+    "week": relativedelta(weeks=1),
+    "month": relativedelta(months=1),
+    "year": relativedelta(years=1),
+}
+
+# Định dạng strftime cho SQLite; tuần: lùi về Thứ 2 của tuần chứa ngày đó
+_SQLITE_BUCKETS = {
+    "hour": lambda column: func.strftime("%Y-%m-%d %H:00:00", column),
+    "day": lambda column: func.strftime("%Y-%m-%d 00:00:00", column),
+    "week": lambda column: func.strftime("%Y-%m-%d 00:00:00", column, "weekday 0", "-6 days"),
+    "month": lambda column: func.strftime("%Y-%m-01 00:00:00", column),
+    "year": lambda column: func.strftime("%Y-01-01 00:00:00", column),
+}
+
+
+def truncate(value: datetime.datetime, granularity: str) -> datetime.datetime:
+    """Đầu bucket chứa `value` (tương đương date_trunc của PostgreSQL)."""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return start - datetime.timedelta(days=start.weekday())
+    if granularity == "month":
+        return start.replace(day=1)
+    if granularity == "year":
+        return start.replace(month=1, day=1)
+    return start
+
+
+def bucket_starts(start: datetime.datetime, end: datetime.datetime, granularity: str) -> List[datetime.datetime]:
+    """Mọi bucket giao với [start, end)."""
+    buckets = []
+    bucket = truncate(start, granularity)
+    while bucket < end:
+        buckets.append(bucket)
+        bucket += _STEPS[granularity]
+    return buckets
+
+
+def bucket_count(start_date: datetime.date, end_date: datetime.date, granularity: str) -> int:
+    """Số bucket của khoảng [start_date, end_date] (tính thẳng, không liệt kê)."""
+    if granularity == "hour":
+        return ((end_date - start_date).days + 1) * 24
+    if granularity == "day":
+        return (end_date - start_date).days + 1
+    if granularity == "week":
+        first = start_date - datetime.timedelta(days=start_date.weekday())
+        return (end_date - first).days // 7 + 1
+    if granularity == "month":
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    return end_date.year - start_date.year + 1
+
+
+def _source(user_id: int, granularity: str, bounds: periods.Bounds):
+    """(cột thời điểm, cột loại, cột số tiền, điều kiện lọc) của bảng nguồn."""
+    if granularity == "hour":
+        return (
+            models.Transaction.transaction_date,
+            models.Transaction.type,
+            models.Transaction.amount,
+            [
+                models.Transaction.user_id == user_id,
+                periods.within(models.Transaction.transaction_date, bounds),
+            ],
+        )
+    return (
+        models.DailyRollup.day,
+        models.DailyRollup.type,
+        models.DailyRollup.total_amount,
+        [
+            models.DailyRollup.user_id == user_id,
+            periods.within(models.DailyRollup.day, (bounds[0].date(), bounds[1].date())),
+        ],
+    )
+
+
+def _totals(type_col, amount_col):
+    return (
+        func.coalesce(func.sum(case((type_col == models.TransactionType.INCOME, amount_col), else_=0)), 0),
+        func.coalesce(func.sum(case((type_col == models.TransactionType.EXPENSE, amount_col), else_=0)), 0),
+    )
+
+
+def _postgresql_rows(db: Session, user_id: int, granularity: str, bounds: periods.Bounds) -> List[Tuple]:
+    time_col, type_col, amount_col, conditions = _source(user_id, granularity, bounds)
+    bucket_col = func.date_trunc(granularity, cast(time_col, DateTime))
+    income, expense = _totals(type_col, amount_col)
+    stats = select(
+        bucket_col.label("bucket"), income.label("income"), expense.label("expense")
+    ).where(*conditions).group_by(bucket_col).subquery("stats")
+
+    # Bucket cuối là bucket chứa thời điểm cuối cùng của khoảng (end là cận mở)
+    last_moment = bounds[1] - datetime.timedelta(microseconds=1)
+    buckets = func.generate_series(
+        func.date_trunc(granularity, literal(bounds[0], DateTime)),
+        func.date_trunc(granularity, literal(last_moment, DateTime)),
+        literal_column(f"interval '1 {granularity}'"),
+    ).table_valued("bucket").render_derived(name="buckets")
+
+    return db.execute(
+        select(
+            buckets.c.bucket,
+            func.coalesce(stats.c.income, 0),
+            func.coalesce(stats.c.expense, 0),
+        ).select_from(buckets.outerjoin(stats, stats.c.bucket == buckets.c.bucket)).order_by(buckets.c.bucket)
+    ).all()
+
+
+def _generic_rows(db: Session, user_id: int, granularity: str, bounds: periods.Bounds) -> List[Tuple]:
+    time_col, type_col, amount_col, conditions = _source(user_id, granularity, bounds)
+    bucket_col = _SQLITE_BUCKETS[granularity](time_col)
+    income, expense = _totals(type_col, amount_col)
+    found = {
+        bucket: (income_total, expense_total)
+        for bucket, income_total, expense_total in db.execute(
+            select(bucket_col, income, expense).where(*conditions).group_by(bucket_col)
+        )
+    }
+    zero = (Decimal(0), Decimal(0))
+    return [
+        (bucket, *found.get(bucket.strftime("%Y-%m-%d %H:%M:%S"), zero))
+        for bucket in bucket_starts(bounds[0], bounds[1], granularity)
+    ]
+
+
+def build_series(
+    db: Session,
+    user_id: int,
+    granularity: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    metric: str,
+) -> dict:
+    """Chuỗi giá trị `metric` cho mọi bucket từ start_date đến hết end_date (bucket trống = 0)."""
+    bounds = periods.date_range_bounds(start_date, end_date)
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _postgresql_rows(db, user_id, granularity, bounds)
+    else:
+        rows = _generic_rows(db, user_id, granularity, bounds)
+
+    labels, data = [], []
+    for bucket, income, expense in rows:
+        if metric == "income":
+            value = income
+        elif metric == "expense":
+            value = expense
+        else:
+            value = Decimal(income) - Decimal(expense)
+        labels.append(bucket.isoformat())
+        data.append(float(value))
+
+    return {
+        "granularity": granularity,
+        "metric": metric,
+        "labels": labels,
+        "data": data,
+        "total": round(sum(data), 2),
+    }
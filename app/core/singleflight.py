@@ -0,0 +1,76 @@
+"""
+Gộp các lần tính trùng nhau đang chạy đồng thời (single-flight).
+
+Hai thiết bị cùng mở app, hoặc frontend gửi trùng request khi mount, sẽ tính cùng một báo cáo
+song song. Với SingleFlight, request đầu tiên cho một khóa (leader) tính kết quả, các request
+trùng khóa đến trong lúc đó chờ và dùng chung kết quả (hoặc lỗi) của leader thay vì truy vấn
+database thêm lần nữa. Khi leader xong, khóa được giải phóng: lần gọi sau sẽ tính lại
+(hoặc đọc từ cache ở tầng trên).
+
+Endpoint báo cáo là async def nên các request chờ bằng asyncio.Future trên event loop
+(không chiếm thread); không có gì được giữ lại sau khi tính xong.
+
+fn() chạy trong request của leader (dùng session của chính request đó) nên không tách ra
+task riêng: nếu leader bị hủy (client ngắt kết nối), các request đang chờ không nhận
+CancelledError mà một trong số chúng trở thành leader mới và tính lại.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def _consume_error(future: asyncio.Future):
+    # Không có request nào chờ thì lỗi vẫn coi như đã được đọc (tránh cảnh báo của asyncio)
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Chạy fn() một lần cho mỗi khóa đang chạy; các lần gọi trùng khóa chờ và nhận cùng kết quả."""
+        while True:
+            call = self._calls.get(key)
+            if call is None:
+                break
+            self.coalesced += 1
+            try:
+                # shield: request chờ bị hủy không được hủy luôn phần tính của leader
+                return await asyncio.shield(call)
+            except asyncio.CancelledError:
+                # Chỉ leader bị hủy (request này thì không) -> thử làm leader mới
+                if call.cancelled() and not asyncio.current_task().cancelling():
+                    self.coalesced -= 1
+                    continue
+                raise
+
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        call.add_done_callback(_consume_error)
+        self.executions += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def reset(self):
+        self.executions = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
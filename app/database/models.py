@@ -2,12 +2,16 @@ from sqlalchemy import (
     create_engine,
     Column,
     Integer,
+    BigInteger,
     String,
     DateTime,
     Boolean,
+    Date,
     ForeignKey,
     Enum as SQLEnum,
-    DECIMAL
+    DECIMAL,
+    Index,
+    text
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -43,18 +47,24 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     full_name = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Tăng mỗi lần dữ liệu của user được commit (app/core/changes.py), dùng làm ETag
+    data_version = Column(BigInteger, nullable=False, default=0, server_default="0")
 
     # CẬP NHẬT: Thêm back_populates cho giao dịch định kỳ VÀ khoản đầu tư
     accounts = relationship("Account", back_populates="owner")
     categories = relationship("Category", back_populates="owner")
     budgets = relationship("Budget", back_populates="owner")
     recurring_transactions = relationship("RecurringTransaction", back_populates="owner") 
+    transactions = relationship("Transaction", back_populates="owner")
     investments = relationship("Investment", back_populates="owner") # <--- ĐÃ THÊM MỚI
     # 
 
 
 class Account(Base):
     __tablename__ = "accounts"
+    __table_args__ = (
+        Index("ix_accounts_user_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -75,6 +85,9 @@ class Account(Base):
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_categories_user_name", "user_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -98,8 +111,22 @@ class Category(Base):
 class Transaction(Base):
     # Giữ nguyên
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Mọi truy vấn giao dịch đều lọc theo user và khoảng thời gian
+        # (có thêm id để phân trang keyset theo (transaction_date, id) đi thẳng trên index)
+        Index("ix_transactions_user_date_id", "user_id", "transaction_date", "id"),
+        Index("ix_transactions_source_account_date", "source_account_id", "transaction_date"),
+        Index("ix_transactions_destination_account_date", "destination_account_id", "transaction_date"),
+        Index("ix_transactions_category_date", "category_id", "transaction_date"),
+        # BRIN cho báo cáo theo khoảng thời gian (chỉ áp dụng trên PostgreSQL)
+        Index("ix_transactions_transaction_date_brin", "transaction_date", postgresql_using="brin"),
+        # Mỗi lần chạy của một khoản định kỳ chỉ sinh đúng một giao dịch (chống trùng khi nhiều worker cùng xử lý)
+        Index("uq_transactions_recurring_occurrence", "recurring_id", "occurrence_date", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    # Chủ sở hữu (phi chuẩn hóa từ source_account.user_id) để lọc trực tiếp, không cần join Account
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     source_account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
     destination_account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
@@ -108,8 +135,12 @@ class Transaction(Base):
     description = Column(String)
     transaction_date = Column(DateTime, default=datetime.datetime.utcnow)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Giao dịch sinh ra từ khoản định kỳ: khoản nào và lần chạy ngày nào (NULL với giao dịch nhập tay)
+    recurring_id = Column(Integer, ForeignKey("recurring_transactions.id", ondelete="SET NULL"), nullable=True)
+    occurrence_date = Column(Date, nullable=True)
 
     # Relationships
+    owner = relationship("User", back_populates="transactions")
     source_account = relationship("Account", foreign_keys=[source_account_id], back_populates="source_transactions")
     destination_account = relationship("Account", foreign_keys=[destination_account_id], back_populates="destination_transactions")
     category = relationship("Category", back_populates="transactions")
@@ -118,6 +149,9 @@ class Transaction(Base):
 class Budget(Base):
     # Giữ nguyên
     __tablename__ = "budgets"
+    __table_args__ = (
+        Index("ix_budgets_user_year_month", "user_id", "year", "month"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -131,9 +165,41 @@ class Budget(Base):
     category = relationship("Category", back_populates="budgets")
 
 
+# --- BẢNG TỔNG HỢP (ROLLUP) CHO BÁO CÁO VÀ NGÂN SÁCH ---
+# Được cập nhật cùng transaction với mọi thao tác ghi giao dịch (xem app/core/rollups.py).
+# category_id = 0 nghĩa là giao dịch không có danh mục (không dùng NULL để khóa chính/ON CONFLICT hoạt động).
+
+class DailyRollup(Base):
+    __tablename__ = "transaction_daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, primary_key=True, default=0)
+    type = Column(SQLEnum(TransactionType), primary_key=True)
+    total_amount = Column(DECIMAL(precision=15, scale=2), nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+
+class MonthlyRollup(Base):
+    __tablename__ = "transaction_monthly_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True) # Ngày đầu tháng
+    category_id = Column(Integer, primary_key=True, default=0)
+    type = Column(SQLEnum(TransactionType), primary_key=True)
+    total_amount = Column(DECIMAL(precision=15, scale=2), nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+
 # MÔ HÌNH GIAO DỊCH ĐỊNH KỲ
 class RecurringTransaction(Base):
     __tablename__ = "recurring_transactions"
+    __table_args__ = (
+        Index("ix_recurring_user_active_next_run", "user_id", "is_active", "next_run_date"),
+        # Scheduler nền: MIN(next_run_date) / các khoản đến hạn của mọi user, chỉ trên khoản đang hoạt động
+        Index("ix_recurring_due_next_run", "next_run_date",
+              postgresql_where=text("is_active"), sqlite_where=text("is_active")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -150,6 +216,8 @@ class RecurringTransaction(Base):
     
     # Thông tin định kỳ
     frequency = Column(SQLEnum(FrequencyType), nullable=False)
+    # Bước lặp: mỗi `interval` đơn vị của frequency (2 + WEEKLY = 2 tuần một lần)
+    interval = Column(Integer, nullable=False, default=1, server_default="1")
     start_date = Column(DateTime, nullable=False)
     next_run_date = Column(DateTime, nullable=False) # Ngày sẽ chạy tiếp theo
     is_active = Column(Boolean, default=True)
@@ -167,6 +235,9 @@ class RecurringTransaction(Base):
 
 class Investment(Base):
     __tablename__ = "investments"
+    __table_args__ = (
+        Index("ix_investments_user_id", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -187,6 +258,9 @@ class Investment(Base):
 
 class InvestmentUpdate(Base):
     __tablename__ = "investment_updates"
+    __table_args__ = (
+        Index("ix_investment_updates_investment_date", "investment_id", "update_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     investment_id = Column(Integer, ForeignKey("investments.id"), nullable=False)
@@ -0,0 +1,175 @@
+"""
+Cấu hình và số liệu của connection pool (engine đồng bộ và engine async trong connection.py).
+
+- Kích thước, overflow, timeout, recycle và pre-ping lấy từ Settings (DB_POOL_*).
+  pool_pre_ping kiểm tra kết nối trước khi dùng và pool_recycle đóng kết nối đã mở quá lâu,
+  để không nhận phải kết nối đã bị server/proxy cắt sau thời gian rảnh.
+- Pool được bọc để đo thời gian lấy kết nối (chờ slot trống hoặc mở kết nối mới),
+  đếm số lần hết thời gian chờ (pool cạn), kết nối mới và kết nối bị hủy.
+- warm_up() mở sẵn N kết nối lúc khởi động để các request đầu tiên không phải chờ kết nối.
+SQLite (chạy local, test) giữ pool mặc định của SQLAlchemy, không đo.
+"""
+import bisect
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+# Cận trên (ms) của các bucket trong histogram thời gian lấy kết nối
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class PoolMetrics:
+    """Bộ đếm và histogram (tích lũy, kiểu Prometheus) cho một pool."""
+
+    def __init__(self):
+        self.engine = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            self.checkouts = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def observe_wait(self, seconds: float, timed_out: bool = False):
+        index = bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            self._buckets[index] += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def attach(self, engine):
+        """Gắn vào engine (đồng bộ hoặc phần sync_engine của engine async) để đếm sự kiện pool."""
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        stats = {"pool": type(pool).__name__ if pool is not None else None}
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                # overflow() âm khi pool chưa mở đủ `size` kết nối
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout_seconds": pool.timeout(),
+                "recycle_seconds": pool._recycle,
+                "pre_ping": pool._pre_ping,
+            })
+        with self._lock:
+            total = self.checkouts + self.timeouts
+            cumulative, histogram = 0, []
+            for bound, count in zip(list(LATENCY_BUCKETS_MS) + ["+Inf"], self._buckets):
+                cumulative += count
+                histogram.append({"le_ms": bound, "count": cumulative})
+            stats.update({
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "wait_ms_avg": round(self.wait_seconds_total / total * 1000, 3) if total else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+                "checkout_latency_ms": histogram,
+            })
+        return stats
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+def _instrumented(base, metrics: PoolMetrics):
+    """Lớp con của `base` đo thời gian lấy kết nối; là thuộc tính lớp nên vẫn còn sau engine.dispose()."""
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+                raise
+            metrics.observe_wait(time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Tham số pool cho create_engine / create_async_engine theo Settings."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    base = AsyncAdaptedQueuePool if is_async else QueuePool
+    metrics = async_pool_metrics if is_async else sync_pool_metrics
+    return {
+        "poolclass": _instrumented(base, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _warm_count(engine, count: int) -> int:
+    # Kết nối vượt quá pool_size sẽ bị đóng khi trả về, mở thêm cũng vô ích
+    pool = engine.pool
+    return min(count, pool.size()) if isinstance(pool, QueuePool) else 0
+
+
+def warm_up(engine, count: int) -> int:
+    """Mở đồng thời tối đa `count` kết nối rồi trả cả về pool; trả về số kết nối đã mở."""
+    connections = []
+    try:
+        for _ in range(_warm_count(engine, count)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def warm_up_async(engine, count: int) -> int:
+    """Như warm_up, cho AsyncEngine."""
+    connections = []
+    try:
+        for _ in range(_warm_count(engine.sync_engine, count)):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+def stats() -> dict:
+    return {
+        "sync": sync_pool_metrics.stats(),
+        "async": async_pool_metrics.stats(),
+    }
+
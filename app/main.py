@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 # Đọc cấu hình từ Settings (Để lấy biến môi trường từ Render)
 from app.core.config import settings
+from app.core.logging_config import setup_logging, request_id_var, new_request_id
+
+# Cấu hình logging JSON qua hàng đợi trước khi import các router
+setup_logging()
+logger = logging.getLogger(__name__)
 
 # Import các module router
 from app.routers import (
@@ -14,14 +22,32 @@ from app.routers import (
     reports, 
     budgets, 
     recurring, 
-    investments
+    investments,
+    internal
 )
+from app.core.export_jobs import export_jobs
+from app.core.scheduler import recurring_scheduler
+from app.database import connection
+
+
+# --- VÒNG ĐỜI ỨNG DỤNG: mở sẵn kết nối database, dọn file xuất hết hạn, khởi động / dừng scheduler giao dịch định kỳ ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_POOL_WARMUP > 0:
+        await connection.warm_up(settings.DB_POOL_WARMUP)
+    # File xuất của lần chạy trước: job hết hạn / bị gián đoạn
+    export_jobs.cleanup_expired()
+    if settings.RECURRING_SCHEDULER_ENABLED:
+        await recurring_scheduler.start()
+    yield
+    await recurring_scheduler.stop()
 
 # Khởi tạo ứng dụng FastAPI
 app = FastAPI(
     title="Ví Vàng - Expense Tracker API",
     description="API để quản lý tài chính cá nhân, được xây dựng bằng FastAPI và PostgreSQL.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- CẤU HÌNH CORS (Kết hợp Local và Environment Variable) ---
@@ -64,10 +90,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-Request-ID", "X-Next-Cursor"],
 )
 # ----------------------------------------------------
 
+# --- GẮN REQUEST ID CHO MỖI REQUEST (để liên kết các dòng log) ---
+@app.middleware("http")
+async def add_request_id(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # Kết nối (include) tất cả các router
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
@@ -78,11 +116,11 @@ app.include_router(recurring.router, prefix="/recurring", tags=["Recurring Trans
 app.include_router(budgets.router, prefix="/budgets", tags=["Budgets"])
 app.include_router(reports.router, prefix="/reports", tags=["Reports"])
 app.include_router(investments.router, prefix="/investments", tags=["Investments"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"])
 
 # Endpoint gốc
 @app.get("/", tags=["Root"])
 def read_root():
     return {"message": "Chào mừng đến với API Ví Vàng!", "status": "ok"}
 
-print("--- SERVER KHOI DONG THANH CONG ---")
-print(f"CORS origins allowed: {len(origins)} domains")
\ No newline at end of file
+logger.info("Server khởi động thành công", extra={"cors_origins": len(origins)})
\ No newline at end of file
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from app.database import connection, models
@@ -9,35 +10,36 @@ from app.core import deps
 router = APIRouter()
 
 @router.post("/", response_model=account_schema.AccountResponse, status_code=status.HTTP_201_CREATED)
-def create_account(
+async def create_account(
     account: account_schema.AccountCreate,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Tạo một tài khoản (ví tiền) mới cho người dùng hiện tại."""
     # LƯU Ý: Đã sửa từ owner_id thành user_id để khớp với cấu trúc DB (FK là user_id)
     new_account = models.Account(**account.dict(), user_id=current_user.id)
     db.add(new_account)
-    db.commit()
-    db.refresh(new_account)
+    await db.commit()
+    await db.refresh(new_account)
     return new_account
 
-@router.get("/", response_model=List[account_schema.AccountResponse])
-def read_accounts(
-    db: Session = Depends(connection.get_db),
+@router.get("/", response_model=List[account_schema.AccountResponse], dependencies=[Depends(deps.etag_guard)])
+async def read_accounts(
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Lấy danh sách tất cả các tài khoản của người dùng hiện tại."""
-    return db.query(models.Account).filter(models.Account.user_id == current_user.id).all()
+    result = await db.scalars(select(models.Account).where(models.Account.user_id == current_user.id))
+    return result.all()
 
 @router.get("/{account_id}", response_model=account_schema.AccountResponse)
-def read_account_by_id(
+async def read_account_by_id(
     account_id: int,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Lấy thông tin chi tiết của một tài khoản."""
-    account = db.query(models.Account).filter(models.Account.id == account_id).first()
+    account = await db.get(models.Account, account_id)
 
     if not account:
         raise HTTPException(status_code=404, detail="Tài khoản không tồn tại")
@@ -49,14 +51,14 @@ def read_account_by_id(
     return account
 
 @router.put("/{account_id}", response_model=account_schema.AccountResponse)
-def update_account(
+async def update_account(
     account_id: int,
     account_update: account_schema.AccountUpdate,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Cập nhật thông tin một tài khoản."""
-    account = db.query(models.Account).filter(models.Account.id == account_id).first()
+    account = await db.get(models.Account, account_id)
 
     if not account:
         raise HTTPException(status_code=404, detail="Tài khoản không tồn tại")
@@ -71,18 +73,18 @@ def update_account(
     
     # Lưu thay đổi
     db.add(account)
-    db.commit()
-    db.refresh(account)
+    await db.commit()
+    await db.refresh(account)
     return account
 
 @router.delete("/{account_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_account(
+async def delete_account(
     account_id: int,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Xóa một tài khoản."""
-    account = db.query(models.Account).filter(models.Account.id == account_id).first()
+    account = await db.get(models.Account, account_id)
 
     if not account:
         raise HTTPException(status_code=404, detail="Tài khoản không tồn tại")
@@ -92,7 +94,7 @@ def delete_account(
     
     # TODO: Cần xử lý các giao dịch liên quan trước khi xóa tài khoản (Đây là một lời nhắc quan trọng)
     
-    db.delete(account)
-    db.commit()
+    await db.delete(account)
+    await db.commit()
     # Trả về HTTP 204 (No Content)
     return
\ No newline at end of file
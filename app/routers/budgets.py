@@ -1,53 +1,78 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import datetime
 
 from app.database import connection, models
 from app.schemas import budget_schema
-from app.core import deps
+from app.core import deps, periods
 
 router = APIRouter()
 
 # --- HELPER FUNCTION: Load Budget details (Category info and Spent amount) ---
-def load_budget_details(db: Session, budget: models.Budget, current_user: models.User):
-    """Tính toán spent_amount và gán category name/icon cho object Budget"""
-    
-    # 1. Tính Spent Amount (Dữ liệu này chỉ cần khi trả về, không lưu vào DB)
-    spent = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.source_account.has(user_id=current_user.id),
-        models.Transaction.category_id == budget.category_id,
-        models.Transaction.type == "EXPENSE", # Chỉ tính chi tiêu
-        extract('month', models.Transaction.transaction_date) == budget.month,
-        extract('year', models.Transaction.transaction_date) == budget.year
-    ).scalar() or 0
-    
-    # 2. Gán thông tin Category
-    category = db.query(models.Category).filter(models.Category.id == budget.category_id).first()
-    
-    budget.spent_amount = float(spent)
-    if category:
-        budget.category_name = category.name
-        budget.category_icon = category.icon
-        
-    return budget
+async def load_budgets_details(db: AsyncSession, budgets: List[models.Budget], current_user: models.User, month: int, year: int):
+    """
+    Tính spent_amount và gán category name/icon cho TẤT CẢ ngân sách của (user, tháng, năm)
+    bằng MỘT truy vấn (thay vì 2 truy vấn cho mỗi ngân sách).
+    Số tiền đã chi đọc từ bảng tổng hợp theo tháng (MonthlyRollup), không quét bảng transactions.
+    """
+    if not budgets:
+        return budgets
+
+    category_ids = {budget.category_id for budget in budgets}
+    month_start = periods.month_bounds(month, year)[0].date()
+
+    # LEFT JOIN để danh mục chưa có chi tiêu vẫn trả về (spent = 0)
+    rows = (await db.execute(select(
+        models.Category.id,
+        models.Category.name,
+        models.Category.icon,
+        models.MonthlyRollup.total_amount.label("spent")
+    ).outerjoin(
+        models.MonthlyRollup,
+        and_(
+            models.MonthlyRollup.category_id == models.Category.id,
+            models.MonthlyRollup.user_id == current_user.id,
+            models.MonthlyRollup.type == models.TransactionType.EXPENSE, # Chỉ tính chi tiêu
+            models.MonthlyRollup.month == month_start
+        )
+    ).where(
+        models.Category.id.in_(category_ids)
+    ))).all()
+
+    details = {row.id: row for row in rows}
+
+    # Dữ liệu này chỉ cần khi trả về, không lưu vào DB
+    for budget in budgets:
+        row = details.get(budget.category_id)
+        budget.spent_amount = float(row.spent or 0) if row else 0.0
+        if row:
+            budget.category_name = row.name
+            budget.category_icon = row.icon
+
+    return budgets
+
+
+async def load_budget_details(db: AsyncSession, budget: models.Budget, current_user: models.User):
+    """Tính toán spent_amount và gán category name/icon cho một object Budget"""
+    return (await load_budgets_details(db, [budget], current_user, budget.month, budget.year))[0]
 # -----------------------------------------------------------------------------
 
 
 @router.post("/", response_model=budget_schema.BudgetResponse, status_code=status.HTTP_201_CREATED)
-def create_budget(
+async def create_budget(
     budget_in: budget_schema.BudgetCreate,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Tạo ngân sách mới. Chặn nếu đã tồn tại ngân sách cho danh mục này trong tháng này."""
     
     # 1. Kiểm tra danh mục có thuộc về user không và phải là loại EXPENSE (nên có)
-    category = db.query(models.Category).filter(
+    category = (await db.scalars(select(models.Category).where(
         models.Category.id == budget_in.category_id,
         models.Category.user_id == current_user.id
-    ).first()
+    ))).first()
     
     if not category:
         # Thay đổi thông báo để rõ ràng hơn
@@ -57,12 +82,12 @@ def create_budget(
         raise HTTPException(status_code=400, detail="Ngân sách chỉ áp dụng cho Danh mục Chi tiêu.")
 
     # 2. Kiểm tra trùng lặp (1 user chỉ có 1 ngân sách cho 1 danh mục trong 1 tháng/năm)
-    existing_budget = db.query(models.Budget).filter(
+    existing_budget = (await db.scalars(select(models.Budget).where(
         models.Budget.user_id == current_user.id,
         models.Budget.category_id == budget_in.category_id,
         models.Budget.month == budget_in.month,
         models.Budget.year == budget_in.year
-    ).first()
+    ))).first()
 
     if existing_budget:
         raise HTTPException(status_code=400, detail="Ngân sách cho danh mục này trong tháng/năm này đã tồn tại.")
@@ -70,18 +95,18 @@ def create_budget(
     # 3. Tạo mới
     new_budget = models.Budget(**budget_in.dict(), user_id=current_user.id)
     db.add(new_budget)
-    db.commit()
-    db.refresh(new_budget)
+    await db.commit()
+    await db.refresh(new_budget)
     
     # Gán thông tin phụ trước khi trả về
-    return load_budget_details(db, new_budget, current_user)
+    return await load_budget_details(db, new_budget, current_user)
 
 
-@router.get("/", response_model=List[budget_schema.BudgetResponse])
-def read_budgets(
+@router.get("/", response_model=List[budget_schema.BudgetResponse], dependencies=[Depends(deps.etag_guard)])
+async def read_budgets(
     month: int = None,
     year: int = None,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Lấy danh sách ngân sách. Mặc định lấy tháng hiện tại nếu không truyền tham số."""
@@ -90,49 +115,47 @@ def read_budgets(
         month = now.month
         year = now.year
 
-    budgets = db.query(models.Budget).filter(
+    budgets = (await db.scalars(select(models.Budget).where(
         models.Budget.user_id == current_user.id,
         models.Budget.month == month,
         models.Budget.year == year
-    ).all()
-
-    # Tính toán số tiền đã chi (spent_amount) cho từng ngân sách
-    results = [load_budget_details(db, budget, current_user) for budget in budgets]
+    ))).all()
 
-    return results
+    # Tính toán số tiền đã chi (spent_amount) cho tất cả ngân sách trong 1 truy vấn
+    return await load_budgets_details(db, budgets, current_user, month, year)
 
 
 @router.get("/{id}", response_model=budget_schema.BudgetResponse)
-def read_budget(
+async def read_budget(
     id: int,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Lấy chi tiết một ngân sách theo ID"""
-    budget = db.query(models.Budget).filter(
+    budget = (await db.scalars(select(models.Budget).where(
         models.Budget.id == id,
         models.Budget.user_id == current_user.id
-    ).first()
+    ))).first()
     
     if not budget:
         raise HTTPException(status_code=404, detail="Không tìm thấy ngân sách")
     
     # Gán thông tin phụ trước khi trả về
-    return load_budget_details(db, budget, current_user)
+    return await load_budget_details(db, budget, current_user)
 
 
 @router.put("/{id}", response_model=budget_schema.BudgetResponse)
-def update_budget(
+async def update_budget(
     id: int,
     budget_in: budget_schema.BudgetUpdate, # Schema để cập nhật
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """Cập nhật một ngân sách (chủ yếu là hạn mức amount)"""
-    budget = db.query(models.Budget).filter(
+    budget = (await db.scalars(select(models.Budget).where(
         models.Budget.id == id,
         models.Budget.user_id == current_user.id
-    ).first()
+    ))).first()
     
     if not budget:
         raise HTTPException(status_code=404, detail="Không tìm thấy ngân sách")
@@ -144,22 +167,22 @@ def update_budget(
     # nhưng được giữ lại để đảm bảo tính an toàn cho API.
     if 'category_id' in update_data and update_data['category_id'] != budget.category_id:
         # Nếu cố gắng thay đổi category_id, phải kiểm tra lại tính hợp lệ
-        category = db.query(models.Category).filter(
+        category = (await db.scalars(select(models.Category).where(
             models.Category.id == update_data['category_id'],
             models.Category.user_id == current_user.id,
-            models.Category.type.value == "EXPENSE" # Ngân sách phải là Chi tiêu
-        ).first()
+            models.Category.type == models.TransactionType.EXPENSE # Ngân sách phải là Chi tiêu
+        ))).first()
         if not category:
              raise HTTPException(status_code=400, detail="Danh mục mới không hợp lệ.")
         
         # Kiểm tra trùng lặp với ngân sách khác (cùng tháng, cùng category_id mới)
-        existing_check = db.query(models.Budget).filter(
+        existing_check = (await db.scalars(select(models.Budget).where(
             models.Budget.user_id == current_user.id,
             models.Budget.category_id == update_data['category_id'],
             models.Budget.month == budget.month,
             models.Budget.year == budget.year,
             models.Budget.id != id # Loại trừ chính budget đang sửa
-        ).first()
+        ))).first()
         
         if existing_check:
              raise HTTPException(status_code=400, detail="Ngân sách cho danh mục mới này đã tồn tại trong tháng.")
@@ -169,27 +192,27 @@ def update_budget(
     for key, value in update_data.items():
         setattr(budget, key, value)
     
-    db.commit()
-    db.refresh(budget)
+    await db.commit()
+    await db.refresh(budget)
     
     # Gán thông tin phụ trước khi trả về
-    return load_budget_details(db, budget, current_user)
+    return await load_budget_details(db, budget, current_user)
 
 
 @router.delete("/{budget_id}")
-def delete_budget(
+async def delete_budget(
     budget_id: int,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
-    budget = db.query(models.Budget).filter(
+    budget = (await db.scalars(select(models.Budget).where(
         models.Budget.id == budget_id,
         models.Budget.user_id == current_user.id
-    ).first()
+    ))).first()
     
     if not budget:
         raise HTTPException(status_code=404, detail="Ngân sách không tồn tại")
     
-    db.delete(budget)
-    db.commit()
+    await db.delete(budget)
+    await db.commit()
     return {"message": "Đã xóa thành công"}
\ No newline at end of file
@@ -38,7 +38,7 @@ def create_category(
 
 
 # --- 2. LẤY TẤT CẢ DANH MỤC CỦA USER ---
-@router.get("/", response_model=List[category_schema.CategoryResponse])
+@router.get("/", response_model=List[category_schema.CategoryResponse], dependencies=[Depends(deps.etag_guard)])
 def read_categories(
     db: Session = Depends(connection.get_db),
     current_user: models.User = Depends(deps.get_current_user)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.core import changes, deps, recurring_processor
+from app.core.principal_cache import principal_cache
+from app.core.export_jobs import export_jobs
+from app.core.forecast import forecast_cache, forecast_flights
+from app.core.report_cache import report_cache
+from app.core.scheduler import recurring_scheduler
+from app.database import connection, pool
+
+router = APIRouter()
+
+@router.get("/metrics", dependencies=[Depends(deps.require_internal_token)])
+def read_metrics():
+    """Số liệu vận hành nội bộ (cache, ...) của tiến trình hiện tại."""
+    return {
+        "principal_cache": principal_cache.stats(),
+        "data_versions": changes.data_versions.stats(),
+        "report_cache": report_cache.stats(),
+        "forecast_cache": {**forecast_cache.stats(), "single_flight": forecast_flights.stats()},
+        "export_jobs": export_jobs.stats(),
+        "recurring_scheduler": recurring_scheduler.stats(),
+        "db_pool": pool.stats(),
+    }
+
+
+@router.get("/pool", dependencies=[Depends(deps.require_internal_token)])
+def read_pool_metrics():
+    """
+    Trạng thái connection pool của tiến trình hiện tại (engine đồng bộ và engine async):
+    số kết nối đang được dùng / rảnh / overflow, số lần hết thời gian chờ,
+    thời gian chờ lấy kết nối và histogram (tích lũy, theo ms).
+    """
+    return pool.stats()
+
+
+@router.post("/recurring/run", dependencies=[Depends(deps.require_internal_token)])
+def run_recurring_now(db: Session = Depends(connection.get_db)):
+    """Chạy ngay việc xử lý các khoản định kỳ đến hạn của mọi user (cho vận hành)."""
+    processed = recurring_processor.process_all_due(db, batch_size=recurring_scheduler.batch_size)
+    return {"processed": processed}
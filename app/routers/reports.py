@@ -1,152 +1,192 @@
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import func, extract, case, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import func, extract, case, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 import datetime
-import pandas as pd
-import io
 from typing import Optional
 from datetime import date
 
 from app.database import connection, models
-from app.core import deps
+from app.core import deps, periods, exports, forecast, series
+from app.core.export_jobs import export_jobs
+from app.core.report_cache import report_cache
+from app.schemas import export_schema
 
 router = APIRouter()
 
-@router.get("/dashboard")
-def get_dashboard_stats(
+# Các endpoint đọc là async def: phần tính (truy vấn kiểu Session, dùng chung với scheduler và script)
+# chạy qua AsyncSession.run_sync nên một báo cáo chậm không chiếm thread của threadpool.
+
+@router.get("/dashboard", dependencies=[Depends(deps.etag_guard)])
+async def get_dashboard_stats(
     time_range: str = Query("month", enum=["day", "week", "month"]), 
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
+    """Số liệu cho màn hình Dashboard, được cache đến khi dữ liệu của user thay đổi (xem report_cache)."""
+    # Các kỳ "hôm nay", "tuần này", "tháng này" phụ thuộc ngày hiện tại
+    params = {"time_range": time_range, "today": datetime.date.today()}
+    return await report_cache.memoize(
+        db, current_user.id, "dashboard", params,
+        lambda session: compute_dashboard_stats(time_range, session, current_user.id)
+    )
+
+
+def compute_dashboard_stats(time_range: str, db: Session, user_id: int) -> dict:
+    """
+    Số liệu cho màn hình Dashboard.
+    Biểu đồ đường, tổng thu/chi và biểu đồ tròn được suy ra từ MỘT truy vấn trên kỳ đã chọn
+    (đọc bảng tổng hợp theo ngày; riêng "day" nhóm theo giờ từ giao dịch hôm nay).
+    Chi tiêu ngân sách đọc từ bảng tổng hợp theo tháng, nên số truy vấn luôn cố định
+    (3 câu) bất kể người dùng có bao nhiêu ngân sách hay giao dịch.
+    """
     now = datetime.datetime.now()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # 1. Điều kiện lọc cơ bản (User)
-    # Filter dựa trên Source Account thuộc user (Áp dụng cho mọi giao dịch)
-    common_filter = [models.Transaction.source_account.has(user_id=current_user.id)]
-    
-    # 2. Xử lý Logic thời gian cho Biểu đồ Đường (Line Chart)
-    line_chart_data = {"labels": [], "income": [], "expense": []}
-    
-    common_filter_line_chart = list(common_filter)
 
+    # 1. Xác định khoảng thời gian [period_start, period_end) và nguồn dữ liệu cho biểu đồ đường
     if time_range == "day":
         # --- HÔM NAY (Nhóm theo Giờ: 0-23) ---
-        common_filter_line_chart.append(models.Transaction.transaction_date >= today_start)
-        
-        hourly_stats = db.query(
-            extract('hour', models.Transaction.transaction_date).label('hour'),
-            func.sum(case((models.Transaction.type == "INCOME", models.Transaction.amount), else_=0)).label("income"),
-            func.sum(case((models.Transaction.type == "EXPENSE", models.Transaction.amount), else_=0)).label("expense")
-        ).filter(*common_filter_line_chart)\
-        .group_by('hour').all()
-
-        data_map = {int(stat.hour): stat for stat in hourly_stats}
+        period_start, period_end = periods.day_bounds(now)
+        period_rows = db.query(
+            extract('hour', models.Transaction.transaction_date).label("bucket"),
+            models.Transaction.type.label("type"),
+            models.Transaction.category_id.label("category_id"),
+            models.Transaction.amount.label("amount")
+        ).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.type.in_([models.TransactionType.INCOME, models.TransactionType.EXPENSE]),
+            periods.within(models.Transaction.transaction_date, (period_start, period_end))
+        ).cte("dashboard_rows")
+    else:
+        if time_range == "week":
+            # --- TUẦN NÀY (Nhóm theo Ngày) ---
+            period_start, period_end = periods.week_bounds(now)
+        else: # time_range == "month" (Mặc định)
+            # --- THÁNG NÀY (Nhóm theo Ngày) ---
+            period_start, period_end = periods.month_bounds(now.month, now.year)
+        period_rows = db.query(
+            models.DailyRollup.day.label("bucket"),
+            models.DailyRollup.type.label("type"),
+            models.DailyRollup.category_id.label("category_id"),
+            models.DailyRollup.total_amount.label("amount")
+        ).filter(
+            models.DailyRollup.user_id == user_id,
+            models.DailyRollup.type.in_([models.TransactionType.INCOME, models.TransactionType.EXPENSE]),
+            periods.within(models.DailyRollup.day, (period_start.date(), period_end.date()))
+        ).cte("dashboard_rows")
+
+    # 2. Nhóm theo (bucket, loại, danh mục) để suy ra mọi biểu đồ của kỳ
+    grouped_stats = db.query(
+        period_rows.c.bucket,
+        period_rows.c.type,
+        models.Category.name.label("category_name"),
+        func.sum(period_rows.c.amount).label("total")
+    ).outerjoin(models.Category, period_rows.c.category_id == models.Category.id)\
+    .group_by(
+        period_rows.c.bucket,
+        period_rows.c.type,
+        period_rows.c.category_id,
+        models.Category.name
+    ).all()
+
+    # 3. Suy ra biểu đồ đường, tổng thu/chi và biểu đồ tròn
+    line_map = {}
+    expense_by_cat = {}
+    income_by_cat = {}
+    total_income = 0
+    total_expense = 0
+
+    for stat in grouped_stats:
+        is_income = stat.type == models.TransactionType.INCOME
+        total = stat.total or 0
+
+        # Khóa bucket: giờ (int) cho "day", chuỗi ngày YYYY-MM-DD cho "week"/"month"
+        key = int(stat.bucket) if time_range == "day" else str(stat.bucket)
+        point = line_map.setdefault(key, {"income": 0, "expense": 0})
+        if is_income:
+            point["income"] += total
+            total_income += total
+        else:
+            point["expense"] += total
+            total_expense += total
+
+        # Biểu đồ tròn chỉ tính giao dịch có danh mục
+        if stat.category_name is not None:
+            pie = income_by_cat if is_income else expense_by_cat
+            pie[stat.category_name] = pie.get(stat.category_name, 0) + total
+
+    line_chart_data = {"labels": [], "income": [], "expense": []}
+
+    if time_range == "day":
         for h in range(24):
             line_chart_data["labels"].append(f"{h}h")
-            stat = data_map.get(h)
-            line_chart_data["income"].append(float(stat.income) if stat and stat.income else 0)
-            line_chart_data["expense"].append(float(stat.expense) if stat and stat.expense else 0)
+            point = line_map.get(h)
+            line_chart_data["income"].append(float(point["income"]) if point else 0)
+            line_chart_data["expense"].append(float(point["expense"]) if point else 0)
 
     elif time_range == "week":
-        # --- TUẦN NÀY (Nhóm theo Ngày) ---
-        start_of_week = today_start - datetime.timedelta(days=today_start.weekday())
-        common_filter_line_chart.append(models.Transaction.transaction_date >= start_of_week)
-
-        daily_stats = db.query(
-            func.date(models.Transaction.transaction_date).label('date'),
-            func.sum(case((models.Transaction.type == "INCOME", models.Transaction.amount), else_=0)).label("income"),
-            func.sum(case((models.Transaction.type == "EXPENSE", models.Transaction.amount), else_=0)).label("expense")
-        ).filter(*common_filter_line_chart)\
-        .group_by(func.date(models.Transaction.transaction_date))\
-        .order_by('date').all()
-
-        data_map = {str(stat.date): stat for stat in daily_stats}
         for i in range(7):
-            day = start_of_week + datetime.timedelta(days=i)
-            day_str = str(day.date())
+            day = period_start + datetime.timedelta(days=i)
             weekday_vn = ["T2", "T3", "T4", "T5", "T6", "T7", "CN"][day.weekday()]
             label = f"{weekday_vn} ({day.day}/{day.month})"
-            
+
             line_chart_data["labels"].append(label)
-            stat = data_map.get(day_str)
-            line_chart_data["income"].append(float(stat.income) if stat and stat.income else 0)
-            line_chart_data["expense"].append(float(stat.expense) if stat and stat.expense else 0)
-
-    else: # time_range == "month" (Mặc định)
-        # --- THÁNG NÀY (Nhóm theo Ngày) ---
-        common_filter_line_chart.append(extract('month', models.Transaction.transaction_date) == now.month)
-        common_filter_line_chart.append(extract('year', models.Transaction.transaction_date) == now.year)
-
-        daily_stats = db.query(
-            func.date(models.Transaction.transaction_date).label('date'),
-            func.sum(case((models.Transaction.type == "INCOME", models.Transaction.amount), else_=0)).label("income"),
-            func.sum(case((models.Transaction.type == "EXPENSE", models.Transaction.amount), else_=0)).label("expense")
-        ).filter(*common_filter_line_chart)\
-        .group_by(func.date(models.Transaction.transaction_date))\
-        .order_by('date').all()
-        
-        line_chart_data["labels"] = [str(stat.date) for stat in daily_stats]
-        line_chart_data["income"] = [float(stat.income) for stat in daily_stats]
-        line_chart_data["expense"] = [float(stat.expense) for stat in daily_stats]
+            point = line_map.get(str(day.date()))
+            line_chart_data["income"].append(float(point["income"]) if point else 0)
+            line_chart_data["expense"].append(float(point["expense"]) if point else 0)
+
+    else:
+        # Tháng: đủ mọi ngày trong tháng (ngày không có giao dịch = 0)
+        for day in series.bucket_starts(period_start, period_end, "day"):
+            day_str = str(day.date())
+            line_chart_data["labels"].append(day_str)
+            point = line_map.get(day_str)
+            line_chart_data["income"].append(float(point["income"]) if point else 0)
+            line_chart_data["expense"].append(float(point["expense"]) if point else 0)
 
     # --- TÍNH TOÁN CÁC SỐ LIỆU TỔNG HỢP ---
-    
-    # 3. Tổng quan số dư (Toàn bộ)
+
+    # 4. Tổng quan số dư (Toàn bộ)
     total_balance = db.query(func.sum(models.Account.current_balance))\
-        .filter(models.Account.user_id == current_user.id).scalar() or 0
-
-    # 4. Tổng Thu/Chi trong khoảng thời gian đã chọn (Sử dụng common_filter_line_chart)
-    total_stats = db.query(
-        func.sum(case((models.Transaction.type == "INCOME", models.Transaction.amount), else_=0)).label("income"),
-        func.sum(case((models.Transaction.type == "EXPENSE", models.Transaction.amount), else_=0)).label("expense")
-    ).filter(*common_filter_line_chart).first()
-
-    total_income = total_stats.income or 0
-    total_expense = total_stats.expense or 0
-
-    # 5. Dữ liệu Biểu đồ tròn (Theo danh mục - Sử dụng common_filter_line_chart)
-    expense_cats = db.query(models.Category.name, func.sum(models.Transaction.amount))\
-        .join(models.Transaction)\
-        .filter(*common_filter_line_chart, models.Transaction.type == "EXPENSE")\
-        .group_by(models.Category.name).all()
-    
-    income_cats = db.query(models.Category.name, func.sum(models.Transaction.amount))\
-        .join(models.Transaction)\
-        .filter(*common_filter_line_chart, models.Transaction.type == "INCOME")\
-        .group_by(models.Category.name).all()
-
-    # 6. Dữ liệu Biểu đồ Cột (Ngân sách - CHỈ TÍNH THÁNG HIỆN TẠI)
-    budgets = db.query(models.Budget).filter(
-        models.Budget.user_id == current_user.id,
+        .filter(models.Account.user_id == user_id).scalar() or 0
+
+    # 5. Dữ liệu Biểu đồ Cột (Ngân sách - CHỈ TÍNH THÁNG HIỆN TẠI)
+    # Join sẵn Category (tên) và bảng tổng hợp theo tháng (đã chi) trong cùng một truy vấn
+    month_start = periods.month_bounds(now.month, now.year)[0].date()
+    budgets = db.query(
+        models.Budget.category_id,
+        models.Budget.amount,
+        models.Category.name.label("category_name"),
+        models.MonthlyRollup.total_amount.label("spent")
+    ).join(models.Category, models.Budget.category_id == models.Category.id)\
+    .outerjoin(models.MonthlyRollup, and_(
+        models.MonthlyRollup.user_id == models.Budget.user_id,
+        models.MonthlyRollup.category_id == models.Budget.category_id,
+        models.MonthlyRollup.type == models.TransactionType.EXPENSE,
+        models.MonthlyRollup.month == month_start
+    ))\
+    .filter(
+        models.Budget.user_id == user_id,
         models.Budget.month == now.month,
         models.Budget.year == now.year
-    ).all()
-    
+    ).order_by(models.Budget.id).all()
+
     budget_data = {
         "labels": [],
         "spent": [],
         "limit": []
     }
-    
+
     total_budget_limit = 0
     total_budget_spent = 0
-    
+
     for budget in budgets:
-        # Tính thực chi cho danh mục này trong tháng hiện tại
-        spent = db.query(func.sum(models.Transaction.amount)).filter(
-            models.Transaction.source_account.has(user_id=current_user.id),
-            models.Transaction.category_id == budget.category_id,
-            models.Transaction.type == "EXPENSE",
-            extract('month', models.Transaction.transaction_date) == now.month,
-            extract('year', models.Transaction.transaction_date) == now.year
-        ).scalar() or 0
-        
-        budget_data["labels"].append(budget.category.name)
+        spent = budget.spent or 0
+
+        budget_data["labels"].append(budget.category_name)
         budget_data["spent"].append(float(spent))
         budget_data["limit"].append(float(budget.amount))
-        
+
         total_budget_limit += budget.amount
         total_budget_spent += spent
 
@@ -158,47 +198,71 @@ def get_dashboard_stats(
         "monthly_expense": total_expense,
         "budget_left": budget_left,
         "line_chart": line_chart_data,
-        "pie_expense": {"labels": [x[0] for x in expense_cats], "data": [float(x[1]) for x in expense_cats]},
-        "pie_income": {"labels": [x[0] for x in income_cats], "data": [float(x[1]) for x in income_cats]},
+        "pie_expense": {"labels": list(expense_by_cat.keys()), "data": [float(v) for v in expense_by_cat.values()]},
+        "pie_income": {"labels": list(income_by_cat.keys()), "data": [float(v) for v in income_by_cat.values()]},
         "pie_total": {"labels": ["Thu nhập", "Chi tiêu"], "data": [total_income, total_expense]},
         "budget_chart": budget_data
     }
 
 @router.get("/detailed")
-def get_detailed_report(
+async def get_detailed_report(
     start_date: date,
     end_date: date,
     account_id: Optional[int] = Query(None),
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
-    """API cho trang báo cáo chi tiết"""
-    
-    # Base Query: Join tường minh qua source_account_id
-    base_query = db.query(models.Transaction).join(
-        models.Account, 
-        models.Transaction.source_account_id == models.Account.id # <-- CHỈ RÕ ĐIỀU KIỆN JOIN
-    ).filter(
-        models.Account.user_id == current_user.id,
-        models.Transaction.transaction_date >= start_date,
-        models.Transaction.transaction_date <= end_date
+    """API cho trang báo cáo chi tiết, được cache đến khi dữ liệu của user thay đổi (xem report_cache)."""
+    params = {"start_date": start_date, "end_date": end_date, "account_id": account_id}
+    return await report_cache.memoize(
+        db, current_user.id, "detailed", params,
+        lambda session: compute_detailed_report(start_date, end_date, account_id, session, current_user.id)
     )
-    
+
+
+def compute_detailed_report(
+    start_date: date, end_date: date, account_id: Optional[int], db: Session, user_id: int
+) -> dict:
+    """
+    API cho trang báo cáo chi tiết.
+    Không lọc theo tài khoản: đọc bảng tổng hợp theo ngày (DailyRollup).
+    Có lọc theo tài khoản: bảng tổng hợp không có chiều tài khoản nên đọc trực tiếp bảng transactions.
+    """
+    date_range = periods.date_range_bounds(start_date, end_date)
+
     if account_id:
-        # Lọc giao dịch mà tài khoản được chọn là tài khoản nguồn HOẶC tài khoản đích
-        base_query = base_query.filter(
+        # Base Query: Lọc trực tiếp theo user_id của giao dịch
+        base_query = db.query(models.Transaction).filter(
+            models.Transaction.user_id == user_id,
+            periods.within(models.Transaction.transaction_date, date_range),
+            # Lọc giao dịch mà tài khoản được chọn là tài khoản nguồn HOẶC tài khoản đích
             or_(
                 models.Transaction.source_account_id == account_id,
                 models.Transaction.destination_account_id == account_id
             )
         )
+        day_col = func.date(models.Transaction.transaction_date)
+        type_col = models.Transaction.type
+        category_col = models.Transaction.category_id
+        amount_col = models.Transaction.amount
+        count_expr = func.count(models.Transaction.id)
+    else:
+        base_query = db.query(models.DailyRollup).filter(
+            models.DailyRollup.user_id == user_id,
+            periods.within(models.DailyRollup.day, (date_range[0].date(), date_range[1].date()))
+        )
+        day_col = models.DailyRollup.day
+        type_col = models.DailyRollup.type
+        category_col = models.DailyRollup.category_id
+        amount_col = models.DailyRollup.total_amount
+        count_expr = func.sum(models.DailyRollup.tx_count)
 
     # 1. Dữ liệu biểu đồ đường (Dòng tiền theo ngày)
     daily_stats = base_query.with_entities(
-        func.date(models.Transaction.transaction_date).label('date'),
-        func.sum(case((models.Transaction.type == "INCOME", models.Transaction.amount), else_=0)).label("income"),
-        func.sum(case((models.Transaction.type == "EXPENSE", models.Transaction.amount), else_=0)).label("expense")
-    ).group_by(func.date(models.Transaction.transaction_date)).order_by('date').all()
+        day_col.label('date'),
+        func.sum(case((type_col == "INCOME", amount_col), else_=0)).label("income"),
+        func.sum(case((type_col == "EXPENSE", amount_col), else_=0)).label("expense")
+    ).group_by(day_col).order_by('date').all()
     
     line_chart_data = {
         "labels": [str(d.date) for d in daily_stats],
@@ -207,22 +271,22 @@ def get_detailed_report(
     }
     
     # 2. Phân tích chi tiêu theo danh mục (Join tường minh với Category)
-    expense_by_cat = base_query.filter(models.Transaction.type == "EXPENSE")\
-        .join(models.Category, models.Transaction.category_id == models.Category.id)\
+    expense_by_cat = base_query.filter(type_col == "EXPENSE")\
+        .join(models.Category, category_col == models.Category.id)\
         .with_entities(
             models.Category.name.label('category'),
-            func.count(models.Transaction.id).label('count'),
-            func.sum(models.Transaction.amount).label('total')
-        ).group_by(models.Category.name).order_by(func.sum(models.Transaction.amount).desc()).all()
+            count_expr.label('count'),
+            func.sum(amount_col).label('total')
+        ).group_by(models.Category.name).order_by(func.sum(amount_col).desc()).all()
         
     # 3. Phân tích thu nhập theo danh mục (Join tường minh với Category)
-    income_by_cat = base_query.filter(models.Transaction.type == "INCOME")\
-        .join(models.Category, models.Transaction.category_id == models.Category.id)\
+    income_by_cat = base_query.filter(type_col == "INCOME")\
+        .join(models.Category, category_col == models.Category.id)\
         .with_entities(
             models.Category.name.label('category'),
-            func.count(models.Transaction.id).label('count'),
-            func.sum(models.Transaction.amount).label('total')
-        ).group_by(models.Category.name).order_by(func.sum(models.Transaction.amount).desc()).all()
+            count_expr.label('count'),
+            func.sum(amount_col).label('total')
+        ).group_by(models.Category.name).order_by(func.sum(amount_col).desc()).all()
     
     # Lấy tổng thu và tổng chi từ dữ liệu đã tính cho biểu đồ đường
     total_income = sum(float(d.income or 0) for d in daily_stats)
@@ -240,69 +304,133 @@ def get_detailed_report(
         }
     }
 
+@router.get("/series")
+async def get_series(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    granularity: str = Query("day", enum=series.GRANULARITIES),
+    metric: str = Query("expense", enum=series.METRICS),
+    db: AsyncSession = Depends(connection.get_async_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    """
+    Chuỗi thời gian thu / chi / ròng theo giờ, ngày, tuần, tháng hoặc năm trong [from, to].
+    Mọi bucket đều có mặt (bucket không có giao dịch = 0), dùng chung cho mọi biểu đồ.
+    """
+    if granularity not in series.GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Mức chia thời gian không được hỗ trợ.")
+    if metric not in series.METRICS:
+        raise HTTPException(status_code=400, detail="Chỉ số không được hỗ trợ.")
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="Ngày kết thúc phải sau ngày bắt đầu.")
+    if series.bucket_count(from_date, to_date, granularity) > series.MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Khoảng thời gian quá dài (tối đa {series.MAX_BUCKETS} điểm dữ liệu)."
+        )
+
+    return await db.run_sync(series.build_series, current_user.id, granularity, from_date, to_date, metric)
+
+@router.get("/forecast")
+async def get_forecast(
+    days: int = Query(90, ge=1, le=365),
+    db: AsyncSession = Depends(connection.get_async_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    """
+    Dự báo số dư từng tài khoản cho `days` ngày tới: số dư hiện tại + các lần chạy
+    của giao dịch định kỳ + mức chi trung bình theo danh mục (giao dịch không định kỳ).
+    Kết quả được cache đến khi dữ liệu của user thay đổi.
+    """
+    return await forecast.get_forecast(db, current_user.id, days)
+
 @router.get("/export")
 def export_transactions(
-    db: Session = Depends(connection.get_db),
+    format: str = Query("xlsx", enum=["xlsx", "csv", "ndjson"]),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    account_id: Optional[int] = Query(None),
     current_user: models.User = Depends(deps.get_current_user)
 ):
-    """Xuất toàn bộ giao dịch ra file Excel"""
-    
-    # 1. Truy vấn dữ liệu (Sửa Join và chọn trường)
-    # Cần join tường minh qua source_account_id và sử dụng alias nếu cần join 2 lần
-    
-    # Tạo alias cho bảng Account khi join lần thứ hai (destination account)
-    # Lưu ý: với SQLAlchemy ORM cần dùng sqlalchemy.orm.aliased, không phải .alias() trên model class.
-    AccountDestination = aliased(models.Account)
-    
-    transactions = db.query(
-        models.Transaction.transaction_date,
-        models.Transaction.description,
-        models.Category.name.label("category_name"),
-        models.Account.name.label("source_account_name"), # Tài khoản nguồn
-        AccountDestination.name.label("destination_account_name"), # Tài khoản đích (dùng alias)
-        models.Transaction.type,
-        models.Transaction.amount
-    ).outerjoin(models.Category, models.Transaction.category_id == models.Category.id)\
-     .join(models.Account, models.Transaction.source_account_id == models.Account.id)\
-     .outerjoin(AccountDestination, models.Transaction.destination_account_id == AccountDestination.id)\
-     .filter(models.Account.user_id == current_user.id)\
-     .order_by(models.Transaction.transaction_date.desc()).all()
-
-    # 2. Chuyển đổi sang DataFrame của Pandas
-    data = []
-    for t in transactions:
-        
-        account_info = t.source_account_name
-        # Xử lý trường hợp chuyển khoản để hiển thị tài khoản đích
-        if t.type.value == "TRANSFER":
-            dest_name = t.destination_account_name if t.destination_account_name else "Không rõ"
-            account_info = f"{t.source_account_name} -> {dest_name}"
-
-        data.append({
-            "Ngày giao dịch": t.transaction_date.strftime("%Y-%m-%d %H:%M"),
-            "Mô tả": t.description,
-            "Danh mục": t.category_name if t.category_name else ("Chuyển khoản" if t.type.value == "TRANSFER" else "Không có"),
-            "Tài khoản": account_info,
-            "Loại": "Chi tiêu" if t.type.value == "EXPENSE" else ("Thu nhập" if t.type.value == "INCOME" else "Chuyển tiền"),
-            "Số tiền": float(t.amount)
-        })
-    
-    df = pd.DataFrame(data)
+    """
+    Xuất giao dịch (có thể lọc theo khoảng ngày và tài khoản).
+    - xlsx: file Excel cho người dùng, dữ liệu được đọc theo lô và ghi dần vào workbook.
+    - csv / ndjson: bản dạng máy đọc cho team dữ liệu, trên PostgreSQL chạy bằng COPY TO STDOUT.
+    """
+    if format not in ("xlsx", "csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Định dạng xuất không được hỗ trợ.")
 
-    # 3. Tạo file Excel trong bộ nhớ (RAM)
-    output = io.BytesIO()
-    # Sử dụng engine='openpyxl' để xử lý .xlsx
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Giao dịch')
-    
-    output.seek(0)
-
-    # 4. Trả về response dạng file tải xuống
+    filters = dict(start_date=start_date, end_date=end_date, account_id=account_id)
+    filename = f"bao_cao_chi_tieu_{datetime.date.today()}.{format}"
     headers = {
-        'Content-Disposition': f'attachment; filename="bao_cao_chi_tieu_{datetime.date.today()}.xlsx"'
+        'Content-Disposition': f'attachment; filename="{filename}"'
     }
-    return StreamingResponse(
-        output, 
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-        headers=headers
+
+    if format == "xlsx":
+        body = exports.stream_xlsx_export(current_user.id, **filters)
+        media_type = exports.XLSX_MEDIA_TYPE
+    else:
+        body = exports.stream_raw_export(current_user.id, format, **filters)
+        media_type = exports.CSV_MEDIA_TYPE if format == "csv" else exports.NDJSON_MEDIA_TYPE
+
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+# --- JOB XUẤT FILE CHẠY NỀN (cho dữ liệu lớn) ---
+def _job_response(job) -> dict:
+    data = job.as_dict()
+    if job.status == "done":
+        data["download_url"] = f"/reports/exports/{job.id}/download"
+    return data
+
+
+@router.post("/exports", response_model=export_schema.ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_export_job(
+    job_in: export_schema.ExportJobCreate,
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    """Tạo job xuất file chạy nền, trả về id ngay để client theo dõi tiến độ."""
+    job = export_jobs.submit(
+        current_user.id,
+        job_in.format,
+        dict(start_date=job_in.start_date, end_date=job_in.end_date, account_id=job_in.account_id),
+    )
+    return _job_response(job)
+
+
+@router.get("/exports/{job_id}", response_model=export_schema.ExportJobResponse)
+def read_export_job(
+    job_id: str,
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    job = export_jobs.get(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job xuất file (hoặc file đã hết hạn).")
+    return _job_response(job)
+
+
+@router.get("/exports/{job_id}/download")
+def download_export_job(
+    job_id: str,
+    request: Request,
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    """
+    Tải file đã xuất. Hỗ trợ header Range / If-Range để tải tiếp khi bị ngắt,
+    ETag là hash SHA-256 của nội dung file (If-None-Match khớp -> 304).
+    """
+    job = export_jobs.get(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job xuất file (hoặc file đã hết hạn).")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="File chưa sẵn sàng để tải.")
+
+    if request.headers.get("if-none-match") == job.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": job.etag})
+
+    return FileResponse(
+        job.path,
+        media_type=job.media_type,
+        filename=job.filename,
+        headers={"ETag": job.etag},
     )
@@ -1,162 +1,274 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
+from sqlalchemy import tuple_, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional 
 from datetime import date # Nhớ import thêm date
+from decimal import Decimal
+from collections import defaultdict
 
 from app.database import connection, models
 from app.schemas import transaction_schema
-from app.core import deps
+from app.core import deps, periods, rollups, pagination, balances, changes
 
 router = APIRouter()
 
+# Endpoint ghi dùng chung các helper đồng bộ (balances, rollups) với scheduler giao dịch định kỳ,
+# nên phần thân chạy qua AsyncSession.run_sync: vẫn là code kiểu Session nhưng I/O không chặn event loop.
+
 # --- 1. TẠO GIAO DỊCH MỚI (Giữ nguyên) ---
 @router.post("/", response_model=transaction_schema.TransactionResponse, status_code=status.HTTP_201_CREATED)
-def create_transaction(
+async def create_transaction(
     transaction_in: transaction_schema.TransactionCreate,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
-    source_account = db.query(models.Account).filter(models.Account.id == transaction_in.source_account_id).first()
-    if not source_account or source_account.user_id != current_user.id:
+    return await db.run_sync(_create_transaction, transaction_in, current_user.id)
+
+
+def _create_transaction(db: Session, transaction_in: transaction_schema.TransactionCreate, user_id: int):
+    is_transfer = transaction_in.type == models.TransactionType.TRANSFER
+    if is_transfer and not transaction_in.destination_account_id:
+        raise HTTPException(status_code=400, detail="Giao dịch chuyển khoản cần có tài khoản đích.")
+
+    # Khóa tài khoản nguồn (và đích nếu là chuyển khoản) theo thứ tự id cố định
+    accounts = balances.lock_accounts(
+        db, user_id,
+        [transaction_in.source_account_id, transaction_in.destination_account_id if is_transfer else None]
+    )
+    if transaction_in.source_account_id not in accounts:
         raise HTTPException(status_code=403, detail="Không có quyền truy cập vào tài khoản nguồn.")
+    if is_transfer and transaction_in.destination_account_id not in accounts:
+        raise HTTPException(status_code=403, detail="Không có quyền truy cập vào tài khoản đích.")
 
     if transaction_in.category_id:
         category = db.query(models.Category).filter(models.Category.id == transaction_in.category_id).first()
-        if not category or category.user_id != current_user.id:
+        if not category or category.user_id != user_id:
             raise HTTPException(status_code=403, detail="Không có quyền truy cập vào danh mục.")
 
-    if transaction_in.type == models.TransactionType.EXPENSE:
-        source_account.current_balance -= transaction_in.amount
-    elif transaction_in.type == models.TransactionType.INCOME:
-        source_account.current_balance += transaction_in.amount
-    elif transaction_in.type == models.TransactionType.TRANSFER:
-        if not transaction_in.destination_account_id:
-            raise HTTPException(status_code=400, detail="Giao dịch chuyển khoản cần có tài khoản đích.")
-        
-        destination_account = db.query(models.Account).filter(models.Account.id == transaction_in.destination_account_id).first()
-        if not destination_account or destination_account.user_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Không có quyền truy cập vào tài khoản đích.")
-
-        source_account.current_balance -= transaction_in.amount
-        destination_account.current_balance += transaction_in.amount
-        db.add(destination_account) 
+    # Cập nhật số dư ngay trong database (current_balance = current_balance + delta)
+    balances.apply_balance_deltas(db, balances.transaction_deltas(transaction_in))
 
-    db.add(source_account) 
-    new_transaction = models.Transaction(**transaction_in.dict())
+    new_transaction = models.Transaction(**transaction_in.dict(), user_id=user_id)
     db.add(new_transaction)
+    rollups.add_transaction(db, new_transaction)
     db.commit()
     db.refresh(new_transaction)
     return new_transaction
 
 
+# --- 1b. TẠO NHIỀU GIAO DỊCH CÙNG LÚC (Import lịch sử từ ứng dụng di động) ---
+@router.post("/batch", response_model=List[transaction_schema.TransactionResponse], status_code=status.HTTP_201_CREATED)
+async def create_transactions_batch(
+    batch_in: transaction_schema.TransactionBatchCreate,
+    db: AsyncSession = Depends(connection.get_async_db),
+    current_user: models.User = Depends(deps.get_current_user)
+):
+    return await db.run_sync(_create_transactions_batch, batch_in, current_user.id)
+
+
+def _create_transactions_batch(db: Session, batch_in: transaction_schema.TransactionBatchCreate, user_id: int):
+    """
+    Tạo nhiều giao dịch trong MỘT database transaction (tất cả hoặc không gì cả):
+    - Kiểm tra quyền sở hữu mọi tài khoản và danh mục bằng 2 truy vấn
+    - Chèn tất cả giao dịch bằng một câu INSERT nhiều dòng
+    - Mỗi tài khoản chỉ cập nhật số dư một lần (tổng các thay đổi)
+    """
+    items = batch_in.transactions
+
+    # 1. Gom các tài khoản/danh mục được tham chiếu
+    account_ids = set()
+    category_ids = set()
+    for item in items:
+        account_ids.add(item.source_account_id)
+        if item.type == models.TransactionType.TRANSFER:
+            if not item.destination_account_id:
+                raise HTTPException(status_code=400, detail="Giao dịch chuyển khoản cần có tài khoản đích.")
+            account_ids.add(item.destination_account_id)
+        if item.category_id:
+            category_ids.add(item.category_id)
+
+    # 2. Kiểm tra quyền sở hữu (2 truy vấn cho cả lô), đồng thời khóa các tài khoản
+    owned_accounts = balances.lock_accounts(db, user_id, account_ids)
+    if account_ids - owned_accounts.keys():
+        raise HTTPException(status_code=403, detail="Không có quyền truy cập vào một hoặc nhiều tài khoản.")
+
+    if category_ids:
+        owned_categories = {
+            row.id for row in db.query(models.Category.id).filter(
+                models.Category.id.in_(category_ids),
+                models.Category.user_id == user_id
+            )
+        }
+        if category_ids - owned_categories:
+            raise HTTPException(status_code=403, detail="Không có quyền truy cập vào một hoặc nhiều danh mục.")
+
+    # 3. Tính tổng thay đổi số dư cho từng tài khoản
+    deltas = defaultdict(Decimal)
+    for item in items:
+        balances.transaction_deltas(item, deltas=deltas)
+
+    # 4. Ghi tất cả trong một lần commit
+    try:
+        # SQLAlchemy gộp thành INSERT ... VALUES (...), (...) RETURNING. Trả về đúng thứ tự của lô
+        # (sort_by_parameter_order) chỉ giữ một câu lệnh trên PostgreSQL (id SERIAL làm sentinel);
+        # backend khác (SQLite) sẽ chèn từng dòng -> không yêu cầu thứ tự, sắp lại theo id
+        # (id được cấp tăng dần theo thứ tự VALUES trong một câu INSERT)
+        ordered = db.get_bind().dialect.name == "postgresql"
+        new_transactions = db.scalars(
+            insert(models.Transaction).returning(models.Transaction, sort_by_parameter_order=ordered),
+            [dict(item.dict(), user_id=user_id) for item in items]
+        ).all()
+        if not ordered:
+            new_transactions = sorted(new_transactions, key=lambda transaction: transaction.id)
+        balances.apply_balance_deltas(db, deltas)
+        rollups.add_transactions(db, new_transactions)
+        changes.mark_user_changed(db, user_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # RETURNING đã nạp đủ các cột và AsyncSession không expire object sau commit
+    # -> trả về luôn, không cần truy vấn lại
+    return new_transactions
+
+
 # --- 2. LẤY DANH SÁCH GIAO DỊCH (ĐÃ CẬP NHẬT để hỗ trợ Optional account_id và bộ lọc nâng cao) ---
-@router.get("/", response_model=List[transaction_schema.TransactionResponse])
-def read_transactions(
+@router.get("/", response_model=List[transaction_schema.TransactionResponse], dependencies=[Depends(deps.etag_guard)])
+async def read_transactions(
     account_id: Optional[int] = None,
     category_id: Optional[int] = None,
     type: Optional[models.TransactionType] = None,
     search: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(connection.get_db),
+    response: Response = None,
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
     """
     Lấy danh sách giao dịch với bộ lọc nâng cao.
+
+    Phân trang (khuyến nghị dùng cursor):
+    - Trang đầu: không truyền `cursor`. Nếu còn dữ liệu, header `X-Next-Cursor` chứa cursor của trang sau.
+    - Trang sau: truyền lại `cursor` đó (giữ nguyên các bộ lọc). Hết dữ liệu thì không có header.
+    - `skip` vẫn được hỗ trợ để tương thích ngược, nhưng chậm dần với các trang sâu và bị bỏ qua khi có `cursor`.
     """
-    # 1. Base Query: Join với Account để lọc theo User
-    query = db.query(models.Transaction).join(
-        models.Account, 
-        models.Transaction.source_account_id == models.Account.id
-    ).filter(models.Account.user_id == current_user.id)
+    # 1. Base Query: Lọc trực tiếp theo user_id của giao dịch (không cần join Account)
+    query = select(models.Transaction).where(models.Transaction.user_id == current_user.id)
 
     # 2. Áp dụng các bộ lọc nếu có
     if account_id:
         # Kiểm tra quyền sở hữu (dù đã join, nhưng kiểm tra tường minh tốt hơn)
-        account = db.query(models.Account).filter(models.Account.id == account_id).first()
+        account = await db.get(models.Account, account_id)
         if not account or account.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Không có quyền truy cập tài khoản này")
 
-        query = query.filter(
+        query = query.where(
             (models.Transaction.source_account_id == account_id) |
             (models.Transaction.destination_account_id == account_id)
         )
     
     if category_id:
-        query = query.filter(models.Transaction.category_id == category_id)
+        query = query.where(models.Transaction.category_id == category_id)
         
     if type:
-        query = query.filter(models.Transaction.type == type)
+        query = query.where(models.Transaction.type == type)
         
     if search:
         # Tìm kiếm không phân biệt hoa thường trong description
-        query = query.filter(models.Transaction.description.ilike(f"%{search}%"))
-        
-    if start_date:
-        query = query.filter(models.Transaction.transaction_date >= start_date)
+        query = query.where(models.Transaction.description.ilike(f"%{search}%"))
         
-    if end_date:
-        query = query.filter(models.Transaction.transaction_date <= end_date)
+    if start_date or end_date:
+        # Khoảng nửa mở [start_date, end_date + 1 ngày): tính trọn ngày cuối và dùng được index
+        query = query.where(periods.within(
+            models.Transaction.transaction_date,
+            periods.date_range_bounds(start_date, end_date)
+        ))
 
     # 3. Sắp xếp và Phân trang
-    transactions = query.order_by(models.Transaction.transaction_date.desc())\
-                         .offset(skip).limit(limit).all()
+    # Sắp xếp theo (transaction_date, id) để thứ tự ổn định khi nhiều giao dịch trùng thời điểm
+    query = query.order_by(models.Transaction.transaction_date.desc(), models.Transaction.id.desc())
+
+    if cursor:
+        # Keyset: bắt đầu ngay sau bản ghi cuối của trang trước (dùng được index, không cần OFFSET)
+        last_date, last_id = pagination.decode_cursor(cursor)
+        query = query.where(
+            tuple_(models.Transaction.transaction_date, models.Transaction.id) < tuple_(last_date, last_id)
+        )
+    elif skip:
+        query = query.offset(skip)
+
+    transactions = (await db.scalars(query.limit(limit))).all()
+
+    if response is not None and limit > 0 and len(transactions) == limit:
+        last = transactions[-1]
+        response.headers["X-Next-Cursor"] = pagination.encode_cursor(last.transaction_date, last.id)
     
     return transactions
 
 
 # --- 3. CẬP NHẬT GIAO DỊCH (LOGIC THÔNG MINH MỚI) ---
 @router.put("/{transaction_id}", response_model=transaction_schema.TransactionResponse)
-def update_transaction(
+async def update_transaction(
     transaction_id: int,
     transaction_in: transaction_schema.TransactionUpdate,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
-    # 1. Lấy giao dịch cũ
-    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+    return await db.run_sync(_update_transaction, transaction_id, transaction_in, current_user.id)
+
+
+def _update_transaction(
+    db: Session, transaction_id: int, transaction_in: transaction_schema.TransactionUpdate, user_id: int
+):
+    # 1. Lấy và khóa giao dịch cũ (chỉ trong phạm vi của user hiện tại)
+    transaction = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction_id,
+        models.Transaction.user_id == user_id
+    ).with_for_update().first()
     if not transaction:
         raise HTTPException(status_code=404, detail="Giao dịch không tồn tại")
-    
-    # 2. Lấy tài khoản cũ để hoàn tác số dư
-    old_account = db.query(models.Account).filter(models.Account.id == transaction.source_account_id).first()
-    if not old_account or old_account.user_id != current_user.id:
+
+    update_data = transaction_in.dict(exclude_unset=True)
+    new_account_id = update_data.get("source_account_id", transaction.source_account_id)
+    new_destination_id = update_data.get("destination_account_id", transaction.destination_account_id)
+
+    # 2. Khóa mọi tài khoản liên quan (cũ + mới) trong một lần, theo thứ tự id
+    accounts = balances.lock_accounts(db, user_id, [
+        transaction.source_account_id, transaction.destination_account_id,
+        new_account_id, new_destination_id,
+    ])
+    if transaction.source_account_id not in accounts:
         # Nếu tài khoản cũ thuộc về user khác (không nên xảy ra nếu logic tạo đúng), hoặc không tồn tại
         raise HTTPException(status_code=403, detail="Không quyền truy cập tài khoản cũ")
+    if new_account_id not in accounts or (new_destination_id and new_destination_id not in accounts):
+        raise HTTPException(status_code=403, detail="Tài khoản mới không hợp lệ")
 
     # --- BƯỚC 3: HOÀN TÁC GIAO DỊCH CŨ (Revert) ---
-    if transaction.type == models.TransactionType.EXPENSE:
-        old_account.current_balance += transaction.amount
-    elif transaction.type == models.TransactionType.INCOME:
-        old_account.current_balance -= transaction.amount
+    deltas = balances.transaction_deltas(transaction, sign=-1)
     
+    # Gỡ giao dịch cũ khỏi bảng tổng hợp (sẽ cộng lại với giá trị mới ở bước 5)
+    rollups.remove_transaction(db, transaction)
+
     # --- BƯỚC 4: CHUẨN BỊ DỮ LIỆU MỚI ---
-    update_data = transaction_in.dict(exclude_unset=True)
-    
     # Cập nhật các trường thông tin vào object transaction (lúc này transaction.amount đã mang giá trị mới)
     for key, value in update_data.items():
         setattr(transaction, key, value)
 
     # --- BƯỚC 5: ÁP DỤNG GIAO DỊCH MỚI (Apply) ---
-    # Kiểm tra xem người dùng có đổi tài khoản khác không
-    new_account_id = update_data.get("source_account_id", transaction.source_account_id)
-    new_account = db.query(models.Account).filter(models.Account.id == new_account_id).first()
-    
-    if not new_account or new_account.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Tài khoản mới không hợp lệ")
+    # Tính toán lại với số tiền mới và loại giao dịch mới, gộp với phần hoàn tác
+    # -> mỗi tài khoản chỉ nhận một câu UPDATE
+    balances.transaction_deltas(transaction, deltas=deltas)
+    balances.apply_balance_deltas(db, deltas)
 
-    # Tính toán lại trên tài khoản mới với số tiền mới và loại giao dịch mới
-    if transaction.type == models.TransactionType.EXPENSE:
-        new_account.current_balance -= transaction.amount
-    elif transaction.type == models.TransactionType.INCOME:
-        new_account.current_balance += transaction.amount
+    rollups.add_transaction(db, transaction)
 
     # Lưu tất cả thay đổi vào Database
-    db.add(old_account)
-    if new_account.id != old_account.id: 
-        db.add(new_account)
     db.add(transaction)
     
     db.commit()
@@ -166,26 +278,32 @@ def update_transaction(
 
 # --- 4. XÓA GIAO DỊCH ---
 @router.delete("/{transaction_id}")
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int,
-    db: Session = Depends(connection.get_db),
+    db: AsyncSession = Depends(connection.get_async_db),
     current_user: models.User = Depends(deps.get_current_user)
 ):
-    transaction = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+    return await db.run_sync(_delete_transaction, transaction_id, current_user.id)
+
+
+def _delete_transaction(db: Session, transaction_id: int, user_id: int):
+    transaction = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction_id,
+        models.Transaction.user_id == user_id
+    ).with_for_update().first()
     if not transaction:
         raise HTTPException(status_code=404, detail="Giao dịch không tồn tại")
     
-    account = db.query(models.Account).filter(models.Account.id == transaction.source_account_id).first()
-    if not account or account.user_id != current_user.id:
+    accounts = balances.lock_accounts(
+        db, user_id, [transaction.source_account_id, transaction.destination_account_id]
+    )
+    if transaction.source_account_id not in accounts:
         raise HTTPException(status_code=403, detail="Không có quyền xóa giao dịch này")
 
-    # TỐI ƯU: Logic Revert số dư trước khi xóa
-    if transaction.type == models.TransactionType.EXPENSE:
-        account.current_balance += transaction.amount
-    elif transaction.type == models.TransactionType.INCOME:
-        account.current_balance -= transaction.amount
-    db.add(account)
+    # TỐI ƯU: Logic Revert số dư trước khi xóa (chuyển khoản hoàn tác cả tài khoản đích)
+    balances.apply_balance_deltas(db, balances.transaction_deltas(transaction, sign=-1))
 
+    rollups.remove_transaction(db, transaction)
     db.delete(transaction)
     db.commit()
     
@@ -14,4 +14,5 @@ def read_users_me(current_user: models.User = Depends(deps.get_current_user)):
     API để lấy thông tin của người dùng hiện tại (đã đăng nhập).
     """
     # Không cần làm gì thêm, chỉ cần trả về user đã được dependency xử lý
+    # (snapshot lấy từ principal cache nên không cần truy vấn Database)
     return current_user
\ No newline at end of file
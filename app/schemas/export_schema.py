@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+from datetime import date, datetime
+
+# --- Schema cho job xuất file chạy nền (/reports/exports) ---
+class ExportJobCreate(BaseModel):
+    format: Literal["xlsx", "csv", "ndjson"] = "xlsx"
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    account_id: Optional[int] = None
+
+class ExportJobResponse(BaseModel):
+    id: str
+    status: str # pending | running | rendering | done | failed
+    format: str
+    rows_written: int = 0
+    total_rows: Optional[int] = None
+    progress: float = 0.0 # 0.0 - 1.0
+    size_bytes: Optional[int] = None
+    etag: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    download_url: Optional[str] = None
@@ -14,6 +14,7 @@ class RecurringBase(BaseModel):
     type: TransactionType = Field(..., description="Loại giao dịch: EXPENSE, INCOME, hoặc TRANSFER.")
     description: Optional[str] = Field(None, max_length=255, description="Mô tả giao dịch.")
     frequency: FrequencyType = Field(..., description="Tần suất lặp lại: DAILY, WEEKLY, MONTHLY, YEARLY.")
+    interval: int = Field(1, ge=1, le=366, description="Bước lặp: mỗi `interval` đơn vị của frequency (ví dụ 2 + WEEKLY = 2 tuần một lần).")
     start_date: date = Field(..., description="Ngày bắt đầu chu kỳ giao dịch.")
     is_active: bool = Field(True, description="Trạng thái kích hoạt của giao dịch định kỳ.")
 
@@ -77,6 +78,7 @@ class RecurringUpdate(BaseModel):
     type: Optional[TransactionType] = None
     description: Optional[str] = Field(None, max_length=255)
     frequency: Optional[FrequencyType] = None
+    interval: Optional[int] = Field(None, ge=1, le=366)
     start_date: Optional[date] = None # <--- ĐÃ THÊM DÒNG NÀY THEO YÊU CẦU
     is_active: Optional[bool] = None
     next_run_date: Optional[date] = None # Chỉ được dùng nội bộ bởi backend, không nên nhận từ client
@@ -109,4 +111,22 @@ class RecurringResponse(RecurringBase):
             # Giúp Decimal và Date được định dạng đúng khi chuyển sang JSON
             Decimal: lambda v: float(v),
             date: lambda v: v.isoformat()
-        }
\ No newline at end of file
+        }
+
+
+class RecurringOccurrence(BaseModel):
+    """Một lần chạy dự kiến của giao dịch định kỳ (lịch dự báo, chưa được tạo thành giao dịch)."""
+
+    recurring_id: int
+    occurrence_date: date
+    amount: Decimal
+    type: TransactionType
+    description: Optional[str] = None
+    source_account_id: int
+    destination_account_id: Optional[int] = None
+    category_id: Optional[int] = None
+
+    class Config:
+        json_encoders = {
+            Decimal: lambda v: float(v),
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal # <--- QUAN TRỌNG: Phải import Decimal
 from app.database.models import TransactionType
@@ -16,6 +16,10 @@ class TransactionCreate(TransactionBase):
     destination_account_id: Optional[int] = None
     category_id: Optional[int] = None
 
+# --- Schema cho việc Tạo nhiều giao dịch cùng lúc (POST /transactions/batch) ---
+class TransactionBatchCreate(BaseModel):
+    transactions: List[TransactionCreate] = Field(..., min_length=1, max_length=1000)
+
 class TransactionUpdate(BaseModel):
     amount: Optional[Decimal] = None # Sử dụng Decimal
     description: Optional[str] = None
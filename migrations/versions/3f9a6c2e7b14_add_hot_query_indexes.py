@@ -0,0 +1,66 @@
+"""Add indexes for hot query shapes
+
+Revision ID: 3f9a6c2e7b14
+Revises: da05f9b26080
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a6c2e7b14'
+down_revision: Union[str, Sequence[str], None] = 'da05f9b26080'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tên index, bảng, cột, tham số thêm) - khớp với __table_args__ trong models.py
+INDEXES = [
+    # Lọc theo tài khoản + sắp xếp theo ngày (danh sách giao dịch, báo cáo theo tài khoản)
+    ('ix_transactions_source_account_date', 'transactions', ['source_account_id', 'transaction_date'], {}),
+    ('ix_transactions_destination_account_date', 'transactions', ['destination_account_id', 'transaction_date'], {}),
+    # Chi tiêu theo danh mục trong một khoảng thời gian (ngân sách)
+    ('ix_transactions_category_date', 'transactions', ['category_id', 'transaction_date'], {}),
+    # Báo cáo theo khoảng thời gian: BRIN rất nhỏ và phù hợp với dữ liệu ghi theo thứ tự thời gian
+    ('ix_transactions_transaction_date_brin', 'transactions', ['transaction_date'], {'postgresql_using': 'brin'}),
+    # Kiểm tra quyền sở hữu theo user
+    ('ix_accounts_user_id', 'accounts', ['user_id'], {}),
+    ('ix_categories_user_name', 'categories', ['user_id', 'name'], {}),
+    ('ix_budgets_user_year_month', 'budgets', ['user_id', 'year', 'month'], {}),
+    ('ix_recurring_user_active_next_run', 'recurring_transactions', ['user_id', 'is_active', 'next_run_date'], {}),
+    ('ix_investments_user_id', 'investments', ['user_id'], {}),
+    ('ix_investment_updates_investment_date', 'investment_updates', ['investment_id', 'update_date'], {}),
+]
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _is_postgresql():
+        # CREATE INDEX CONCURRENTLY không chạy được trong transaction,
+        # nên phải dùng autocommit_block để không khóa ghi các bảng đang chạy thật
+        with op.get_context().autocommit_block():
+            for name, table, columns, kwargs in INDEXES:
+                op.create_index(name, table, columns, unique=False, postgresql_concurrently=True,
+                                if_not_exists=True, **kwargs)
+    else:
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, unique=False, **kwargs)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            for name, table, _, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
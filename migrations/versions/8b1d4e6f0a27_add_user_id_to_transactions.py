@@ -0,0 +1,52 @@
+"""Add user_id to transactions
+
+Revision ID: 8b1d4e6f0a27
+Revises: 3f9a6c2e7b14
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1d4e6f0a27'
+down_revision: Union[str, Sequence[str], None] = '3f9a6c2e7b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1. Thêm cột (cho phép NULL trong lúc backfill)
+    op.add_column('transactions', sa.Column('user_id', sa.Integer(), nullable=True))
+
+    # 2. Backfill: chủ sở hữu giao dịch là chủ sở hữu tài khoản nguồn
+    op.execute(
+        "UPDATE transactions SET user_id = ("
+        "SELECT accounts.user_id FROM accounts WHERE accounts.id = transactions.source_account_id"
+        ")"
+    )
+
+    # 3. Ràng buộc NOT NULL + khóa ngoại (batch để chạy được cả trên SQLite)
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_transactions_user_id_users', 'users', ['user_id'], ['id'])
+
+    # 4. Index (user_id, transaction_date) cho mọi truy vấn danh sách/báo cáo/ngân sách
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'transaction_date'],
+                            unique=False, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'transaction_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_user_date', table_name='transactions')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('fk_transactions_user_id_users', type_='foreignkey')
+        batch_op.drop_column('user_id')
@@ -0,0 +1,31 @@
+"""Add interval to recurring transactions (every N days/weeks/months/years)
+
+Revision ID: a4c9e2f7d318
+Revises: f7b2d9e4a613
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c9e2f7d318'
+down_revision: Union[str, Sequence[str], None] = 'f7b2d9e4a613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # server_default '1': các khoản định kỳ cũ giữ nguyên lịch (mỗi 1 chu kỳ)
+    with op.batch_alter_table('recurring_transactions') as batch_op:
+        batch_op.add_column(sa.Column('interval', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('recurring_transactions') as batch_op:
+        batch_op.drop_column('interval')
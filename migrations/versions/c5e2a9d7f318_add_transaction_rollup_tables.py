@@ -0,0 +1,73 @@
+"""Add transaction rollup tables
+
+Revision ID: c5e2a9d7f318
+Revises: 8b1d4e6f0a27
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a9d7f318'
+down_revision: Union[str, Sequence[str], None] = '8b1d4e6f0a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Kiểu enum 'transactiontype' đã tồn tại trên PostgreSQL (bảng transactions), không tạo lại
+transaction_type = sa.Enum('INCOME', 'EXPENSE', 'TRANSFER', name='transactiontype').with_variant(
+    postgresql.ENUM('INCOME', 'EXPENSE', 'TRANSFER', name='transactiontype', create_type=False), 'postgresql'
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transaction_daily_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('type', transaction_type, nullable=False),
+    sa.Column('total_amount', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('tx_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'category_id', 'type')
+    )
+    op.create_table('transaction_monthly_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('type', transaction_type, nullable=False),
+    sa.Column('total_amount', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('tx_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'month', 'category_id', 'type')
+    )
+
+    # Backfill từ dữ liệu giao dịch hiện có (category_id NULL -> 0)
+    op.execute(
+        "INSERT INTO transaction_daily_rollups (user_id, day, category_id, type, total_amount, tx_count) "
+        "SELECT user_id, date(transaction_date), COALESCE(category_id, 0), type, SUM(amount), COUNT(id) "
+        "FROM transactions "
+        "GROUP BY user_id, date(transaction_date), COALESCE(category_id, 0), type"
+    )
+    if op.get_bind().dialect.name == 'sqlite':
+        month_start = "date(day, 'start of month')"
+    else:
+        month_start = "date(date_trunc('month', day))"
+    op.execute(
+        "INSERT INTO transaction_monthly_rollups (user_id, month, category_id, type, total_amount, tx_count) "
+        f"SELECT user_id, {month_start}, category_id, type, SUM(total_amount), SUM(tx_count) "
+        "FROM transaction_daily_rollups "
+        f"GROUP BY user_id, {month_start}, category_id, type"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('transaction_monthly_rollups')
+    op.drop_table('transaction_daily_rollups')
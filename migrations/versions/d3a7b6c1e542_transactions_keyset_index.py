@@ -0,0 +1,38 @@
+"""Index (user_id, transaction_date, id) for keyset pagination
+
+Revision ID: d3a7b6c1e542
+Revises: c5e2a9d7f318
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a7b6c1e542'
+down_revision: Union[str, Sequence[str], None] = 'c5e2a9d7f318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Index mới bao phủ cả id (khóa phụ của cursor), thay thế index (user_id, transaction_date)
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_transactions_user_date_id', 'transactions', ['user_id', 'transaction_date', 'id'],
+                            unique=False, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index('ix_transactions_user_date', table_name='transactions',
+                          postgresql_concurrently=True, if_exists=True)
+    else:
+        op.create_index('ix_transactions_user_date_id', 'transactions', ['user_id', 'transaction_date', 'id'], unique=False)
+        op.drop_index('ix_transactions_user_date', table_name='transactions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'transaction_date'], unique=False)
+    op.drop_index('ix_transactions_user_date_id', table_name='transactions')
@@ -0,0 +1,36 @@
+"""Partial index on active recurring next_run_date for the scheduler
+
+Revision ID: e1f4c8a2b905
+Revises: d3a7b6c1e542
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f4c8a2b905'
+down_revision: Union[str, Sequence[str], None] = 'd3a7b6c1e542'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Scheduler nền hỏi MIN(next_run_date) và các khoản đến hạn của MỌI user -> index chỉ trên khoản đang hoạt động
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_recurring_due_next_run', 'recurring_transactions', ['next_run_date'], unique=False,
+                            postgresql_where=sa.text('is_active'),
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index('ix_recurring_due_next_run', 'recurring_transactions', ['next_run_date'], unique=False,
+                        sqlite_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_recurring_due_next_run', table_name='recurring_transactions')
@@ -0,0 +1,46 @@
+"""Link generated transactions to their recurring occurrence (unique guard)
+
+Revision ID: f7b2d9e4a613
+Revises: e1f4c8a2b905
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b2d9e4a613'
+down_revision: Union[str, Sequence[str], None] = 'e1f4c8a2b905'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1. Cột mới cho phép NULL (giao dịch nhập tay và dữ liệu cũ không có khoản định kỳ)
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('recurring_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('occurrence_date', sa.Date(), nullable=True))
+        batch_op.create_foreign_key('fk_transactions_recurring_id_recurring_transactions',
+                                    'recurring_transactions', ['recurring_id'], ['id'], ondelete='SET NULL')
+
+    # 2. Unique (recurring_id, occurrence_date): đích của INSERT ... ON CONFLICT DO NOTHING
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('uq_transactions_recurring_occurrence', 'transactions', ['recurring_id', 'occurrence_date'],
+                            unique=True, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index('uq_transactions_recurring_occurrence', 'transactions', ['recurring_id', 'occurrence_date'],
+                        unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_transactions_recurring_occurrence', table_name='transactions')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('fk_transactions_recurring_id_recurring_transactions', type_='foreignkey')
+        batch_op.drop_column('occurrence_date')
+        batch_op.drop_column('recurring_id')
@@ -0,0 +1,90 @@
+"""
+Benchmark: tốc độ xuất giao dịch (rows/sec) của các cách xuất.
+
+- pandas (cách cũ): .all() -> list dict -> DataFrame -> to_excel vào BytesIO
+- xlsx   : yield_per + openpyxl write-only (GET /reports/export)
+- csv    : COPY TO STDOUT trên PostgreSQL, generator đọc theo lô trên database khác
+- ndjson : như csv, mỗi dòng là một object JSON
+
+Cách chạy (từ thư mục gốc project):
+    python -m scripts.bench_export                       # SQLite tạm
+    python -m scripts.bench_export --database-url postgresql+psycopg2://.../bench_db
+
+KHÔNG trỏ vào database thật: script sẽ tạo bảng và chèn dữ liệu.
+Cách "pandas" chỉ chạy khi pandas có trong môi trường (không còn trong requirements.txt).
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core import exports
+from app.database import models
+from scripts.bench_period_predicates import seed
+
+
+def export_with_pandas(session_factory, user_id: int) -> int:
+    """Cách xuất cũ, giữ lại để so sánh."""
+    import pandas as pd
+
+    db = session_factory()
+    try:
+        rows = exports.build_export_query(db, user_id).all()
+        df = pd.DataFrame([dict(zip(exports.EXPORT_COLUMNS, exports.format_export_row(row))) for row in rows])
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name="Giao dịch")
+        return len(output.getvalue())
+    finally:
+        db.close()
+
+
+def consume(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    print(f"Seeding {args.rows} transactions on {engine.dialect.name} ...")
+    with session_factory() as db:
+        # Một user duy nhất -> toàn bộ dòng đều được xuất
+        seed(db, 1, args.rows, 3)
+        db.execute(text("ANALYZE"))
+        db.commit()
+
+    user_id = 1
+    variants = {
+        "xlsx (write-only)": lambda: consume(exports.stream_xlsx_export(user_id, session_factory=session_factory)),
+        "csv": lambda: consume(exports.stream_raw_export(user_id, "csv", session_factory=session_factory)),
+        "ndjson": lambda: consume(exports.stream_raw_export(user_id, "ndjson", session_factory=session_factory)),
+    }
+    try:
+        import pandas  # noqa: F401
+        variants = {"pandas (cũ)": lambda: export_with_pandas(session_factory, user_id), **variants}
+    except ImportError:
+        print("pandas chưa được cài -> bỏ qua cách xuất cũ")
+
+    print(f"\n{'cách xuất':<20}{'giây':>10}{'rows/sec':>14}{'MB':>10}")
+    for name, run in variants.items():
+        started = time.perf_counter()
+        size = run()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<20}{elapsed:>10.2f}{args.rows / elapsed:>14,.0f}{size / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: lọc theo extract('month')/extract('year') so với cận nửa mở [start, end).
+
+Tạo dữ liệu giả trên một database NHÁP, in kế hoạch thực thi (EXPLAIN) và thời gian
+chạy của cùng một truy vấn "tổng chi tiêu của user trong tháng" với hai kiểu điều kiện.
+
+Cách chạy (từ thư mục gốc project):
+    python -m scripts.bench_period_predicates                       # SQLite tạm
+    python -m scripts.bench_period_predicates --database-url postgresql+psycopg2://.../bench_db
+
+KHÔNG trỏ vào database thật: script sẽ tạo bảng và chèn dữ liệu.
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from sqlalchemy import create_engine, extract, func, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core import periods
+from app.database import models
+
+
+def seed(db, users: int, rows: int, years: int):
+    db.execute(insert(models.User), [
+        {"id": u, "username": f"bench_{u}", "password_hash": "x"} for u in range(1, users + 1)
+    ])
+    db.execute(insert(models.Account), [
+        {"id": u, "user_id": u, "name": "Ví", "current_balance": 0} for u in range(1, users + 1)
+    ])
+    start = datetime.datetime.now() - datetime.timedelta(days=365 * years)
+    span_seconds = 365 * years * 24 * 3600
+    batch = []
+    for i in range(rows):
+        user_id = random.randint(1, users)
+        batch.append({
+            "user_id": user_id,
+            "source_account_id": user_id,
+            "amount": Decimal(random.randint(1, 500)) * 1000,
+            "type": models.TransactionType.EXPENSE,
+            "transaction_date": start + datetime.timedelta(seconds=random.randint(0, span_seconds)),
+        })
+        if len(batch) == 10000:
+            db.execute(insert(models.Transaction), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Transaction), batch)
+    db.commit()
+
+
+def explain(db, query) -> str:
+    compiled = query.statement.compile(db.bind, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN " if db.bind.dialect.name == "sqlite" else "EXPLAIN "
+    rows = db.execute(text(prefix + str(compiled))).fetchall()
+    return "\n".join("    " + " | ".join(str(col) for col in row) for row in rows)
+
+
+def timed(query, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        query.scalar()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url)
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    print(f"Seeding {args.rows} transactions for {args.users} users on {engine.dialect.name} ...")
+    seed(db, args.users, args.rows, args.years)
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+    now = datetime.datetime.now()
+    user_id = 1
+    base = db.query(func.sum(models.Transaction.amount)).filter(
+        models.Transaction.user_id == user_id,
+        models.Transaction.type == models.TransactionType.EXPENSE,
+    )
+    variants = {
+        "extract(month/year)": base.filter(
+            extract('month', models.Transaction.transaction_date) == now.month,
+            extract('year', models.Transaction.transaction_date) == now.year,
+        ),
+        "half-open [start, end)": base.filter(
+            periods.within(models.Transaction.transaction_date, periods.month_bounds(now.month, now.year))
+        ),
+    }
+
+    results = {}
+    for name, query in variants.items():
+        results[name] = query.scalar()
+        print(f"\n=== {name} ===")
+        print(explain(db, query))
+        print(f"    avg {timed(query, args.repeat):.2f} ms over {args.repeat} runs")
+
+    assert len(set(results.values())) == 1, f"Kết quả không khớp: {results}"
+    print("\nCả hai điều kiện cho cùng kết quả:", results[next(iter(results))])
+
+
+if __name__ == "__main__":
+    main()
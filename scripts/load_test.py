@@ -0,0 +1,103 @@
+"""
+Load test: requests/sec và độ trễ (p50/p95/p99) của API khi có nhiều request đồng thời.
+
+Dùng để so sánh trước/sau một thay đổi (VD: router sync chạy trong threadpool so với
+router async def dùng AsyncSession): chạy server ở từng phiên bản với cùng database,
+rồi chạy script này với cùng tham số.
+
+Cách chạy (từ thư mục gốc project, server đang chạy sẵn):
+    uvicorn app.main:app --port 8000
+    python -m scripts.load_test --url http://localhost:8000 --username demo --password demo \\
+        --concurrency 200 --duration 30 \\
+        --path /accounts/ --path "/transactions/?limit=50" --path "/transactions/?search=an&limit=100"
+
+Các --path được gửi xoay vòng. Không gửi If-None-Match nên ETag không làm tắt request;
+cache báo cáo (/reports/dashboard, /reports/detailed) vẫn có hiệu lực phía server.
+Cần httpx (không có trong requirements.txt).
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import httpx
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client: httpx.AsyncClient, paths, deadline: float, latencies: list, errors: dict):
+    while time.perf_counter() < deadline:
+        path = next(paths)
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            status = response.status_code
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            errors[status] = errors.get(status, 0) + 1
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        token = args.token or await login(client, args.username, args.password)
+        client.headers["Authorization"] = f"Bearer {token}"
+
+        paths = itertools.cycle(args.path or ["/accounts/"])
+        # Khởi động: để server nạp cache xác thực / kết nối trước khi đo
+        for path in args.path or ["/accounts/"]:
+            await client.get(path)
+
+        latencies, errors = [], {}
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            worker(client, paths, deadline, latencies, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"concurrency={args.concurrency} duration={elapsed:.1f}s requests={len(latencies)}")
+    print(f"{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print(
+        f"{len(latencies) / elapsed:>10.1f}"
+        f"{percentile(latencies, 0.50) * 1000:>10.1f}"
+        f"{percentile(latencies, 0.95) * 1000:>10.1f}"
+        f"{percentile(latencies, 0.99) * 1000:>10.1f}"
+        f"{(latencies[-1] if latencies else 0) * 1000:>10.1f}"
+    )
+    if errors:
+        print("Lỗi:", ", ".join(f"{status}={count}" for status, count in sorted(errors.items(), key=str)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", default=None, help="Access token có sẵn (bỏ qua bước đăng nhập)")
+    parser.add_argument("--username", default=None)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--path", action="append", help="Đường dẫn GET, có thể lặp lại")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0, help="Số giây đo")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    if not args.token and not (args.username and args.password):
+        parser.error("cần --token hoặc --username và --password")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
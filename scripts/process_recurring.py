@@ -0,0 +1,34 @@
+"""
+Xử lý ngay các khoản chi tiêu định kỳ đã đến hạn (cho mọi user hoặc một user),
+dùng khi scheduler nền bị tắt hoặc cần chạy bù thủ công.
+
+Cách chạy (từ thư mục gốc project):
+    python -m scripts.process_recurring              # toàn bộ user
+    python -m scripts.process_recurring --user-id 5  # một user
+"""
+import argparse
+
+from app.core import recurring_processor
+from app.core.config import settings
+from app.database.connection import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=settings.RECURRING_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            processed = recurring_processor.process_due_transactions(db, user_id=args.user_id)
+        else:
+            processed = recurring_processor.process_all_due(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Đã xử lý {processed} lượt giao dịch định kỳ")
+
+
+if __name__ == "__main__":
+    main()
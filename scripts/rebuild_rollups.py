@@ -0,0 +1,33 @@
+"""
+Tính lại bảng tổng hợp giao dịch (transaction_daily_rollups / transaction_monthly_rollups)
+từ bảng transactions, dùng khi dữ liệu tổng hợp bị lệch.
+
+Cách chạy (từ thư mục gốc project):
+    python -m scripts.rebuild_rollups              # toàn bộ user
+    python -m scripts.rebuild_rollups --user-id 5  # một user
+"""
+import argparse
+
+from app.core import rollups
+from app.database.connection import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rollups.rebuild(db, user_id=args.user_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print("Đã tính lại bảng tổng hợp" + (f" cho user {args.user_id}" if args.user_id else " cho toàn bộ user"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Fixture dùng chung cho các test chạy trực tiếp trên SQLAlchemy (không cần server).
+Dùng SQLite dạng file trong thư mục tạm của từng test để test chạy được ở mọi môi trường;
+fixture `api` gọi các router thật qua HTTP (TestClient) trên cùng database đó.
+"""
+
+import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+
+from app.core import changes, rollups, security
+from app.core.forecast import forecast_cache
+from app.core.principal_cache import principal_cache
+from app.core.report_cache import report_cache
+from app.database import connection, models
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_caches():
+    """Mỗi test có database riêng nhưng cùng user_id -> xóa các cache dùng chung của tiến trình."""
+    for cache in (changes.data_versions, forecast_cache, report_cache, principal_cache):
+        cache.clear()
+    yield
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Dạng file (không phải in-memory) để AsyncSession của fixture `api` thấy cùng dữ liệu
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def query_counter(engine):
+    """Đếm số câu SQL được gửi xuống database."""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", _record)
+
+
+@pytest.fixture
+def user(db):
+    user = models.User(username="tester", email="tester@example.com", password_hash="x", full_name="Tester")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def account(db, user):
+    account = models.Account(user_id=user.id, name="Ví", type="CASH", current_balance=Decimal("1000000"))
+    db.add(account)
+    db.commit()
+    db.refresh(account)
+    return account
+
+
+@pytest.fixture
+def api(engine, user):
+    """
+    TestClient gọi các router thật, đăng nhập bằng access token của `user`.
+    Router async def dùng AsyncSession qua aiosqlite trên cùng database với fixture `db`
+    (dữ liệu ghi qua API: gọi db.expire_all() trước khi đọc lại bằng `db`).
+    Không chạy lifespan (scheduler, mở sẵn kết nối).
+    """
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    async_engine = create_async_engine(
+        connection.async_database_url(engine.url.render_as_string(hide_password=False)), poolclass=NullPool
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    async def _get_async_db():
+        async with AsyncSessionLocal() as session:
+            yield session
+
+    def _get_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[connection.get_async_db] = _get_async_db
+    app.dependency_overrides[connection.get_db] = _get_db
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {security.create_access_token(user.id)}"
+    try:
+        yield client
+    finally:
+        app.dependency_overrides.clear()
+
+
+def make_category(db, user, name, type=models.TransactionType.EXPENSE):
+    category = models.Category(user_id=user.id, name=name, type=type)
+    db.add(category)
+    db.commit()
+    db.refresh(category)
+    return category
+
+
+def make_transaction(db, account, amount, type, category=None, when=None):
+    transaction = models.Transaction(
+        user_id=account.user_id,
+        source_account_id=account.id,
+        category_id=category.id if category else None,
+        amount=Decimal(str(amount)),
+        type=type,
+        description="test",
+        transaction_date=when or datetime.datetime.now(),
+    )
+    db.add(transaction)
+    rollups.add_transaction(db, transaction)
+    db.commit()
+    return transaction
@@ -0,0 +1,63 @@
+"""
+Test HTTP cho các router async def (accounts, budgets, transactions) chạy trên AsyncSession
+(aiosqlite): bắt lỗi lazy-load / MissingGreenlet mà các test gọi thẳng phần thân đồng bộ bỏ sót.
+"""
+
+import datetime
+from decimal import Decimal
+
+from app.database import models
+from tests.conftest import make_category
+
+
+def test_accounts_crud_over_http(api, account):
+    created = api.post("/accounts/", json={"name": "Ngân hàng", "type": "BANK", "current_balance": "50.00"})
+    assert created.status_code == 201
+    account_id = created.json()["id"]
+
+    assert api.put(f"/accounts/{account_id}", json={"name": "VCB"}).json()["name"] == "VCB"
+    assert api.get(f"/accounts/{account_id}").json()["current_balance"] == "50.00"
+    assert sorted(row["id"] for row in api.get("/accounts/").json()) == sorted([account.id, account_id])
+
+    assert api.delete(f"/accounts/{account_id}").status_code == 204
+    assert api.get(f"/accounts/{account_id}").status_code == 404
+
+
+def test_budgets_report_spent_amount_over_http(api, db, user, account):
+    food = make_category(db, user, "Ăn uống")
+    now = datetime.datetime.now()
+    api.post("/transactions/", json={
+        "type": "EXPENSE", "amount": "120.50", "source_account_id": account.id,
+        "category_id": food.id, "transaction_date": now.isoformat(),
+    })
+
+    created = api.post("/budgets/", json={"amount": "500", "month": now.month, "year": now.year, "category_id": food.id})
+    assert created.status_code == 201
+    assert (created.json()["category_name"], created.json()["spent_amount"]) == ("Ăn uống", 120.5)
+
+    budgets = api.get("/budgets/").json()
+    assert [(row["id"], row["spent_amount"]) for row in budgets] == [(created.json()["id"], 120.5)]
+    assert api.put(f"/budgets/{created.json()['id']}", json={"amount": "800"}).json()["amount"] == 800
+
+
+def test_transactions_create_update_delete_over_http(api, db, account):
+    payload = {
+        "type": "EXPENSE", "amount": "10.00", "source_account_id": account.id,
+        "description": "Cà phê", "transaction_date": "2026-01-15T08:00:00",
+    }
+    created = api.post("/transactions/", json=payload)
+    assert created.status_code == 201
+    transaction_id = created.json()["id"]
+
+    updated = api.put(f"/transactions/{transaction_id}", json={"amount": "25.00"})
+    assert updated.status_code == 200
+    assert updated.json()["amount"] == "25.00"
+    assert [row["id"] for row in api.get("/transactions/").json()] == [transaction_id]
+
+    db.expire_all()
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000") - Decimal("25.00")
+
+    assert api.delete(f"/transactions/{transaction_id}").status_code == 200
+    assert api.get("/transactions/").json() == []
+    db.expire_all()
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000")
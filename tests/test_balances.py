@@ -0,0 +1,155 @@
+"""
+Cập nhật số dư không được làm mất cập nhật (lost update) khi nhiều request chạy song song.
+
+- Số dư được đổi bằng một câu UPDATE nguyên tử (current_balance = current_balance + delta),
+  không đọc số dư lên Python rồi ghi đè lại (kiểm tra bằng câu SQL thực sự được gửi đi).
+- Stress test nhiều thread trên cùng tài khoản:
+  * SQLite dạng file: mỗi transaction mở bằng BEGIN IMMEDIATE (SQLite không có khóa dòng) nên các
+    thread bị tuần tự hóa - chỉ kiểm tra không lỗi/deadlock và tổng số dư, KHÔNG phát hiện được lost update.
+  * PostgreSQL: chạy khi đặt TEST_DATABASE_URL (database riêng cho test, các bảng bị xóa sau test),
+    các transaction thực sự chạy đồng thời với khóa dòng; không đặt thì bỏ qua.
+"""
+
+import datetime
+import os
+import re
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import models
+from app.routers import transactions
+from app.schemas import transaction_schema
+
+THREADS = 8
+WRITES_PER_THREAD = 25
+
+
+def _sqlite_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'stress.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def stress_engine(request, tmp_path):
+    if request.param == "sqlite":
+        engine = _sqlite_engine(tmp_path)
+    else:
+        url = os.getenv("TEST_DATABASE_URL")
+        if not url or not url.startswith("postgresql"):
+            pytest.skip("Đặt TEST_DATABASE_URL=postgresql+psycopg2://... để chạy trên PostgreSQL")
+        engine = create_engine(url, pool_size=THREADS)
+        models.Base.metadata.drop_all(engine)
+
+    models.Base.metadata.create_all(engine)
+    yield engine
+    if request.param != "sqlite":
+        models.Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def _run_parallel(session_factory, work):
+    errors = []
+
+    def _worker(worker_id):
+        db = session_factory()
+        try:
+            for i in range(WRITES_PER_THREAD):
+                work(db, worker_id, i)
+        except Exception as exc:  # pragma: no cover - chỉ để báo lỗi rõ ràng
+            errors.append(exc)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=_worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+
+
+def test_balance_change_is_a_single_atomic_update(db, account, query_counter):
+    query_counter.clear()
+    transactions._create_transaction(db, transaction_schema.TransactionCreate(
+        type=models.TransactionType.EXPENSE, amount=Decimal("1.25"), source_account_id=account.id,
+        transaction_date=datetime.datetime(2026, 1, 15, 12, 0),
+    ), account.user_id)
+
+    balance_updates = [
+        " ".join(statement.split()) for statement in query_counter
+        if re.match(r"\s*UPDATE accounts\b", statement)
+    ]
+    assert balance_updates == [
+        "UPDATE accounts SET current_balance=(accounts.current_balance + ?) WHERE accounts.id = ?"
+    ]
+    db.expire_all()
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000") - Decimal("1.25")
+
+
+def test_parallel_writes_keep_exact_balance(stress_engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=stress_engine)
+
+    with Session() as db:
+        user = models.User(username="stress", email="stress@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        wallet = models.Account(user_id=user.id, name="Ví", type="CASH", current_balance=Decimal("1000.00"))
+        bank = models.Account(user_id=user.id, name="Ngân hàng", type="BANK", current_balance=Decimal("1000.00"))
+        db.add_all([wallet, bank])
+        db.commit()
+        user_id, wallet_id, bank_id = user.id, wallet.id, bank.id
+
+    now = datetime.datetime(2026, 1, 15, 12, 0)
+
+    def _write(db, worker_id, i):
+        kind = (worker_id + i) % 4
+        if kind == 0:
+            payload = dict(type=models.TransactionType.EXPENSE, amount=Decimal("1.25"), source_account_id=wallet_id)
+        elif kind == 1:
+            payload = dict(type=models.TransactionType.INCOME, amount=Decimal("2.50"), source_account_id=wallet_id)
+        elif kind == 2:
+            payload = dict(type=models.TransactionType.TRANSFER, amount=Decimal("3.00"),
+                           source_account_id=wallet_id, destination_account_id=bank_id)
+        else:
+            # Chuyển ngược chiều để kiểm tra thứ tự khóa cố định
+            payload = dict(type=models.TransactionType.TRANSFER, amount=Decimal("0.75"),
+                           source_account_id=bank_id, destination_account_id=wallet_id)
+        # Phần thân đồng bộ của POST /transactions (endpoint async chạy nó qua run_sync)
+        transactions._create_transaction(
+            db, transaction_schema.TransactionCreate(transaction_date=now, **payload), user_id
+        )
+
+    _run_parallel(Session, _write)
+
+    # Số dư kỳ vọng tính lại từ chính các giao dịch đã ghi
+    with Session() as db:
+        expected = {wallet_id: Decimal("1000.00"), bank_id: Decimal("1000.00")}
+        rows = db.query(models.Transaction).all()
+        assert len(rows) == THREADS * WRITES_PER_THREAD
+        for row in rows:
+            if row.type == models.TransactionType.EXPENSE:
+                expected[row.source_account_id] -= row.amount
+            elif row.type == models.TransactionType.INCOME:
+                expected[row.source_account_id] += row.amount
+            else:
+                expected[row.source_account_id] -= row.amount
+                expected[row.destination_account_id] += row.amount
+
+        assert db.get(models.Account, wallet_id).current_balance == expected[wallet_id]
+        assert db.get(models.Account, bank_id).current_balance == expected[bank_id]
@@ -0,0 +1,100 @@
+"""
+Test POST /transactions/batch: tất cả hoặc không gì cả, kiểm tra quyền sở hữu cho cả lô,
+mỗi tài khoản một delta tổng và số câu SQL không tăng theo số giao dịch trong lô.
+"""
+
+import datetime
+import re
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.database import models
+from app.routers import transactions
+from app.schemas import transaction_schema
+from tests.conftest import make_category
+
+WHEN = datetime.datetime(2026, 1, 15, 12, 0)
+
+
+def _batch(*items):
+    return transaction_schema.TransactionBatchCreate(transactions=[
+        transaction_schema.TransactionCreate(transaction_date=WHEN, **item) for item in items
+    ])
+
+
+def _expense(account, amount, **extra):
+    return dict(type=models.TransactionType.EXPENSE, amount=Decimal(amount), source_account_id=account.id, **extra)
+
+
+@pytest.fixture
+def foreign(db):
+    other = models.User(username="other", email="other@example.com", password_hash="x")
+    db.add(other)
+    db.flush()
+    account = models.Account(user_id=other.id, name="Ví lạ", type="CASH", current_balance=Decimal("50"))
+    category = models.Category(user_id=other.id, name="Lạ", type=models.TransactionType.EXPENSE)
+    db.add_all([account, category])
+    db.commit()
+    return account, category
+
+
+def test_batch_with_foreign_account_or_category_inserts_nothing(db, user, account, foreign):
+    foreign_account, foreign_category = foreign
+    food = make_category(db, user, "Ăn uống")
+    bad_batches = [
+        _batch(_expense(account, "10", category_id=food.id), _expense(foreign_account, "5")),
+        _batch(_expense(account, "10", category_id=food.id), _expense(account, "5", category_id=foreign_category.id)),
+        _batch(_expense(account, "10"), dict(
+            type=models.TransactionType.TRANSFER, amount=Decimal("5"),
+            source_account_id=account.id, destination_account_id=foreign_account.id,
+        )),
+    ]
+    for batch in bad_batches:
+        with pytest.raises(HTTPException) as error:
+            transactions._create_transactions_batch(db, batch, user.id)
+        assert error.value.status_code == 403
+        db.rollback()
+
+    db.expire_all()
+    assert db.query(models.Transaction).count() == 0
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000")
+    assert db.get(models.Account, foreign_account.id).current_balance == Decimal("50")
+    assert db.query(models.DailyRollup).count() == 0
+
+
+def test_mixed_batch_applies_one_summed_delta_per_account(db, user, account, query_counter):
+    bank = models.Account(user_id=user.id, name="Ngân hàng", type="BANK", current_balance=Decimal("100"))
+    db.add(bank)
+    db.commit()
+    batch = _batch(
+        _expense(account, "10"),
+        dict(type=models.TransactionType.INCOME, amount=Decimal("40"), source_account_id=account.id),
+        dict(type=models.TransactionType.TRANSFER, amount=Decimal("25"),
+             source_account_id=account.id, destination_account_id=bank.id),
+        _expense(bank, "5"),
+    )
+    query_counter.clear()
+    created = transactions._create_transactions_batch(db, batch, user.id)
+
+    # Kết quả trả về theo đúng thứ tự của lô
+    assert [(row.type, row.amount) for row in created] == [(item.type, item.amount) for item in batch.transactions]
+    balance_updates = [statement for statement in query_counter if re.match(r"\s*UPDATE accounts\b", statement)]
+    assert len(balance_updates) == 2
+    db.expire_all()
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000") - 10 + 40 - 25
+    assert db.get(models.Account, bank.id).current_balance == Decimal("100") + 25 - 5
+
+
+def test_batch_statement_count_does_not_grow_with_size(db, user, account, query_counter):
+    food = make_category(db, user, "Ăn uống")
+    counts = []
+    for size in (2, 20, 200):
+        batch = _batch(*[_expense(account, "1", category_id=food.id) for _ in range(size)])
+        query_counter.clear()
+        transactions._create_transactions_batch(db, batch, user.id)
+        counts.append(len(query_counter))
+
+    assert counts[0] == counts[1] == counts[2]
+    assert db.query(models.Transaction).count() == 222
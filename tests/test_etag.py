@@ -0,0 +1,79 @@
+"""
+Test ETag cho các endpoint GET (deps.etag_guard): If-None-Match khớp -> 304, mọi đường ghi
+(kể cả câu lệnh Core như INSERT nhiều dòng) đổi ETag, và ETag tách riêng theo tham số / user.
+"""
+
+from app.core import security
+from app.database import models
+
+
+def _etag(api, path="/transactions/", **kwargs):
+    response = api.get(path, **kwargs)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def _expense(account, amount="10.00"):
+    return {
+        "type": "EXPENSE", "amount": amount, "source_account_id": account.id,
+        "transaction_date": "2026-01-15T08:00:00",
+    }
+
+
+def test_unchanged_read_returns_304(api, account):
+    etag = _etag(api)
+    not_modified = api.get("/transactions/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert api.get("/transactions/", headers={"If-None-Match": 'W/"khac"'}).status_code == 200
+
+
+def test_every_write_path_changes_etag(api, account):
+    seen = [_etag(api)]
+
+    transaction_id = api.post("/transactions/", json=_expense(account)).json()["id"]
+    seen.append(_etag(api))
+
+    api.put(f"/transactions/{transaction_id}", json={"amount": "20.00"})
+    seen.append(_etag(api))
+
+    # INSERT nhiều dòng bằng câu lệnh Core: dựa vào changes.mark_user_changed
+    batch = api.post("/transactions/batch", json={"transactions": [_expense(account), _expense(account, "5.00")]})
+    assert batch.status_code == 201
+    seen.append(_etag(api))
+
+    api.delete(f"/transactions/{transaction_id}")
+    seen.append(_etag(api))
+
+    assert len(set(seen)) == len(seen)
+    # ETag cũ không còn khớp sau khi ghi
+    assert api.get("/transactions/", headers={"If-None-Match": seen[0]}).status_code == 200
+
+
+def test_query_params_are_part_of_etag(api, account):
+    etags = {
+        _etag(api),
+        _etag(api, params={"limit": 10}),
+        _etag(api, params={"limit": 10, "type": "EXPENSE"}),
+        _etag(api, path="/accounts/"),
+    }
+    assert len(etags) == 4
+    # Thứ tự tham số không quan trọng
+    assert _etag(api, params=[("type", "EXPENSE"), ("limit", 10)]) == _etag(api, params=[("limit", 10), ("type", "EXPENSE")])
+
+
+def test_other_users_write_keeps_etag(api, db, account):
+    other = models.User(username="other", email="other@example.com", password_hash="x")
+    db.add(other)
+    db.flush()
+    other_account = models.Account(user_id=other.id, name="Ví", type="CASH", current_balance=100)
+    db.add(other_account)
+    db.commit()
+    other_headers = {"Authorization": f"Bearer {security.create_access_token(other.id)}"}
+
+    mine = _etag(api)
+    theirs = _etag(api, headers=other_headers)
+    assert api.post("/transactions/", json=_expense(other_account), headers=other_headers).status_code == 201
+
+    assert _etag(api) == mine
+    assert _etag(api, headers=other_headers) != theirs
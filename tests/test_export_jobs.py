@@ -0,0 +1,66 @@
+"""
+Test job xuất file chạy nền: trạng thái job đã xong được lưu trên đĩa (còn sau khi khởi động lại),
+job hết hạn và file mồ côi trong thư mục xuất file bị dọn.
+"""
+
+import datetime
+import os
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.export_jobs import ExportJobManager
+from app.database import models
+from tests.conftest import make_category, make_transaction
+
+
+def _wait_finished(manager, job, timeout=10):
+    # Trạng thái .json được ghi ngay sau khi job kết thúc
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(manager._record_path(job.id)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_finished_job_survives_restart_and_expires(engine, db, user, account, tmp_path):
+    food = make_category(db, user, "Ăn uống")
+    for amount in (10, 20, 30):
+        make_transaction(db, account, amount, models.TransactionType.EXPENSE, food)
+    # Ô có xuống dòng và dấu ngoặc kép không được tính thành nhiều dòng
+    db.query(models.Transaction).filter(models.Transaction.amount == 20).update(
+        {"description": 'dòng 1\n"dòng 2"\r\ndòng 3'}, synchronize_session=False
+    )
+    db.commit()
+
+    export_dir = tmp_path / "exports"
+    manager = ExportJobManager(str(export_dir), ttl_seconds=3600, workers=1, render_processes=1)
+    job = manager.submit(user.id, "csv", {}, session_factory=sessionmaker(bind=engine))
+    _wait_finished(manager, job)
+    manager.shutdown()
+    assert job.status == "done"
+    assert job.rows_written == job.total_rows == 3
+
+    # Tiến trình mới (khởi động lại): tra cứu job từ file .json
+    restarted = ExportJobManager(str(export_dir), ttl_seconds=3600, workers=1, render_processes=1)
+    loaded = restarted.get(job.id, user.id)
+    assert loaded is not None
+    assert (loaded.status, loaded.etag, loaded.path) == ("done", job.etag, job.path)
+    assert restarted.get(job.id, user.id + 1) is None
+    assert restarted.get("../" + job.id, user.id) is None
+
+    # File mồ côi (job bị gián đoạn) cũ hơn TTL bị xóa khi quét; job còn hạn giữ nguyên
+    orphan = export_dir / ("0" * 32 + ".csv.part")
+    orphan.write_bytes(b"x")
+    old = time.time() - 7200
+    os.utime(orphan, (old, old))
+    restarted._last_sweep = None
+    restarted.cleanup_expired()
+    assert not orphan.exists()
+    assert os.path.exists(job.path)
+
+    # Hết hạn: file và trạng thái bị xóa
+    loaded.expires_at = datetime.datetime.now() - datetime.timedelta(seconds=1)
+    restarted._save(loaded)
+    restarted._last_sweep = None
+    restarted.cleanup_expired()
+    assert os.listdir(export_dir) == []
+    assert restarted.get(job.id, user.id) is None
@@ -0,0 +1,78 @@
+"""
+Test dự báo số dư (app/core/forecast.py): ma trận dòng tiền NumPy và cache kết quả.
+"""
+
+import datetime
+from decimal import Decimal
+
+from app.core import forecast
+from app.database import models
+from tests.conftest import make_transaction
+
+TODAY = datetime.date(2026, 1, 20)
+
+
+def _recurring(db, user, source, type, amount, frequency, start, next_run, destination=None):
+    item = models.RecurringTransaction(
+        user_id=user.id, source_account_id=source.id,
+        destination_account_id=destination.id if destination else None,
+        amount=Decimal(amount), type=type, description="Định kỳ", frequency=frequency,
+        start_date=datetime.datetime.combine(start, datetime.time()),
+        next_run_date=datetime.datetime.combine(next_run, datetime.time()),
+        is_active=True,
+    )
+    db.add(item)
+    db.commit()
+    return item
+
+
+def test_forecast_daily_balances(db, user):
+    wallet = models.Account(user_id=user.id, name="Ví", type="CASH", current_balance=Decimal("1000"))
+    bank = models.Account(user_id=user.id, name="Ngân hàng", type="BANK", current_balance=Decimal("500"))
+    db.add_all([wallet, bank])
+    db.commit()
+
+    # Hằng tuần, 2 lần đã đến hạn (13/01, 20/01) nhưng chưa xử lý -> dồn vào ngày đầu, lần sau 27/01
+    _recurring(db, user, wallet, models.TransactionType.EXPENSE, "100", models.FrequencyType.WEEKLY,
+               datetime.date(2026, 1, 6), datetime.date(2026, 1, 13))
+    # Chuyển khoản 25/01: trừ ví, cộng ngân hàng
+    _recurring(db, user, wallet, models.TransactionType.TRANSFER, "300", models.FrequencyType.MONTHLY,
+               datetime.date(2026, 1, 25), datetime.date(2026, 1, 25), destination=bank)
+    # Chi tiêu không định kỳ: 60 trong 4 ngày có dữ liệu (16/01 -> hôm nay) = 15/ngày
+    make_transaction(db, wallet, 40, models.TransactionType.EXPENSE, when=datetime.datetime(2026, 1, 16, 9))
+    make_transaction(db, wallet, 20, models.TransactionType.EXPENSE, when=datetime.datetime(2026, 1, 18, 9))
+
+    result = forecast.compute_forecast(db, user.id, 7, today=TODAY)
+
+    assert (result["start_date"], result["end_date"]) == ("2026-01-21", "2026-01-27")
+    assert [day["balances"] for day in result["daily"]] == [
+        [785.0, 500.0], [770.0, 500.0], [755.0, 500.0], [740.0, 500.0],
+        [425.0, 800.0], [410.0, 800.0], [295.0, 800.0],
+    ]
+    assert [day["total_balance"] for day in result["daily"]][-1] == 1095.0
+    assert result["recurring_occurrences"] == 4
+    assert result["run_rate"]["lookback_days"] == 4
+    assert result["run_rate"]["daily_expense"] == 15.0
+    assert result["accounts"][0]["min_balance"] == 295.0
+    assert result["accounts"][0]["min_balance_date"] == "2026-01-27"
+
+
+def test_write_invalidates_cached_forecast(api, db, user, account):
+    first = api.get("/reports/forecast", params={"days": 5}).json()
+    assert api.get("/reports/forecast", params={"days": 5}).json() == first
+    assert forecast.forecast_cache.stats()["hits"] == 1
+
+    api.post("/transactions/", json={
+        "type": "INCOME", "amount": "250.00", "source_account_id": account.id,
+        "transaction_date": datetime.datetime.now().isoformat(),
+    })
+    after = api.get("/reports/forecast", params={"days": 5}).json()
+    assert after["accounts"][0]["current_balance"] == first["accounts"][0]["current_balance"] + 250
+    assert forecast.forecast_cache.stats()["invalidations"] == 1
+
+    # Kết quả bắt đầu tính trước một lần ghi không được lưu vào cache
+    key = (user.id, 30, TODAY, 0)
+    generation = forecast.forecast_cache.generation(user.id)
+    forecast.forecast_cache.invalidate_users({user.id})
+    forecast.forecast_cache.put(key, {"stale": True}, generation)
+    assert forecast.forecast_cache.get(key) is None
@@ -0,0 +1,27 @@
+"""
+Test cho API nội bộ: chỉ token vận hành (INTERNAL_API_TOKEN) mới được gọi, token người dùng thì không.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import deps
+from app.core.config import settings
+
+
+def test_internal_token_required(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "ops-secret")
+
+    deps.require_internal_token("ops-secret")
+    for token in (None, "", "wrong"):
+        with pytest.raises(HTTPException) as error:
+            deps.require_internal_token(token)
+        assert error.value.status_code == 403
+
+
+def test_internal_api_locked_when_token_not_configured(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "")
+
+    with pytest.raises(HTTPException) as error:
+        deps.require_internal_token("")
+    assert error.value.status_code == 403
@@ -0,0 +1,56 @@
+"""
+Test phân trang keyset của GET /transactions (header X-Next-Cursor).
+"""
+
+import datetime
+
+from app.database import models
+from tests.conftest import make_transaction
+
+NOON = datetime.datetime(2026, 1, 15, 12, 0)
+
+
+def _seed(db, account):
+    # 5 giao dịch trùng đúng một thời điểm, xen giữa các giao dịch trước / sau đó
+    dates = [NOON - datetime.timedelta(days=1)] + [NOON] * 5 + [NOON + datetime.timedelta(days=1)]
+    return [make_transaction(db, account, 10 + i, models.TransactionType.EXPENSE, when=when) for i, when in enumerate(dates)]
+
+
+def _scroll(api, limit, after_first_page=None):
+    pages, params = [], {"limit": limit}
+    while True:
+        response = api.get("/transactions/", params=params)
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        if after_first_page and len(pages) == 1:
+            after_first_page()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        params = {"limit": limit, "cursor": cursor}
+
+
+def test_cursor_returns_every_row_once_in_order(api, db, account):
+    transactions = _seed(db, account)
+    expected = [t.id for t in sorted(transactions, key=lambda t: (t.transaction_date, t.id), reverse=True)]
+
+    for limit in (1, 2, 3, 7):
+        pages = _scroll(api, limit)
+        assert [row_id for page in pages for row_id in page] == expected
+        assert all(len(page) <= limit for page in pages)
+
+
+def test_malformed_cursor_is_rejected(api, account):
+    for cursor in ("khong-phai-cursor", "bm90LWEtZGF0ZXwx", "MjAyNi0wMS0xNVQxMjowMDowMA"):
+        assert api.get("/transactions/", params={"cursor": cursor}).status_code == 400
+
+
+def test_insert_during_scroll_does_not_shift_later_pages(api, db, account):
+    _seed(db, account)
+    baseline = _scroll(api, 2)
+
+    def _insert_newest():
+        make_transaction(db, account, 99, models.TransactionType.EXPENSE, when=NOON + datetime.timedelta(days=30))
+
+    pages = _scroll(api, 2, after_first_page=_insert_newest)
+    assert pages == baseline
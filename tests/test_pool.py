@@ -0,0 +1,49 @@
+"""
+Test cho connection pool: URL của engine async và số liệu của pool đã được đo.
+"""
+
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.database import pool
+from app.database.connection import async_database_url
+
+
+def test_async_database_url_maps_drivers():
+    assert async_database_url("postgresql+psycopg2://u:p@db:5432/app?sslmode=require").render_as_string(
+        hide_password=False
+    ) == "postgresql+asyncpg://u:p@db:5432/app?ssl=require"
+    assert async_database_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/app")
+
+
+def test_instrumented_pool_reports_checkouts_overflow_and_timeouts(tmp_path):
+    metrics = pool.PoolMetrics()
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=pool._instrumented(QueuePool, metrics),
+        pool_size=2,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    metrics.attach(engine)
+
+    assert pool.warm_up(engine, 10) == 2
+    connections = [engine.connect() for _ in range(3)]
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    stats = metrics.stats()
+    assert stats["checked_out"] == 3
+    assert stats["overflow"] == 1
+    assert stats["connects"] == 3
+    assert stats["checkouts"] == 5
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms_max"] >= 100
+    assert stats["checkout_latency_ms"][-1] == {"le_ms": "+Inf", "count": 6}
+
+    for connection in connections:
+        connection.close()
+    engine.dispose()
@@ -0,0 +1,72 @@
+"""
+Test cache xác thực (app/core/principal_cache.py): lần gọi get_current_user thứ hai không truy vấn
+database, cập nhật User qua ORM xóa snapshot, TTL không vượt quá hạn của token.
+"""
+
+import asyncio
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import deps, security
+from app.core.principal_cache import UserSnapshot, principal_cache
+from app.database.connection import async_database_url
+
+
+def _authenticate(engine, token, calls):
+    """Gọi get_current_user `calls` lần (mỗi lần một AsyncSession mới); trả về snapshot và số câu SELECT."""
+    async_engine = create_async_engine(
+        async_database_url(engine.url.render_as_string(hide_password=False)), poolclass=NullPool
+    )
+    statements = []
+    event.listen(
+        async_engine.sync_engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    async def _run():
+        results = []
+        for _ in range(calls):
+            async with AsyncSession(async_engine) as session:
+                results.append(await deps.get_current_user(token, session))
+        await async_engine.dispose()
+        return results
+
+    return asyncio.run(_run()), len(statements)
+
+
+def test_second_call_is_served_from_cache(engine, user):
+    token = security.create_access_token(user.id)
+    (first, second), statements = _authenticate(engine, token, calls=2)
+
+    assert statements == 1
+    assert second is first
+    assert (second.id, second.username) == (user.id, user.username)
+    assert (principal_cache.stats()["hits"], principal_cache.stats()["misses"]) == (1, 1)
+
+
+def test_orm_update_evicts_snapshot(engine, db, user):
+    token = security.create_access_token(user.id)
+    _authenticate(engine, token, calls=1)
+    assert principal_cache.get(token) is not None
+
+    user.full_name = "Tên mới"
+    db.commit()
+    assert principal_cache.get(token) is None
+
+    (snapshot,), statements = _authenticate(engine, token, calls=1)
+    assert statements == 1
+    assert snapshot.full_name == "Tên mới"
+
+
+def test_ttl_is_capped_at_token_expiry():
+    snapshot = UserSnapshot(1, "u", "u@example.com", None, None)
+    principal_cache.put("expired", snapshot, token_exp=time.time() - 1)
+    assert principal_cache.get("expired") is None
+
+    principal_cache.put("short", snapshot, token_exp=time.time() + 0.05)
+    assert principal_cache.get("short") is snapshot
+    time.sleep(0.1)
+    assert principal_cache.get("short") is None
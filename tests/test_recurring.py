@@ -0,0 +1,153 @@
+"""
+Test chạy bù giao dịch định kỳ: số câu SQL không phụ thuộc số lần chạy bị lỡ.
+Test tính lịch lặp (app/core/recurrence.py) và thời gian thử lại của scheduler khi lỗi.
+"""
+
+import asyncio
+import datetime
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from app.core import recurrence, recurring_processor, scheduler
+from app.database import models
+
+
+def _make_daily(db, account, days_ago):
+    start = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days_ago), datetime.time())
+    item = models.RecurringTransaction(
+        user_id=account.user_id,
+        source_account_id=account.id,
+        amount=Decimal("10.00"),
+        type=models.TransactionType.EXPENSE,
+        description="Tiền ăn",
+        frequency=models.FrequencyType.DAILY,
+        start_date=start,
+        next_run_date=start,
+        is_active=True,
+    )
+    db.add(item)
+    db.commit()
+    return item
+
+
+def _run_and_count(db, query_counter):
+    query_counter.clear()
+    processed = recurring_processor.process_due_transactions(db)
+    return processed, len(query_counter)
+
+
+def test_catch_up_uses_constant_statements(db, account, query_counter):
+    # Lịch DAILY bắt đầu 3 năm trước, chưa từng được xử lý
+    days = 3 * 365
+    item = _make_daily(db, account, days)
+    processed, statements = _run_and_count(db, query_counter)
+
+    assert processed == days + 1
+    assert statements <= 12  # gồm SAVEPOINT / RELEASE của lô
+
+    # Kết quả đúng: mỗi ngày đúng một giao dịch, số dư và bảng tổng hợp khớp
+    assert db.query(models.Transaction).filter(models.Transaction.recurring_id == item.id).count() == days + 1
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000") - Decimal("10.00") * (days + 1)
+    assert db.query(func.sum(models.DailyRollup.tx_count)).scalar() == days + 1
+    assert db.query(func.sum(models.MonthlyRollup.total_amount)).scalar() == Decimal("10.00") * (days + 1)
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    assert db.get(models.RecurringTransaction, item.id).next_run_date.date() == tomorrow
+
+    # Chạy lại: không còn gì đến hạn, không tạo trùng
+    assert recurring_processor.process_due_transactions(db) == 0
+
+    # Cùng số câu lệnh cho lịch chỉ lỡ vài ngày
+    _make_daily(db, account, 5)
+    processed, short_statements = _run_and_count(db, query_counter)
+    assert processed == 6
+    assert short_statements == statements
+
+
+def test_recurrence_anchored_to_start_date():
+    start = datetime.date(2024, 1, 31)
+    # Ngày cuối tháng được kẹp nhưng không trôi: 29/02 rồi lại 31/03
+    assert list(recurrence.occurrences_between(
+        start, models.FrequencyType.MONTHLY, datetime.date(2024, 1, 1), datetime.date(2024, 5, 1)
+    )) == [datetime.date(2024, 1, 31), datetime.date(2024, 2, 29), datetime.date(2024, 3, 31), datetime.date(2024, 4, 30)]
+
+    # 2 tuần một lần, tính thẳng tới lần chạy sau 10 năm
+    biweekly = datetime.date(2015, 1, 5)
+    assert recurrence.next_on_or_after(
+        biweekly, models.FrequencyType.WEEKLY, datetime.date(2025, 1, 1), interval=2
+    ) == datetime.date(2025, 1, 6)
+    assert recurrence.next_after(
+        biweekly, models.FrequencyType.WEEKLY, datetime.date(2025, 1, 6), interval=2
+    ) == datetime.date(2025, 1, 20)
+
+
+def test_failing_item_is_deactivated_and_batch_commits(db, account, monkeypatch):
+    good = _make_daily(db, account, 2)
+    bad = _make_daily(db, account, 2)
+    bad_id = bad.id
+    original = recurring_processor.missed_occurrences
+
+    def _missed(item, now):
+        if item.id == bad_id:
+            raise ValueError("dữ liệu lịch hỏng")
+        return original(item, now)
+
+    monkeypatch.setattr(recurring_processor, "missed_occurrences", _missed)
+    assert recurring_processor.process_due_transactions(db) == 3 + 1
+
+    db.expire_all()
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    assert db.get(models.RecurringTransaction, good.id).next_run_date.date() == tomorrow
+    assert db.get(models.RecurringTransaction, bad_id).is_active is False
+    assert db.query(models.Transaction).filter(models.Transaction.recurring_id == good.id).count() == 3
+    assert db.query(models.Transaction).filter(models.Transaction.recurring_id == bad_id).count() == 0
+    assert db.get(models.Account, account.id).current_balance == Decimal("1000000") - Decimal("30.00")
+
+    # Khoản lỗi đã bị vô hiệu hóa -> không bị nhận lại ở lần chạy sau
+    assert recurring_processor.process_due_transactions(db) == 0
+
+
+def _run_scheduler(recurring, sleeps=6):
+    """Chạy vòng lặp của scheduler, ghi lại các khoảng ngủ; dừng sau `sleeps` lần ngủ."""
+    delays = []
+
+    async def _sleep(delay):
+        delays.append(delay)
+        if len(delays) == sleeps:
+            raise asyncio.CancelledError
+
+    recurring._sleep = _sleep
+
+    async def _run():
+        recurring._wake = asyncio.Event()
+        try:
+            await recurring._run_forever()
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(_run())
+    return delays
+
+
+def test_scheduler_backs_off_exponentially_after_failures():
+    def _broken_session():
+        raise RuntimeError("database không kết nối được")
+
+    recurring = scheduler.RecurringScheduler(_broken_session, batch_size=10, max_sleep_seconds=10)
+    assert _run_scheduler(recurring) == [1, 2, 4, 8, 10, 10]
+    assert recurring.stats()["consecutive_failures"] == 6
+
+
+def test_scheduler_repolls_without_backoff_when_work_was_done(monkeypatch):
+    recurring = scheduler.RecurringScheduler(None, batch_size=10, max_sleep_seconds=10)
+    overdue = datetime.datetime.now() - datetime.timedelta(minutes=1)
+    monkeypatch.setattr(recurring, "_next_due_at", lambda: overdue)
+
+    # Mỗi lần đều xử lý được, phần còn lại đang bị worker khác khóa -> kiểm tra lại sau 1 giây
+    monkeypatch.setattr(recurring, "run_once", lambda: 3)
+    assert _run_scheduler(recurring, sleeps=3) == [scheduler.REPOLL_SECONDS] * 3
+    assert recurring.consecutive_failures == 0
+
+    # Không xử lý được gì mà vẫn còn khoản đến hạn -> lùi dần
+    monkeypatch.setattr(recurring, "run_once", lambda: 0)
+    assert _run_scheduler(recurring, sleeps=3) == [1, 2, 4]
@@ -0,0 +1,107 @@
+"""
+Test cache báo cáo: backend bộ nhớ (giới hạn số mục / số byte, TTL), backend Redis
+(qua một client giả lập tương thích redis-py) và xóa cache khi dữ liệu của user được ghi.
+"""
+
+import time
+
+from app.core import changes
+from app.core.report_cache import MemoryBackend, RedisBackend, report_cache
+from app.database import models
+from tests.conftest import make_transaction
+
+
+class _FakeRedis:
+    """Phần nhỏ của API redis-py mà RedisBackend dùng; ghi lại mọi lệnh đã gửi."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    def get(self, key):
+        self.commands.append("GET")
+        entry = self.data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ex=None):
+        self.commands.append("SET")
+        self.data[key] = (time.monotonic() + ex, value)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if key.startswith(match.rstrip("*"))]
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def info(self, section):
+        return {"used_memory": 1}
+
+
+class _BrokenRedis:
+    def __getattr__(self, name):
+        def _fail(*args, **kwargs):
+            raise ConnectionError("Redis không phản hồi")
+        return _fail
+
+
+def test_redis_backend_set_get_and_errors_are_misses():
+    client = _FakeRedis()
+    backend = RedisBackend("redis://unused", ttl_seconds=60, client=client)
+    backend.set(1, "1:v3:dashboard:abc", b'{"a":1}')
+    assert backend.get("1:v3:dashboard:abc") == b'{"a":1}'
+    assert "report-cache:1:v3:dashboard:abc" in client.data
+    assert backend.get("1:v4:dashboard:abc") is None
+
+    # Xóa theo user không gửi lệnh Redis nào (after_commit chạy trên event loop);
+    # mục của phiên bản cũ không được đọc lại vì khóa mới chứa phiên bản mới
+    client.commands.clear()
+    assert backend.invalidate_users({1}) == 0
+    assert client.commands == []
+
+    backend.clear()
+    assert client.data == {}
+
+    broken = RedisBackend("redis://unused", ttl_seconds=60, client=_BrokenRedis())
+    assert broken.get("k") is None
+    broken.set(1, "k", b"{}")
+    assert broken.stats()["errors"] == 2
+
+
+def test_memory_backend_bounds_entries_bytes_and_ttl():
+    backend = MemoryBackend(max_entries=2, max_bytes=10, ttl_seconds=60)
+    backend.set(1, "a", b"1234")
+    backend.set(1, "b", b"1234")
+    backend.get("a")  # "a" vừa được dùng -> "b" bị đẩy ra trước
+    backend.set(2, "c", b"12")
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (b"1234", None, b"12")
+
+    # Vượt tổng số byte: bỏ mục cũ nhất; một giá trị lớn hơn cả giới hạn không được lưu
+    backend.set(2, "d", b"123456")
+    assert backend.get("a") is None
+    assert backend.stats()["bytes"] == 8
+    backend.set(2, "huge", b"x" * 11)
+    assert backend.get("huge") is None
+    assert backend.stats()["evictions"] == 2
+
+    expired = MemoryBackend(max_entries=10, max_bytes=100, ttl_seconds=0)
+    expired.set(1, "a", b"1")
+    assert expired.get("a") is None
+
+
+def test_write_invalidates_only_that_users_entries(db, user, account):
+    other = models.User(username="other", email="other@example.com", password_hash="x")
+    db.add(other)
+    db.commit()
+
+    version = changes.data_versions.get(user.id)
+    report_cache.backend.set(user.id, report_cache.make_key(user.id, version or 0, "dashboard", {}), b"{}")
+    report_cache.backend.set(other.id, report_cache.make_key(other.id, 0, "dashboard", {}), b"{}")
+
+    make_transaction(db, account, 10, models.TransactionType.EXPENSE)
+
+    assert report_cache.backend.stats()["entries"] == 1
+    assert report_cache.backend.get(report_cache.make_key(other.id, 0, "dashboard", {})) == b"{}"
+    # Phiên bản dữ liệu tăng trong cùng commit -> khóa mới khác khóa cũ
+    assert changes.data_versions.get(user.id) > (version or 0)
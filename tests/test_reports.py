@@ -0,0 +1,83 @@
+"""
+Test cho API báo cáo: Dashboard phải chạy với số truy vấn cố định.
+Gộp request trùng (SingleFlight) khi leader bị hủy.
+"""
+
+import asyncio
+import datetime
+
+from app.core.singleflight import SingleFlight
+from app.database import models
+from app.routers import reports
+from tests.conftest import make_category, make_transaction
+
+
+def _seed_budgets(db, user, account, count):
+    now = datetime.datetime.now()
+    for i in range(count):
+        category = make_category(db, user, f"Danh mục {i}")
+        db.add(models.Budget(user_id=user.id, category_id=category.id, amount=500, month=now.month, year=now.year))
+        make_transaction(db, account, 10 + i, models.TransactionType.EXPENSE, category)
+    db.commit()
+
+
+def test_dashboard_query_count_is_constant(db, user, account, query_counter):
+    counts = []
+    for budget_count in (1, 5, 20):
+        _seed_budgets(db, user, account, budget_count)
+        db.expire_all()
+        db.refresh(user)
+        query_counter.clear()
+        reports.compute_dashboard_stats("month", db, user.id)
+        counts.append(len(query_counter))
+
+    assert counts[0] == counts[1] == counts[2]
+    assert counts[0] <= 3
+
+
+def test_dashboard_totals_match_line_chart_and_budgets(db, user, account):
+    food = make_category(db, user, "Ăn uống")
+    salary = make_category(db, user, "Lương", models.TransactionType.INCOME)
+    now = datetime.datetime.now()
+    db.add(models.Budget(user_id=user.id, category_id=food.id, amount=1000, month=now.month, year=now.year))
+    db.commit()
+
+    make_transaction(db, account, 200, models.TransactionType.EXPENSE, food)
+    make_transaction(db, account, 300, models.TransactionType.EXPENSE, food)
+    make_transaction(db, account, 5000, models.TransactionType.INCOME, salary)
+
+    for time_range in ("day", "week", "month"):
+        stats = reports.compute_dashboard_stats(time_range, db, user.id)
+
+        assert float(stats["monthly_income"]) == 5000
+        assert float(stats["monthly_expense"]) == 500
+        assert sum(stats["line_chart"]["income"]) == 5000
+        assert sum(stats["line_chart"]["expense"]) == 500
+        assert stats["pie_expense"] == {"labels": ["Ăn uống"], "data": [500.0]}
+        assert stats["pie_income"] == {"labels": ["Lương"], "data": [5000.0]}
+        assert stats["budget_chart"] == {"labels": ["Ăn uống"], "spent": [500.0], "limit": [1000.0]}
+        assert float(stats["budget_left"]) == 500
+
+
+def test_single_flight_waiter_takes_over_when_leader_is_cancelled():
+    flights = SingleFlight()
+    started = []
+
+    async def _compute():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return len(started)
+
+    async def _run():
+        leader = asyncio.create_task(flights.do("k", _compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flights.do("k", _compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters), leader
+
+    results, leader = asyncio.run(_run())
+    # Leader bị hủy: một request chờ tính lại, các request còn lại dùng chung kết quả đó
+    assert leader.cancelled()
+    assert results == [2, 2, 2]
+    assert flights.stats() == {"in_flight": 0, "executions": 2, "coalesced": 2}
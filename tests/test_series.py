@@ -0,0 +1,75 @@
+"""
+Test GET /reports/series: bucket trống được lấp 0 và thẳng hàng qua ranh giới tháng / tuần ISO / năm,
+metric=net = thu - chi, và giới hạn MAX_BUCKETS.
+"""
+
+import datetime
+
+from app.core import series
+from app.database import models
+from tests.conftest import make_transaction
+
+
+def _series(api, start, end, granularity, metric="expense"):
+    response = api.get("/reports/series", params={
+        "from": start, "to": end, "granularity": granularity, "metric": metric,
+    })
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return list(zip(body["labels"], body["data"]))
+
+
+def _add(db, account, amount, when, type=models.TransactionType.EXPENSE):
+    make_transaction(db, account, amount, type, when=datetime.datetime.fromisoformat(when))
+
+
+def test_zero_filled_buckets_across_month_and_year(api, db, account):
+    _add(db, account, 10, "2025-12-31T23:30:00")
+    _add(db, account, 20, "2026-01-01T00:15:00")
+    _add(db, account, 5, "2026-02-02T08:00:00")
+
+    assert _series(api, "2025-12-30", "2026-01-03", "day") == [
+        ("2025-12-30T00:00:00", 0.0), ("2025-12-31T00:00:00", 10.0), ("2026-01-01T00:00:00", 20.0),
+        ("2026-01-02T00:00:00", 0.0), ("2026-01-03T00:00:00", 0.0),
+    ]
+    assert _series(api, "2025-12-15", "2026-02-10", "month") == [
+        ("2025-12-01T00:00:00", 10.0), ("2026-01-01T00:00:00", 20.0), ("2026-02-01T00:00:00", 5.0),
+    ]
+    assert _series(api, "2025-06-01", "2026-03-01", "year") == [
+        ("2025-01-01T00:00:00", 10.0), ("2026-01-01T00:00:00", 25.0),
+    ]
+    hours = _series(api, "2025-12-31", "2026-01-01", "hour")
+    assert len(hours) == 48
+    assert hours[23] == ("2025-12-31T23:00:00", 10.0)
+    assert hours[24] == ("2026-01-01T00:00:00", 20.0)
+    assert sum(value for _, value in hours) == 30.0
+
+
+def test_weeks_start_on_monday_across_iso_year_boundary(api, db, account):
+    # Tuần ISO 1 của 2026 bắt đầu Thứ 2 29/12/2025
+    _add(db, account, 1, "2025-12-28T12:00:00")  # Chủ nhật -> tuần 22/12
+    _add(db, account, 2, "2025-12-29T00:00:00")  # Thứ 2 -> tuần 29/12
+    _add(db, account, 4, "2026-01-04T23:59:00")  # Chủ nhật -> tuần 29/12
+    _add(db, account, 8, "2026-01-12T09:00:00")  # Thứ 2 -> tuần 12/01
+
+    assert _series(api, "2025-12-24", "2026-01-13", "week") == [
+        ("2025-12-22T00:00:00", 1.0), ("2025-12-29T00:00:00", 6.0),
+        ("2026-01-05T00:00:00", 0.0), ("2026-01-12T00:00:00", 8.0),
+    ]
+
+
+def test_net_is_income_minus_expense_and_bucket_limit(api, db, account):
+    _add(db, account, 100, "2026-03-02T10:00:00", models.TransactionType.INCOME)
+    _add(db, account, 30, "2026-03-02T18:00:00")
+    _add(db, account, 45, "2026-03-04T10:00:00")
+
+    income = _series(api, "2026-03-01", "2026-03-05", "day", "income")
+    expense = _series(api, "2026-03-01", "2026-03-05", "day", "expense")
+    net = _series(api, "2026-03-01", "2026-03-05", "day", "net")
+    assert [value for _, value in net] == [i - e for (_, i), (_, e) in zip(income, expense)]
+    assert [value for _, value in net] == [0.0, 70.0, 0.0, -45.0, 0.0]
+
+    too_many_days = series.MAX_BUCKETS // 24 + 1
+    end = datetime.date(2026, 1, 1) + datetime.timedelta(days=too_many_days - 1)
+    response = api.get("/reports/series", params={"from": "2026-01-01", "to": end.isoformat(), "granularity": "hour"})
+    assert response.status_code == 400